@@ -0,0 +1,49 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import sys
+from functools import lru_cache
+
+# Kept free of yt_dlp and Qt imports: the GUI reads these before the download engine is loaded.
+
+
+def resource_path(rel: str) -> str:
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, rel)
+
+
+def _find_tool(name):
+    # Try bundled copies first
+    exe = name + ".exe"
+    candidates = [
+        resource_path(os.path.join("tools", "ffmpeg", exe)),
+        resource_path(exe),
+    ]
+    for c in candidates:
+        if os.path.isfile(c):
+            return c
+    # Fallback to PATH if the user already has ffmpeg
+    return shutil.which(name) or ""
+
+
+@lru_cache(maxsize=None)
+def ffmpeg_exe():
+    """Path to ffmpeg, or "" if there is none; looked up once per process."""
+    return _find_tool("ffmpeg")
+
+
+@lru_cache(maxsize=None)
+def ffprobe_exe():
+    """Path to ffprobe, or "" if there is none; looked up once per process."""
+    return _find_tool("ffprobe")
+
+
+def app_data_dir():
+    """Per-user folder for the app's caches and indexes."""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "YoutubeDownloader")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,69 @@
+from __future__ import unicode_literals
+import asyncio
+import threading
+
+
+async def run_blocking(executor, fn, *args, on_cancel=None, timeout=None):
+    """Await ``fn(*args)`` on ``executor`` without blocking the loop.
+
+    If the awaiting task is cancelled or ``timeout`` expires, ``on_cancel()``
+    is called and the worker thread is waited for before the cancellation
+    propagates, so no blocking work outlives the task that started it.
+    """
+    fut = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    try:
+        return await asyncio.wait_for(asyncio.shield(fut), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        if on_cancel:
+            on_cancel()
+        try:
+            await fut
+        except BaseException:
+            pass
+        raise
+
+
+async def run_download(download, video, executor=None, timeout=None):
+    """Run ``download.mp4_download``/``mp3_download`` off the loop; returns the title."""
+    fn = download.mp4_download if video else download.mp3_download
+    return await run_blocking(executor, fn, on_cancel=download.cancel, timeout=timeout)
+
+
+class LoopThread(object):
+    """An asyncio event loop on a daemon thread, for callers that are not async (Qt, JobQueue)."""
+
+    def __init__(self, name="asyncio-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._main, name=name, daemon=True)
+
+    def _main(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, coro):
+        """Schedule ``coro``; returns a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self, timeout=None):
+        """Cancel every task still on the loop, let them unwind, then stop the thread."""
+        if not self._thread.is_alive():
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self.submit(shutdown()).result(timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
@@ -0,0 +1,195 @@
+from __future__ import unicode_literals
+import re
+import threading
+import time
+
+_RATE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?(?:/s)?\s*$", re.I)
+
+
+def parse_rate(text):
+    """'500K', '2M', '1.5MB/s' or a plain number of bytes per second -> int (0/None = unlimited)."""
+    if text in (None, "", 0, "0"):
+        return None
+    if isinstance(text, (int, float)):
+        return int(text) or None
+    m = _RATE.match(str(text))
+    if not m:
+        raise ValueError(f"invalid rate: {text!r}")
+    mult = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[m.group(2).lower()]
+    return int(float(m.group(1)) * mult) or None
+
+
+def _minutes(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+class Pacer(object):
+    """Blocks the caller so bytes flow at ``params['ratelimit']``; for downloads not driven by yt-dlp."""
+
+    def __init__(self, params):
+        self.params = params
+        self._lock = threading.Lock()
+        self._rate = None
+        self._start = time.monotonic()
+        self._bytes = 0
+
+    def __call__(self, n):
+        rate = self.params.get("ratelimit")
+        with self._lock:
+            now = time.monotonic()
+            if rate != self._rate:
+                # limit changed -> measure from here on
+                self._rate, self._start, self._bytes = rate, now, 0
+            self._bytes += n
+            delay = (self._bytes / rate - (now - self._start)) if rate else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Lease(object):
+    """One job's claim on the shared bandwidth.
+
+    Each yt-dlp instance the job runs is attached by its ``params`` dict;
+    yt-dlp's HTTP downloader re-reads ``params['ratelimit']`` on every chunk,
+    so rewriting it takes effect mid-download.
+    """
+
+    def __init__(self, scheduler, weight=1.0, limit=None):
+        self.scheduler = scheduler
+        self.weight = max(0.01, float(weight))
+        self.limit = limit
+        self.rate = None        # current share in bytes/s (None = unlimited)
+        self._params = []
+
+    def attach(self, params):
+        with self.scheduler._lock:
+            self._params.append(params)
+        self.scheduler.rebalance()
+        return params
+
+    def detach(self, params):
+        with self.scheduler._lock:
+            self._params = [p for p in self._params if p is not params]
+        self.scheduler.rebalance()
+
+    @property
+    def active(self):
+        return bool(self._params)
+
+    def release(self):
+        self.scheduler.unregister(self)
+
+
+class BandwidthScheduler(object):
+    """Splits a global rate cap between running jobs.
+
+    Shares are weighted max-min fair: a job capped below its fair share keeps
+    its cap and the rest is divided among the others by weight. Only jobs
+    that are actually downloading (have a yt-dlp instance attached) take part.
+    ``profiles`` is a list of ``("HH:MM", "HH:MM", rate)`` windows that
+    replace the global cap during those hours; windows may wrap midnight.
+    Every setter rebalances immediately, including for running downloads.
+    """
+
+    def __init__(self, global_limit=None, profiles=None, clock=None):
+        self.global_limit = parse_rate(global_limit)
+        self.profiles = [(_minutes(a), _minutes(b), parse_rate(r)) for a, b, r in (profiles or [])]
+        self._clock = clock or time.localtime
+        self._lock = threading.RLock()
+        self._leases = []
+        self._timer = None
+
+    # ---------- configuration ----------
+    def set_global_limit(self, rate):
+        self.global_limit = parse_rate(rate)
+        self.rebalance()
+
+    def set_profiles(self, profiles):
+        self.profiles = [(_minutes(a), _minutes(b), parse_rate(r)) for a, b, r in (profiles or [])]
+        self._ensure_timer()
+        self.rebalance()
+
+    def set_limit(self, lease, rate):
+        lease.limit = parse_rate(rate)
+        self.rebalance()
+
+    def set_weight(self, lease, weight):
+        lease.weight = max(0.01, float(weight))
+        self.rebalance()
+
+    def effective_limit(self):
+        if self.profiles:
+            now = self._clock()
+            minute = now.tm_hour * 60 + now.tm_min
+            for start, end, rate in self.profiles:
+                inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+                if inside:
+                    return rate
+        return self.global_limit
+
+    # ---------- leases ----------
+    def register(self, weight=1.0, limit=None):
+        lease = Lease(self, weight, parse_rate(limit))
+        with self._lock:
+            self._leases.append(lease)
+        self._ensure_timer()
+        self.rebalance()
+        return lease
+
+    def unregister(self, lease):
+        with self._lock:
+            self._leases = [l for l in self._leases if l is not lease]
+        self.rebalance()
+
+    # ---------- allocation ----------
+    def rebalance(self):
+        with self._lock:
+            active = [l for l in self._leases if l.active]
+            for l in self._leases:
+                if not l.active:
+                    l.rate = l.limit
+            budget = self.effective_limit()
+            if budget is None:
+                for l in active:
+                    l.rate = l.limit
+            else:
+                # water-filling: hand capped leases their cap, share the rest by weight
+                pending = list(active)
+                left = float(budget)
+                while pending:
+                    total_w = sum(l.weight for l in pending)
+                    capped = [l for l in pending if l.limit is not None and l.limit <= left * l.weight / total_w]
+                    if not capped:
+                        for l in pending:
+                            l.rate = max(1, int(left * l.weight / total_w))
+                        break
+                    for l in capped:
+                        l.rate = l.limit
+                        left -= l.limit
+                        pending.remove(l)
+            for l in active:
+                per = None if l.rate is None else max(1, l.rate // len(l._params))
+                for p in l._params:
+                    p["ratelimit"] = per
+
+    def shares(self):
+        with self._lock:
+            return [(l, l.rate) for l in self._leases]
+
+    def _ensure_timer(self):
+        # time-of-day windows need a periodic look at the clock
+        if not self.profiles or (self._timer and self._timer.is_alive()):
+            return
+
+        def tick():
+            while True:
+                time.sleep(30)
+                with self._lock:
+                    if not self._leases:
+                        self._timer = None
+                        return
+                self.rebalance()
+
+        self._timer = threading.Thread(target=tick, name="bandwidth-profiles", daemon=True)
+        self._timer.start()
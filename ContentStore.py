@@ -0,0 +1,177 @@
+from __future__ import unicode_literals
+import filecmp
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+_FICLONE = 0x40049409   # Linux ioctl: share extents (btrfs, XFS, bcachefs, ...)
+
+
+def _reflink(src, dst):
+    """Copy-on-write clone of ``src`` at ``dst``; raises OSError where the platform or file system can't."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink not supported on this platform")
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def _place(src, dst):
+    """Make ``dst`` hold ``src``'s bytes as cheaply as possible; returns "hardlink", "reflink" or "copy"."""
+    for method, fn in (("hardlink", os.link), ("reflink", _reflink)):
+        try:
+            fn(src, dst)
+            return method
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class ContentStore(object):
+    """Downloaded media indexed by what it is, not where it was saved.
+
+    A key is extractor + video id + variant (kind, quality and format
+    choice), so the same video reached through several playlists or
+    folders is downloaded and converted once. Later requests are
+    materialised into their folder as a hardlink, a reflink or, failing
+    both, a copy. The store keeps its own hardlink/reflink of each item
+    under ``root/objects`` when the file system allows; otherwise the index
+    just points at the first download, and the item is fetched again once
+    that file is gone. Hardlinked copies share their bytes: editing one in
+    place edits all of them.
+
+    ``stats()`` reports what the store has saved: reuses, bytes not
+    downloaded again and FFmpeg seconds not spent again, kept across runs.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " key TEXT PRIMARY KEY, blob TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL,"
+            " cpu_s REAL NOT NULL, owned INTEGER NOT NULL, created REAL) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS savings (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def key(extractor, video_id, variant):
+        return hashlib.sha1(f"{(extractor or '').lower()}:{video_id}:{variant}".encode("utf-8")).hexdigest()
+
+    # ---------- lookup ----------
+    def lookup(self, key):
+        """The stored item as a dict, or None when absent or its file is gone or changed."""
+        with self._lock:
+            row = self._db.execute("SELECT blob, name, size, cpu_s, owned FROM items WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        blob, name, size, cpu_s, owned = row
+        try:
+            if os.path.getsize(blob) != size:
+                return None
+        except OSError:
+            return None
+        return {"blob": blob, "name": name, "size": size, "cpu_s": cpu_s, "owned": bool(owned)}
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    # ---------- adding ----------
+    def put(self, key, path, cpu_s=0.0):
+        """Index a freshly downloaded and converted file; ``cpu_s`` is what producing it cost."""
+        if not path or not os.path.isfile(path) or self.lookup(key) is not None:
+            return
+        name = os.path.basename(path)
+        blob = os.path.join(self.root, "objects", key[:2], key + os.path.splitext(name)[1])
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            if os.path.exists(blob):
+                os.remove(blob)     # stale object of an entry whose row was dropped
+            try:
+                os.link(path, blob)
+            except OSError:
+                _reflink(path, blob)
+            owned = True
+        except OSError:
+            blob, owned = os.path.abspath(path), False     # other volume: don't duplicate the bytes
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO items (key, blob, name, size, cpu_s, owned, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, blob, name, os.path.getsize(path), float(cpu_s or 0.0), int(owned), time.time()))
+            self._db.commit()
+
+    # ---------- reuse ----------
+    def materialise(self, key, folder):
+        """Put the item into ``folder`` under its original name; returns the path, or None if not stored.
+
+        A file already there under that name is used if it is the stored
+        item (the same file, or the same size and bytes). Any other file is
+        left alone and the item goes next to it as "name (2).ext", "name
+        (3).ext", ... (or into the first of those that already holds it).
+        """
+        item = self.lookup(key)
+        if item is None:
+            return None
+        stem, ext = os.path.splitext(item["name"])
+        dest, n = os.path.join(folder, item["name"]), 1
+        while os.path.lexists(dest):
+            if self._holds(dest, item):
+                return dest
+            n += 1
+            dest = os.path.join(folder, f"{stem} ({n}){ext}")
+        tmp = dest + ".store-tmp"
+        try:
+            method = _place(item["blob"], tmp)
+            os.replace(tmp, dest)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+        self._count(method, item)
+        return dest
+
+    @staticmethod
+    def _holds(path, item):
+        try:
+            if os.path.samefile(path, item["blob"]):
+                return True
+            return os.path.getsize(path) == item["size"] and filecmp.cmp(path, item["blob"], shallow=False)
+        except OSError:
+            return False
+
+    def _count(self, method, item):
+        with self._lock:
+            for name, value in (("reuses", 1), (method, 1), ("bytes_saved", item["size"]),
+                                ("cpu_saved_s", item["cpu_s"])):
+                self._db.execute("INSERT INTO savings (name, value) VALUES (?, ?)"
+                                 " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+            self._db.commit()
+
+    # ---------- reporting ----------
+    def stats(self):
+        with self._lock:
+            items, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM items").fetchone()
+            saved = dict(self._db.execute("SELECT name, value FROM savings").fetchall())
+        out = {"items": items, "bytes": size}
+        for name in ("reuses", "hardlink", "reflink", "copy", "bytes_saved"):
+            out[name] = int(saved.get(name, 0))
+        out["cpu_saved_s"] = saved.get("cpu_saved_s", 0.0)
+        return out
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,325 @@
+"""Local HTTP/JSON control API for a JobQueue.
+
+    GET    /jobs                     every job
+    POST   /jobs                     {"url" | "urls", "save_path", "quality", "playlist", "video", "priority", ...}
+    GET    /jobs/<id>                one job
+    DELETE /jobs/<id>                cancel it (same as POST /jobs/<id>/cancel)
+    POST   /jobs/<id>/pause|resume|cancel
+    GET    /jobs/<id>/events         Server-Sent Events for one job, closed when it ends
+    GET    /events                   Server-Sent Events for every job
+
+A job is sent as Job.snapshot(): its state plus the last progress payload
+(status, file_percent, overall_percent, idx, total, title).
+"""
+from __future__ import unicode_literals
+import asyncio
+import collections
+import hmac
+import json
+import os
+import secrets
+from urllib.parse import urlsplit, parse_qs
+
+from AsyncCore import LoopThread
+from BandwidthScheduler import parse_rate
+from JobQueue import parse_urls, FINAL_STATES
+
+_QUALITIES = ("Best", "Semi", "Worst")
+_MAX_BODY = 1024 * 1024
+_MAX_SEGMENTS = 16
+_MAX_FINAL = 4096       # ended jobs remembered so late progress ticks are dropped
+_LOCAL_NAMES = ("localhost", "127.0.0.1", "::1")
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+def _hostname(value):
+    # "name", "name:port" or "[v6]:port" -> name; None if unparsable
+    try:
+        return urlsplit("//" + value).hostname if value else None
+    except ValueError:
+        return None
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _Watcher(object):
+    """One SSE client: the latest encoded snapshot per job it has not been sent yet."""
+
+    __slots__ = ("job_id", "pending", "wake")
+
+    def __init__(self, job_id):
+        self.job_id = job_id    # None: every job
+        self.pending = {}       # job id -> encoded snapshot; a slow client skips states it was too slow for
+        self.wake = asyncio.Event()
+
+
+class ControlServer(object):
+    """Serves the control API on ``host:port`` (localhost by default) for ``queue``.
+
+    It runs on an asyncio loop (``loop``, a LoopThread, or its own), so an
+    idle watcher costs a socket and a small object rather than a thread.
+    Job updates arrive through a JobQueue listener; each is encoded once
+    and handed to the watchers of that job, who are woken rather than
+    polling. Every request needs ``Authorization: Bearer <token>`` or
+    ``?token=<token>`` (EventSource cannot set headers); without ``token`` a
+    random one is made, read it from ``server.token``. On a loopback address
+    requests must name a local Host and, if they carry one, a local Origin,
+    so a web page cannot reach the API through the browser or by rebinding
+    a DNS name to 127.0.0.1. Submitted jobs default to ``save_path`` and
+    ``quality``; a client's ``save_path`` must lie inside ``save_path``.
+    """
+
+    HEARTBEAT = 15.0    # seconds between SSE keep-alive comments
+
+    def __init__(self, queue, save_path=None, quality="Best", host="127.0.0.1", port=8765, token=None, loop=None):
+        self.queue = queue
+        self.save_path = save_path
+        self.quality = quality
+        self.host = host
+        self.port = port
+        self.token = token or secrets.token_urlsafe(24)
+        self._own_loop = loop is None
+        self.loop_thread = loop or LoopThread("control-api").start()
+        self._server = None
+        self._closing = False
+        self._watchers = {}     # job id (None = all jobs) -> set of _Watcher
+        self._final = collections.OrderedDict()     # jobs whose final snapshot has been published, oldest first
+        queue.add_listener(self._on_update)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        """Start listening; returns the port (useful with ``port=0``)."""
+        self._server = self.loop_thread.submit(
+            asyncio.start_server(self._client, self.host, self.port)).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def close(self):
+        self.queue.remove_listener(self._on_update)
+
+        async def shutdown():
+            self._closing = True
+            for watchers in self._watchers.values():
+                for w in watchers:
+                    w.wake.set()
+            if self._server:
+                self._server.close()
+
+        self.loop_thread.submit(shutdown()).result(10)
+        if self._own_loop:
+            self.loop_thread.stop(timeout=10)
+
+    def watchers(self):
+        return sum(len(v) for v in self._watchers.values())
+
+    # ---------- fan-out ----------
+    def _on_update(self, job):
+        # any thread: encode once, deliver on the loop
+        data = json.dumps(job.snapshot(), ensure_ascii=False)
+        self.loop_thread.call_soon(self._publish, job.id, data, job.state in FINAL_STATES)
+
+    def _publish(self, job_id, data, final):
+        if job_id in self._final:
+            return      # a progress tick that raced the job's end
+        if final:
+            self._final[job_id] = True
+            if len(self._final) > _MAX_FINAL:
+                self._final.popitem(last=False)
+        for key in (job_id, None):
+            for w in self._watchers.get(key, ()):
+                w.pending[job_id] = (data, final)
+                w.wake.set()
+
+    async def _stream(self, writer, job_id):
+        w = _Watcher(job_id)
+        self._watchers.setdefault(job_id, set()).add(w)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Connection: close\r\n\r\n")
+            # the current state first, then changes as they happen
+            for job in ([self.queue.get(job_id)] if job_id is not None else self.queue.jobs()):
+                if job is None:
+                    return
+                w.pending.setdefault(job.id, (json.dumps(job.snapshot(), ensure_ascii=False),
+                                              job.state in FINAL_STATES))
+            w.wake.set()
+            while not self._closing:
+                try:
+                    await asyncio.wait_for(w.wake.wait(), self.HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                w.wake.clear()
+                batch, w.pending = w.pending, {}
+                done = False
+                for data, final in batch.values():
+                    writer.write(f"event: job\ndata: {data}\n\n".encode("utf-8"))
+                    done = done or (final and job_id is not None)
+                await writer.drain()
+                if done:
+                    return
+        finally:
+            watchers = self._watchers.get(job_id)
+            watchers.discard(w)
+            if not watchers:
+                del self._watchers[job_id]
+
+    # ---------- HTTP ----------
+    async def _client(self, reader, writer):
+        try:
+            try:
+                method, path, query, headers, body = await self._read_request(reader)
+                self._check_origin(headers)
+                self._authorise(headers, query)
+                stream_job = self._stream_target(method, path)
+                if stream_job is not False:
+                    await self._stream(writer, stream_job)
+                    return
+                status, payload = self._route(method, path, body)
+            except ApiError as e:
+                status, payload = e.status, {"error": str(e)}
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("ascii") + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = (await reader.readline()).decode("latin-1").split()
+        if len(line) != 3:
+            raise ApiError(400, "malformed request line")
+        method, target = line[0].upper(), urlsplit(line[1])
+        headers = {}
+        while True:
+            h = (await reader.readline()).decode("latin-1").strip()
+            if not h:
+                break
+            name, _, value = h.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > _MAX_BODY:
+            raise ApiError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.path.rstrip("/") or "/", parse_qs(target.query), headers, body
+
+    def _check_origin(self, headers):
+        if self.host not in _LOCAL_NAMES and not self.host.startswith("127."):
+            return      # served on purpose beyond this machine: the token alone guards it
+        if _hostname(headers.get("host")) not in _LOCAL_NAMES:
+            raise ApiError(403, f"Host {headers.get('host')!r} is not this machine")
+        origin = headers.get("origin")
+        if origin and _hostname(urlsplit(origin).netloc) not in _LOCAL_NAMES:
+            raise ApiError(403, f"requests from {origin} are not allowed")
+
+    def _authorise(self, headers, query):
+        given = headers.get("authorization", "")
+        given = given[7:] if given.lower().startswith("bearer ") else (query.get("token") or [""])[0]
+        if not hmac.compare_digest(given.encode("utf-8"), self.token.encode("utf-8")):
+            raise ApiError(401, "missing or wrong token")
+
+    def _job(self, job_id):
+        job = self.queue.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise ApiError(404, f"no job {job_id}")
+        return job
+
+    def _stream_target(self, method, path):
+        # the job id an SSE request watches (None = all), or False for a plain request
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["events"]:
+            return None
+        if method == "GET" and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            return self._job(parts[1]).id
+        return False
+
+    def _route(self, method, path, body):
+        parts = path.strip("/").split("/")
+        if parts[0] != "jobs" or len(parts) > 3:
+            raise ApiError(404, f"no such endpoint: {path}")
+        if len(parts) == 1:
+            if method == "GET":
+                return 200, {"jobs": [j.snapshot() for j in self.queue.jobs()]}
+            if method == "POST":
+                return 201, {"jobs": [j.snapshot() for j in self._submit(body)]}
+            raise ApiError(405, f"{method} not allowed on /jobs")
+        job = self._job(parts[1])
+        if len(parts) == 2:
+            if method == "GET":
+                return 200, job.snapshot()
+            if method == "DELETE":
+                return 200, {"ok": self.queue.cancel(job.id), "job": job.snapshot()}
+            raise ApiError(405, f"{method} not allowed on {path}")
+        action = {"pause": self.queue.pause, "resume": self.queue.resume, "cancel": self.queue.cancel}.get(parts[2])
+        if action is None:
+            raise ApiError(404, f"no such endpoint: {path}")
+        if method != "POST":
+            raise ApiError(405, f"{method} not allowed on {path}")
+        return 200, {"ok": action(job.id), "job": job.snapshot()}
+
+    def _submit(self, body):
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            raise ApiError(400, "body is not JSON")
+        if not isinstance(req, dict):
+            raise ApiError(400, "body must be a JSON object")
+        given = req.get("urls") or ([req["url"]] if req.get("url") else [])
+        urls = parse_urls("\n".join(u for u in given if isinstance(u, str)))
+        if not urls:
+            raise ApiError(400, "no valid http(s) URLs given")
+        save_path = self._save_path(req.get("save_path"))
+        quality = req.get("quality") or self.quality
+        if quality not in _QUALITIES:
+            raise ApiError(400, f"quality must be one of {', '.join(_QUALITIES)}")
+        options = self._options(req)
+        try:
+            priority = int(req.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ApiError(400, "priority must be an integer")
+        return self.queue.add_many(urls, save_path, quality,
+                                   bool(req.get("playlist")), bool(req.get("video")), priority, **options)
+
+    def _save_path(self, given):
+        # the client picks a folder under the configured download root, never one elsewhere on disk
+        if not self.save_path:
+            raise ApiError(400, "no download folder configured")
+        root = os.path.realpath(self.save_path)
+        if given is not None and not isinstance(given, str):
+            raise ApiError(400, "save_path must be a string")
+        path = os.path.realpath(os.path.join(root, given)) if given else root
+        try:
+            inside = os.path.commonpath([root, path]) == root
+        except ValueError:     # another drive on Windows
+            inside = False
+        if not inside:
+            raise ApiError(400, f"save_path must be inside {self.save_path}")
+        if not os.path.isdir(path):
+            raise ApiError(400, f"output folder does not exist: {given or self.save_path}")
+        return path
+
+    @staticmethod
+    def _options(req):
+        options = {}
+        rate = req.get("rate_limit")
+        if rate is not None:
+            try:
+                if isinstance(rate, bool) or (isinstance(rate, (int, float)) and rate < 0):
+                    raise ValueError(rate)
+                options["rate_limit"] = parse_rate(rate)
+            except ValueError:
+                raise ApiError(400, "rate_limit must be bytes per second, e.g. 500K or 2M")
+        segments = req.get("segments")
+        if segments is not None:
+            if isinstance(segments, bool) or not isinstance(segments, int) or not 1 <= segments <= _MAX_SEGMENTS:
+                raise ApiError(400, f"segments must be an integer from 1 to {_MAX_SEGMENTS}")
+            options["segments"] = segments
+        return options
@@ -0,0 +1,101 @@
+from __future__ import unicode_literals
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def file_checksum(path, chunk=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DownloadArchive(object):
+    """Indexed record of what has already been downloaded, and where to.
+
+    One row per (extractor, video id, format, quality, folder), so a lookup is a
+    primary-key hit no matter how many items are archived. A row only counts
+    while its output file still exists with the recorded size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            " extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL,"
+            " quality TEXT NOT NULL, folder TEXT NOT NULL, path TEXT NOT NULL,"
+            " size INTEGER, checksum TEXT, created REAL,"
+            " PRIMARY KEY (extractor, video_id, format, quality, folder)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _folder(folder):
+        return os.path.normcase(os.path.abspath(folder))
+
+    @staticmethod
+    def _extractor(name):
+        return (name or "").lower()
+
+    def lookup(self, extractor, video_id, fmt, quality, folder):
+        """Return the archived row as a dict, or None when absent or the file is gone."""
+        if not video_id:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size, checksum, created FROM archive"
+                " WHERE extractor=? AND video_id=? AND format=? AND quality=? AND folder=?",
+                (self._extractor(extractor), video_id, fmt, quality, self._folder(folder)),
+            ).fetchone()
+        if row is None:
+            return None
+        path, size, checksum, created = row
+        try:
+            if size is not None and os.path.getsize(path) != size:
+                return None
+        except OSError:
+            return None
+        return {"path": path, "size": size, "checksum": checksum, "created": created}
+
+    def contains(self, extractor, video_id, fmt, quality, folder):
+        return self.lookup(extractor, video_id, fmt, quality, folder) is not None
+
+    def record(self, extractor, video_id, fmt, quality, folder, path, checksum=True):
+        if not video_id or not path or not os.path.isfile(path):
+            return
+        size = os.path.getsize(path)
+        digest = file_checksum(path) if checksum else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO archive"
+                " (extractor, video_id, format, quality, folder, path, size, checksum, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._extractor(extractor), video_id, fmt, quality, self._folder(folder),
+                 os.path.abspath(path), size, digest, time.time()),
+            )
+            self._db.commit()
+
+    def forget(self, extractor, video_id, fmt, quality, folder):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM archive"
+                " WHERE extractor=? AND video_id=? AND format=? AND quality=? AND folder=?",
+                (self._extractor(extractor), video_id, fmt, quality, self._folder(folder)),
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM archive").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,28 +1,232 @@
 from __future__ import unicode_literals
+import gc
+import glob
 import os
 import re
-import sys
-import shutil
+import collections
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 import yt_dlp as ydl  # type: ignore
+from yt_dlp.utils import DownloadCancelled, supports_terminal_sequences  # type: ignore
+from yt_dlp.postprocessor import get_postprocessor, FFmpegMergerPP  # type: ignore
+
+from SegmentedDownload import SegmentedDownloader
+from BandwidthScheduler import Pacer, parse_rate
+from JobJournal import compact_entry
+from AppPaths import ffmpeg_exe
+from RetryPolicy import classify_error, host_of, RETRYABLE
+
+# flat playlists longer than this are streamed but not written to the metadata cache
+_CACHE_MAX_ENTRIES = 5000
+# re's private cache of compiled replacement templates (_compile_repl before Python 3.12)
+_RE_TEMPLATES = getattr(re, "_compile_template", None) or getattr(re, "_compile_repl", None)
+# info dict fields the progress taps hand to _emit; the rest of the dict is never copied
+_UI_KEYS = ("title", "filepath", "filename", "playlist_index", "n_entries", "playlist_count", "playlist_n")
+# heavy per-video metadata dropped in low-memory mode once the bytes are on disk
+_HEAVY_KEYS = ("formats", "requested_formats", "fragments", "thumbnails", "subtitles", "automatic_captions",
+               "heatmap", "chapters", "description", "requested_subtitles", "http_headers", "_format_sort_fields")
+
+def _slim(info):
+    """Info dict without the bulky metadata post-processing and the archive don't need."""
+    return {k: v for k, v in info.items() if k not in _HEAVY_KEYS}
+
+def _cacheable(info):
+    """JSON-safe copy of an info dict, without yt-dlp's private callables."""
+    info = ydl.YoutubeDL.sanitize_info(info)
+    return {k: v for k, v in info.items() if not k.startswith("__")}
+
+class ProgressThrottle(object):
+    """Dedupes and rate-limits progress payloads before they reach the UI.
+
+    yt-dlp reports the same tick through several taps (report_progress, the
+    progress hook and the logger). Identical payloads and backwards
+    "downloading" percentages are dropped, plain "downloading" ticks are
+    coalesced to at most ``rate_hz`` per second (the newest one wins), and any
+    other status is a transition that is always delivered at once.
+    """
+
+    # ``_last`` remembers this many items, far more than are ever in flight
+    MAX_TRACKED = 256
+
+    def __init__(self, callback, rate_hz=15):
+        self.callback = callback
+        self.interval = 1.0 / rate_hz if rate_hz else 0.0
+        self._lock = threading.Lock()
+        self._last = collections.OrderedDict()  # idx -> last delivered payload, most recent last
+        self._last_at = 0.0
+        self._pending = None    # newest coalesced payload not yet delivered
+        self.received = 0
+        self.delivered = 0
+
+    def __call__(self, payload):
+        with self._lock:
+            self.received += 1
+            last = self._last.get(payload.get("idx"))
+            if last == payload:
+                return
+            transition = (payload.get("status") != "downloading" or last is None
+                          or last.get("status") != "downloading")
+            if not transition and (payload.get("file_percent") or 0) < (last.get("file_percent") or 0):
+                return
+            now = time.monotonic()
+            if not transition and now - self._last_at < self.interval:
+                self._pending = payload
+                return
+            self._pending = None
+            self._remember(payload)
+            self._last_at = now
+            self.delivered += 1
+        self.callback(payload)
+
+    def _remember(self, payload):
+        # caller holds the lock
+        idx = payload.get("idx")
+        self._last[idx] = payload
+        self._last.move_to_end(idx)
+        if len(self._last) > self.MAX_TRACKED:
+            self._last.popitem(last=False)
+
+    def forget(self, idx):
+        """Drop what is remembered about a finished item."""
+        with self._lock:
+            self._last.pop(idx, None)
+
+    def flush(self):
+        """Deliver the newest coalesced payload, if one is waiting."""
+        with self._lock:
+            payload, self._pending = self._pending, None
+            if payload is None:
+                return
+            self._remember(payload)
+            self._last_at = time.monotonic()
+            self.delivered += 1
+        self.callback(payload)
+
+
+class _EntryStream(object):
+    """Playlist entries pulled on demand from yt-dlp's (possibly paged) entry iterator.
+
+    Nothing is materialised: the download loop pulls entries one by one, so
+    later pages are only requested once earlier entries are under way.
+    ``seen`` grows as entries arrive; ``total`` is the count the extractor
+    reported up front, or ``seen`` once the iterator runs dry (None until
+    then). ``on_entry(entry)`` and ``on_end()`` observe the stream. With
+    ``compact`` each entry is cut down to compact_entry() as it arrives, and
+    an extractor's ready-made entry list is consumed as it is read, so
+    entries already handed out can be freed.
+    """
+
+    def __init__(self, entries, total=None, on_entry=None, on_end=None, compact=False):
+        if compact and isinstance(entries, list):
+            entries = self._consume(entries)
+        self._it = iter(entries or ())
+        self._head = None       # entry peeked for the title, handed out first
+        self._lock = threading.Lock()
+        self.total = total
+        self.seen = 0
+        self.exhausted = False
+        self.on_entry = on_entry
+        self.on_end = on_end
+        self.compact = compact
+
+    @staticmethod
+    def _consume(entries):
+        entries.reverse()
+        while entries:
+            yield entries.pop()
+
+    def _pull(self):
+        for entry in self._it:
+            if entry:
+                if self.compact:
+                    entry = compact_entry(entry)
+                self.seen += 1
+                if self.on_entry:
+                    self.on_entry(entry)
+                return entry
+        if not self.exhausted:
+            self.exhausted = True
+            self.total = self.seen
+            self._it = iter(())
+            if self.on_end:
+                self.on_end()
+        return None
+
+    def peek(self):
+        with self._lock:
+            if self._head is None:
+                self._head = self._pull()
+            return self._head
+
+    def __iter__(self):
+        while True:
+            with self._lock:
+                entry, self._head = (self._head, None) if self._head is not None else (self._pull(), None)
+            if entry is None:
+                return
+            yield entry
+
+
+class _PostprocessPipeline(object):
+    """Post-processing pool fed by the playlist download workers.
+
+    At most ``depth`` entries may be downloading or waiting for FFmpeg at
+    once, so finished-but-unconverted files can't pile up on disk while the
+    CPU falls behind the network. A job that fails is appended to
+    ``failures`` as it fails, the list the download loop checks before
+    starting each entry.
+    """
+
+    def __init__(self, specs, workers, depth, failures=None):
+        self.specs = list(specs)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yt-postprocess")
+        self._slots = threading.BoundedSemaphore(depth)
+        self._futures = []
+        self._error = None      # first failure among futures already dropped from the list
+        self.failures = failures if failures is not None else []
+
+    def acquire(self, outer):
+        while not self._slots.acquire(timeout=0.25):
+            outer._check_cancelled()
+
+    def release(self):
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        # finished futures are dropped as we go, so a long playlist doesn't keep one per entry
+        pending = []
+        for f in self._futures:
+            if not f.done():
+                pending.append(f)
+            elif self._error is None and f.exception() is not None:
+                self._error = f.exception()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._settle)
+        pending.append(future)
+        self._futures = pending
+
+    def _settle(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.failures.append(future.exception())
+
+    def join(self):
+        if self._error is not None:
+            raise self._error
+        for f in list(self._futures):
+            f.result()  # re-raise the first post-processing failure
+
+    def close(self):
+        self._pool.shutdown(wait=True)
 
-def _resource_path(rel: str) -> str:
-    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base, rel)
-
-def _ffmpeg_exe():
-    # Try bundled copies first
-    candidates = [
-        _resource_path(os.path.join("tools", "ffmpeg", "ffmpeg.exe")),
-        _resource_path("ffmpeg.exe"),
-    ]
-    for c in candidates:
-        if os.path.isfile(c):
-            return c
-    # Fallback to PATH if the user already has ffmpeg
-    return shutil.which("ffmpeg") or ""
 
 class Download(object):
-    def __init__(self, url, save_path, quality, playlist=False, download_type=False, progress_cb=None):
+    def __init__(self, url, save_path, quality, playlist=False, download_type=False, progress_cb=None,
+                 concurrency=1, cache=None, archive=None, progress_rate=15, postprocess_workers=None,
+                 segments=1, journal=None, bandwidth=None, rate_limit=None, bandwidth_weight=1.0,
+                 metrics=None, formats=None, partial_policy="delete", context=None, retry=None,
+                 continue_on_error=False, store=None, low_memory=False, merger=None, sync=None):
         self.url = url
         self.save_path = save_path
         self.qualities = {"Best": "1411", "Semi": "320", "Worst": "128"}
@@ -30,8 +234,157 @@ class Download(object):
         self.playlist = playlist
         self.download_type = download_type  # False => audio, True => video
         self.progress_cb = progress_cb
-        self._total_items = None
-        self._current_index = 0 
+        # progress_rate: max "downloading" updates per second handed to progress_cb (0 = raw taps)
+        self._sink = ProgressThrottle(progress_cb, progress_rate) if progress_cb and progress_rate else progress_cb
+        self.concurrency = max(1, int(concurrency or 1))  # playlist entries downloaded at once
+        # playlist post-processing (FFmpeg) pool; 0 runs it inline after each download instead
+        self.postprocess_workers = (os.cpu_count() or 2) if postprocess_workers is None else int(postprocess_workers)
+        self.segments = max(1, int(segments or 1))  # connections per video stream (1 = yt-dlp's own downloader)
+        self.cache = cache  # optional MetadataCache for extracted info dicts
+        self.archive = archive  # optional DownloadArchive of finished items
+        self.journal = journal  # optional JobJournal; resumes from it when it already holds entries
+        self.bandwidth = bandwidth  # optional BandwidthScheduler shared by every running job
+        self.rate_limit = parse_rate(rate_limit)  # this job's own cap in bytes/s
+        self.bandwidth_weight = bandwidth_weight
+        self._lease = None
+        self.metrics = metrics  # optional Metrics hub; per-phase timings of this job go there
+        self._m = metrics.job(url) if metrics else None
+        self.formats = formats  # optional FormatSelector; picks format + post-processing per video
+        self.context = context  # optional DownloaderContext: shared connections, cookies and extractors
+        self._current_index = 0
+        self._lock = threading.Lock()
+        self._entry_percent = None  # idx -> file percent of entries in flight, only while running entries
+        self._done_percent = 0      # summed percent of entries already finished or skipped
+        self._unswept = 0           # entries sent through yt-dlp since the last low-memory sweep
+        self._probe = None          # flat extract_info result, shared by probe/count/download
+        self.entries = None         # _EntryStream of flat playlist entries (None for single videos)
+        self._cancel = threading.Event()
+        self._stop_mode = None      # "cancel" or "pause" once stopped
+        self.partial_policy = partial_policy  # on cancel: "delete" or "keep" the partial files
+        self._partials = {}         # idx -> unfinished files of entries in flight
+        self.retry = retry          # optional RetryPolicy: per-item retries, backoff, per-host breakers
+        self.continue_on_error = continue_on_error  # playlists: record failed entries and keep going
+        self.failed = []            # failed-items report: one dict per entry given up on
+        self.store = store          # optional ContentStore: each video fetched and converted once
+        self._pp_started = {}       # (idx, postprocessor) -> start, for the store's CPU accounting
+        self._pp_seconds = {}       # idx -> FFmpeg seconds spent on that item
+        self._decided = set()       # idx of entries in flight whose format decision has been counted
+        # low_memory: entries are held as compact records, finished entries' metadata is dropped at
+        # once, and neither the journal nor the metadata cache keeps the playlist's entry list
+        self.low_memory = low_memory
+        if journal is not None and low_memory:
+            journal.compact = True
+        self.merger = merger        # optional MergePool: video+audio merges run there instead of in yt-dlp
+        self.sync = sync            # optional PlaylistSync: playlists are compared with their last snapshot
+        self._sync_plan = None      # SyncPlan of this run's playlist
+        self.sync_report = None     # added/removed/moved/changed entries, once the playlist is listed
+
+    @property
+    def _total_items(self):
+        # None for single videos and for playlists still being expanded
+        return self.entries.total if self.entries is not None else None
+
+    def _next_index(self):
+        with self._lock:
+            self._current_index += 1
+            return self._current_index
+
+    # ---------- cancellation ----------
+    def cancel(self, keep_partial=None):
+        """Stop at the next progress tick.
+
+        Partial files are removed or kept according to ``partial_policy``
+        unless ``keep_partial`` says otherwise.
+        """
+        if keep_partial is not None:
+            self.partial_policy = "keep" if keep_partial else "delete"
+        self._stop_mode = self._stop_mode or "cancel"
+        self._cancel.set()
+
+    def pause(self):
+        """Stop at the next progress tick and keep the .part files.
+
+        The connection is dropped; a new Download of the same job continues
+        from the bytes already on disk (yt-dlp's continuedl, or the saved
+        ranges of a segmented download).
+        """
+        self._stop_mode = "pause"
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise DownloadCancelled("Download paused" if self._stop_mode == "pause" else "Download cancelled")
+
+    # ---------- retries ----------
+    def _retrying(self, fn, url, idx=None):
+        """``fn()`` under the retry policy: backoff between tries, the host's breaker around each.
+
+        Without ``retry`` it is a plain call. The exception of the last try
+        is re-raised with an ``attempts`` attribute.
+        """
+        if not self.retry:
+            return fn()
+        breaker = self.retry.breaker(host_of(url, host_of(self.url)))
+        attempt = 0
+        while True:
+            attempt += 1
+            with breaker.slot(self._check_cancelled, url):
+                try:
+                    result = fn()
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    kind, status, retry_after = classify_error(e)
+                    breaker.record(kind, retry_after, url)
+                    if kind not in RETRYABLE or attempt >= self.retry.attempts:
+                        e.attempts = attempt
+                        raise
+                    reason = f"{kind} {status}" if status else f"{kind}: {e}"
+                else:
+                    breaker.record(None, item=url)
+                    return result
+            delay = self.retry.backoff(attempt, retry_after)
+            if self._m:
+                self._m.retry(f"{reason}; try {attempt + 1}/{self.retry.attempts} in {delay:.1f}s", idx)
+            self._emit(status="retrying", file_percent=0,
+                       info={"playlist_index": idx, "n_entries": self._total_items} if idx else None)
+            if self._cancel.wait(delay):
+                self._check_cancelled()
+
+    def _record_failure(self, entry, idx, error):
+        kind, status, _ = classify_error(error)
+        with self._lock:
+            self.failed.append({"idx": idx, "title": entry.get("title"),
+                                "url": entry.get("url") or entry.get("webpage_url") or entry.get("id"),
+                                "error": str(error), "kind": kind, "status": status,
+                                "attempts": getattr(error, "attempts", 1)})
+        self._emit(status="failed", file_percent=0,
+                   info={"title": entry.get("title") or "", "playlist_index": idx, "n_entries": self._total_items})
+
+    # ---------- partial files ----------
+    def _track_partial(self, idx, *paths):
+        with self._lock:
+            self._partials.setdefault(idx or 0, set()).update(p for p in paths if p)
+
+    def _partials_done(self, idx):
+        with self._lock:
+            self._partials.pop(idx or 0, None)
+
+    def _discard_partials(self):
+        with self._lock:
+            paths = [p for group in self._partials.values() for p in group]
+            self._partials.clear()
+        for p in paths:
+            # yt-dlp's fragment downloads leave .part-FragN pieces and a .ytdl state file next to it
+            for f in [p, p + ".ytdl", p + ".ranges"] + glob.glob(glob.escape(p) + "-Frag*"):
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
 
     # ---------- emit to UI ----------
     def _emit(self, *, status=None, file_percent=None, overall_percent=None, info=None):
@@ -45,41 +398,65 @@ class Download(object):
         total_items = (info.get("n_entries") or info.get("playlist_count")
                        or info.get("playlist_n") or self._total_items)
 
+        if idx and file_percent is not None and self._entry_percent is not None:
+            # several entries in flight -> overall is the mean over all entries
+            with self._lock:
+                self._entry_percent[int(idx)] = max(self._entry_percent.get(int(idx), 0), file_percent)
+                done = self._done_percent + sum(self._entry_percent.values())
+            if overall_percent is None and total_items:
+                overall_percent = max(0, min(100, int(done / int(total_items))))
         if overall_percent is None and idx and total_items and file_percent is not None:
             overall_percent = int(((int(idx) - 1) + (file_percent / 100.0)) * 100 / int(total_items))
             overall_percent = max(0, min(100, overall_percent))
         if not self.playlist and file_percent is not None and overall_percent is None:
             overall_percent = file_percent
 
+        payload = {
+            "status": status,
+            "file_percent": file_percent,
+            "overall_percent": overall_percent,
+            "idx": idx,
+            "total": total_items,
+            "title": title,
+        }
+        if self.entries is not None and not total_items:
+            # playlist still being expanded: total unknown, "seen" keeps growing
+            payload["seen"] = self.entries.seen
         try:
-            self.progress_cb({
-                "status": status,
-                "file_percent": file_percent,
-                "overall_percent": overall_percent,
-                "idx": idx,
-                "total": total_items,
-                "title": title,
-            })
+            self._sink(payload)
         except Exception:
             pass
 
+    def _received(self, idx, downloaded):
+        # a transfer tick: the entry's download phase is open by now (dl() opens it when the request
+        # goes out; this is a fallback) and stays open across its streams; it is closed once, when
+        # post-processing starts or the entry is processed
+        self._m.begin("download", idx)
+        if downloaded:
+            self._m.first_byte(idx)
+            self._m.bytes(idx, downloaded)
+
     # ---------- super-reliable taps ----------
     class _YDL(ydl.YoutubeDL):
-        def __init__(self, params=None, *, outer=None):
+        def __init__(self, params=None, *, outer=None, index=None):
             self._outer = outer
+            self._index = index  # fixed playlist index when downloading a single entry
             super().__init__(params or {})
+            if outer and outer.context:
+                outer.context.bind(self)
 
         def _with_indexed_info(self, info):
-            """Ensure playlist_index and n_entries are always present for the UI."""
+            """The fields the UI reads, with playlist_index and n_entries always present.
+
+            Only those few keys are copied: this runs on every progress tick.
+            """
             if not self._outer:
                 return info
-            if info is None:
-                info = {}
-            info = dict(info)  # copy
+            info = {k: info[k] for k in _UI_KEYS if k in info} if info else {}
             # ensure index
             if self._outer.playlist and not info.get("playlist_index"):
                 # if we've started processing, _current_index >= 1
-                info["playlist_index"] = max(1, self._outer._current_index)
+                info["playlist_index"] = self._index or max(1, self._outer._current_index)
             # ensure total
             if self._outer._total_items and not info.get("n_entries"):
                 info["n_entries"] = self._outer._total_items
@@ -101,13 +478,26 @@ class Download(object):
         # starting per-file
         def process_info(self, info_dict):
             if self._outer:
+                self._outer._check_cancelled()
                 # advance our per-item counter for playlists
-                if self._outer.playlist:
-                    self._outer._current_index += 1
+                if self._outer.playlist and self._index is None:
+                    self._outer._next_index()
                 info_for_ui = self._with_indexed_info(info_dict)
                 self._outer._emit(status="starting", file_percent=0, info=info_for_ui)
             return super().process_info(info_dict)
 
+        def dl(self, name, info, subtitle=False, test=False):
+            if self._outer and self._outer._m and not (subtitle or test):
+                # the stream's request goes out now: its time to first byte counts from here
+                self._outer._m.begin("download", self._with_indexed_info(info).get("playlist_index"))
+            return super().dl(name, info, subtitle=subtitle, test=test)
+
+        def run_pp(self, pp, infodict):
+            # yt-dlp queues its FFmpegMergerPP for every video+audio download; hand those to the merge pool
+            if self._outer and self._outer.merger and isinstance(pp, FFmpegMergerPP):
+                return self._outer._merge(self, infodict)
+            return super().run_pp(pp, infodict)
+
         def report_destination(self, filename):
             super().report_destination(filename)
             if self._outer:
@@ -130,16 +520,27 @@ class Download(object):
     class _Logger:
         _pct = re.compile(r'\b(\d{1,3}(?:\.\d)?)%')
 
-        def __init__(self, outer):
+        def __init__(self, outer, index=None):
             self.o = outer
+            self.index = index
             self.last_title = None
 
         def info(self, msg):   self._parse(msg)
         def debug(self, msg):  self._parse(msg)
-        def warning(self, msg): pass
-        def error(self, msg):   pass
+        def warning(self, msg):
+            if self.o._m:
+                if "Retrying" in msg:
+                    self.o._m.retry(msg, self.index)
+                else:
+                    self.o._m.warning(msg, self.index)
+
+        def error(self, msg):
+            if self.o._m:
+                self.o._m.error(msg, self.index)
 
         def _parse(self, msg: str):
+            if self.o._m and "Retrying" in msg:
+                self.o._m.retry(msg, self.index)
             if "Destination:" in msg:
                 t = os.path.basename(msg.split("Destination:", 1)[1].strip())
                 if "." in t:
@@ -148,14 +549,17 @@ class Download(object):
                 info = {"title": t}
                 # inject index/total for the UI
                 if self.o.playlist:
-                    info["playlist_index"] = max(1, self.o._current_index or 1)
+                    info["playlist_index"] = self.index or max(1, self.o._current_index or 1)
                 if self.o._total_items:
                     info["n_entries"] = self.o._total_items
                 self.o._emit(status="downloading", file_percent=1, info=info)
                 return
 
             if "Merging formats into" in msg or "ExtractAudio" in msg:
-                self.o._emit(status="postprocess", file_percent=100, info={"title": self.last_title or ""})
+                info = {"title": self.last_title or ""}
+                if self.index:
+                    info["playlist_index"] = self.index
+                self.o._emit(status="postprocess", file_percent=100, info=info)
 
     # standard hooks as well
     def _percent_from_bytes(self, d):
@@ -166,6 +570,7 @@ class Download(object):
         return 1 if dl else None
 
     def _yt_progress_hook(self, d):
+        self._check_cancelled()
         info = d.get("info_dict") or {}
         
         if self.playlist and not info.get("playlist_index"):
@@ -174,7 +579,16 @@ class Download(object):
             info["n_entries"] = self._total_items
             
         status = d.get("status")
+        if d.get("tmpfilename"):
+            # a finished stream is partial too until its entry is complete (merge / audio extraction)
+            self._track_partial(info.get("playlist_index"), d["tmpfilename"],
+                                d.get("filename") if status == "finished" else None)
+        if self.journal and status == "downloading":
+            self.journal.progress(info.get("playlist_index") or 1, d.get("tmpfilename"),
+                                  d.get("downloaded_bytes"), d.get("total_bytes") or d.get("total_bytes_estimate"))
         if status == "downloading":
+            if self._m:
+                self._received(info.get("playlist_index"), d.get("downloaded_bytes"))
             self._emit(status="downloading", file_percent=self._percent_from_bytes(d), info=info)
         elif status == "finished":
             self._emit(status="finished", file_percent=100, info=info)
@@ -185,13 +599,26 @@ class Download(object):
             info["playlist_index"] = max(1, self._current_index)
         if self._total_items and not info.get("n_entries"):
             info["n_entries"] = self._total_items
+        if self.store:
+            key = (info.get("playlist_index") or 0, d.get("postprocessor"))
+            if d.get("status") == "started":
+                self._pp_started[key] = time.monotonic()
+            elif d.get("status") == "finished" and key in self._pp_started:
+                self._pp_time(key[0], time.monotonic() - self._pp_started.pop(key))
+        if self._m:
+            phase = "merge" if d.get("postprocessor") == "Merger" else "postprocess"
+            if d.get("status") == "started":
+                self._m.end("download", info.get("playlist_index"))
+                self._m.begin(phase, info.get("playlist_index"))
+            elif d.get("status") == "finished":
+                self._m.end(phase, info.get("playlist_index"), postprocessor=d.get("postprocessor"))
         self._emit(status="postprocess", file_percent=100, info=info)
 
     # ---------- options ----------
     @property
     def common_opts(self):
         fmt = "bestaudio/best" if not self.download_type else "bv*+ba/b"
-        ffmpeg_path = _ffmpeg_exe()
+        ffmpeg_path = ffmpeg_exe()
         opts = {
             "fixup": "detect_or_warn",
             "format": fmt,
@@ -204,51 +631,617 @@ class Download(object):
             "progress_with_newline": True,
             "logger": self._Logger(self),
         }
+        if self.rate_limit and not self.bandwidth:
+            opts["ratelimit"] = self.rate_limit
         if ffmpeg_path:
             # yt-dlp accepts either the folder containing ffmpeg or the exe itself
             opts["ffmpeg_location"] = os.path.dirname(ffmpeg_path) if os.path.isfile(ffmpeg_path) else ffmpeg_path
 
-        if self.progress_cb:
-            opts["progress_hooks"] = [self._yt_progress_hook]
+        opts["progress_hooks"] = [self._yt_progress_hook]
+        if self.progress_cb or self._m or self.store:
             opts["postprocessor_hooks"] = [self._yt_postprocessor_hook]
         return opts
 
-    def _prefetch_total_items(self, base_opts):
-        if not self.playlist or self._total_items is not None:
+    # ---------- single extraction pass ----------
+    @staticmethod
+    def _resolve(y, url):
+        """extract_info without processing, following url/url_transparent hops.
+
+        Playlist entries stay whatever the extractor returned (often a lazy,
+        paged generator) instead of being expanded into a list.
+        """
+        info = y.extract_info(url, download=False, process=False) or {}
+        for _ in range(5):
+            if info.get("_type") not in ("url", "url_transparent"):
+                break
+            nxt = y.extract_info(info["url"], download=False, process=False, ie_key=info.get("ie_key")) or {}
+            if info.get("_type") == "url_transparent":
+                # like yt-dlp: fields set on the transparent result win over the target's
+                extra = {k: v for k, v in info.items() if v is not None and k not in ("_type", "url", "ie_key", "id")}
+                nxt = dict(nxt, **extra)
+            info = nxt
+        return info
+
+    @contextmanager
+    def _extractor(self, opts, idx=None):
+        """A YoutubeDL for extraction only: borrowed from the shared context, or a fresh one."""
+        if self.context:
+            with self.context.extractor(opts, opts.get("logger") and self._Logger(self, index=idx)) as y:
+                yield y
+        elif opts.get("logger"):
+            yield self._YDL(opts, outer=self, index=idx)
+        else:
+            yield ydl.YoutubeDL(opts)
+
+    def _close(self, y):
+        """Close a YoutubeDL this download made for one item, dropping its open connections.
+
+        Instances bound to a shared context use the context's connection
+        pool, which stays open for the next download.
+        """
+        if y is not None and not self.context:
+            y.close()
+
+    def probe(self):
+        """Resolve the URL once, leaving playlists unexpanded.
+
+        The result is shared by the UI title probe, the total-items count and
+        the download itself, so a click resolves the URL exactly one time.
+        Playlist entries become a lazy ``_EntryStream`` in ``self.entries``:
+        the first items download while later pages are still being fetched.
+        """
+        if self._probe is not None:
+            return self._probe
+        if self.journal and self.journal.entries is not None and self.journal.entries_complete:
+            # resuming: the journal already holds the expanded playlist
+            self.entries = _EntryStream(self.journal.entries, len(self.journal.entries))
+            self._probe = {"_type": "playlist", "title": self.journal.title}
+            return self._probe
+        opts = dict(self.common_opts)
+        opts.pop("progress_hooks", None)
+        opts.pop("postprocessor_hooks", None)
+        opts.pop("logger", None)
+        opts.update({"quiet": True, "extract_flat": "in_playlist", "skip_download": True})
+        # a sync needs the live listing, never a cached one
+        info = self.cache.get(self.url, opts) if self.cache and not self.sync else None
+        cached = info is not None
+        if info is None:
+            with self._m.phase("extract") if self._m else nullcontext(), self._extractor(opts) as y:
+                info = self._retrying(lambda: self._resolve(y, self.url), self.url)
+        if info.get("_type") == "playlist" or "entries" in info:
+            entries = info.get("entries")
+            head = {k: v for k, v in info.items() if k != "entries"}
+            total = len(entries) if isinstance(entries, list) else info.get("playlist_count")
+            if self.sync:
+                entries = self._sync_entries(head, entries)
+            self.entries = self._entry_stream(entries, total, head, None if cached or self.sync else opts)
+            info = head
+        elif self.cache and not cached:
+            info = _cacheable(info)
+            self.cache.put(self.url, opts, info)
+        self._probe = info
+        return info
+
+    def _sync_entries(self, head, entries):
+        """List the playlist against its sync snapshot; the plan, walked as the entries are pulled."""
+        key = self.sync.key(self.url, self.save_path, f"{self._kind}:{self.quality}")
+
+        def on_listed(plan):
+            # the whole listing is known now (tail entries may still be waiting to be pulled)
+            if self.entries is not None:
+                self.entries.total = len(plan.entries)
+            self.sync_report = r = plan.report()
+            if self._m:
+                self._m.event("sync", listed=r["listed"], total=r["total"], stopped_early=r["stopped_early"],
+                              added=len(r["added"]), removed=len(r["removed"]), moved=len(r["moved"]),
+                              changed=len(r["changed"]))
+        self._sync_plan = self.sync.plan(key, head, entries, on_listed)
+        return self._sync_plan
+
+    def _entry_stream(self, entries, total, head, cache_opts):
+        """Wrap the entry iterator so the journal and cache see entries as they stream by."""
+        kept = [] if self.cache and cache_opts is not None and not self.low_memory else None
+        listed = self.journal and not self.low_memory     # low memory: a resume re-reads the playlist
+        if self.journal:
+            self.journal.set_entries([] if listed else None, title=head.get("title"), complete=False)
+
+        def on_entry(entry):
+            nonlocal kept
+            if listed:
+                self.journal.add_entry(entry)
+            if kept is not None:
+                if len(kept) < _CACHE_MAX_ENTRIES:
+                    kept.append(compact_entry(entry))
+                else:
+                    kept = None     # too long to cache; stop holding entries in memory
+
+        def on_end():
+            if listed:
+                self.journal.entries_done()
+            if kept is not None:
+                self.cache.put(self.url, cache_opts, _cacheable(dict(head, entries=kept)))
+
+        return _EntryStream(entries, total, on_entry, on_end, compact=self.low_memory)
+
+    def first_title(self):
+        """(title, idx, total) of the first item, for the UI before any byte arrives.
+
+        For playlists only the first entry is pulled; total is None while the
+        length is still unknown.
+        """
+        info = self.probe()
+        if self.entries is not None:
+            first = self.entries.peek()
+            if first:
+                return first.get("title") or first.get("fulltitle"), 1, self.entries.total
+        return info.get("title") or info.get("fulltitle"), None, None
+
+    # ---------- download archive ----------
+    @property
+    def _kind(self):
+        return "mp4" if self.download_type else "mp3"
+
+    @staticmethod
+    def _archive_key(item):
+        """(extractor, id) an item is archived under, for a flat entry and a resolved info dict alike."""
+        return item.get("ie_key") or item.get("extractor_key"), item.get("id")
+
+    def _archived(self, info):
+        if self.archive is None:     # an empty archive is falsy (len 0) but still records
+            return False
+        return self.archive.contains(*self._archive_key(info), self._kind, self.quality, self.save_path)
+
+    def _archive_record(self, info, entry=None):
+        """Archive a finished item under the key of ``entry``, what the next run looks it up by, if known."""
+        if self.archive is None or not info:
             return
+        extractor, video_id = self._archive_key(entry if entry and entry.get("id") else info)
+        self.archive.record(extractor, video_id, self._kind, self.quality, self.save_path, self._final_path(info))
+
+    # ---------- content store ----------
+    def _store_key(self, info):
+        extractor = info.get("ie_key") or info.get("extractor_key")
+        if not self.store or not extractor or not info.get("id"):
+            return None
+        variant = self.formats.signature(self.download_type, self.quality) if self.formats else "default"
+        return self.store.key(extractor, info["id"], f"{self._kind}:{self.quality}:{variant}")
+
+    def _from_store(self, info, idx=None, entry=None):
+        """Materialise an item the store already holds into save_path; its info dict, or None."""
+        key = self._store_key(info)
+        path = self.store.materialise(key, self.save_path) if key else None
+        if path is None:
+            return None
+        info = dict(info, filepath=path, extractor_key=info.get("extractor_key") or info.get("ie_key"))
+        self._emit(status="stored", file_percent=100,
+                   info=dict(info, playlist_index=idx, n_entries=self._total_items) if idx else info)
+        self._archive_record(info, entry)
+        return info
+
+    def _pp_time(self, idx, seconds):
+        with self._lock:
+            self._pp_seconds[idx or 0] = self._pp_seconds.get(idx or 0, 0.0) + seconds
+
+    def _record_item(self, info, entry=None):
+        """A finished item goes into the download archive and the content store."""
+        self._archive_record(info, entry)
+        key = self._store_key(info or {})
+        if key:
+            with self._lock:
+                cpu_s = self._pp_seconds.pop(info.get("playlist_index") or 0, 0.0)
+            self.store.put(key, self._final_path(info), cpu_s)
+
+    @staticmethod
+    def _final_path(info):
+        downloads = info.get("requested_downloads") or [{}]
+        return info.get("filepath") or downloads[-1].get("filepath")
+
+    # ---------- processing one resolved item ----------
+    def _format_overrides(self, info, idx=None):
+        """Options the FormatSelector chose for this video (empty: keep the job's defaults).
+
+        A retry decides again but is not counted again, so each entry adds
+        its savings to the stats and metrics once however many tries it takes.
+        """
+        with self._lock:
+            first = (idx or 0) not in self._decided
+            self._decided.add(idx or 0)
+        decision = self.formats.decide(info, self.download_type, self.quality, count=first) if self.formats else None
+        if not decision:
+            return {}
+        if self._m and first:
+            self._m.event("format", idx, action=decision["action"], format=decision["format"],
+                          bytes_saved=decision["bytes_saved"], cpu_saved_s=decision["cpu_saved_s"])
+        overrides = {"format": decision["format"]}
+        if decision.get("postprocessors"):
+            overrides["postprocessors"] = decision["postprocessors"]
+        return overrides
+
+    @contextmanager
+    def _metered(self, y):
+        """Give this yt-dlp instance its slice of the job's bandwidth while it runs."""
+        if self._lease:
+            self._lease.attach(y.params)
         try:
-            opts = dict(base_opts)
-            opts.pop("progress_hooks", None)
-            opts.pop("postprocessor_hooks", None)
-            opts.pop("logger", None)
-            y = self._YDL(opts, outer=None)
-            info = y.extract_info(self.url, download=False)
-            entries = info.get("entries") or []
-            self._total_items = sum(1 for e in entries if e)
-        except Exception:
-            self._total_items = None
+            yield y
+        finally:
+            if self._lease:
+                self._lease.detach(y.params)
+
+    def _process(self, y, info, extra=None):
+        with self._metered(y):
+            if self.segments > 1 and self.download_type:
+                result = self._segmented(y, info, extra)
+            else:
+                result = y.process_ie_result(info, download=True, extra_info=extra)
+        if self._m:
+            self._m.end("download", (extra or {}).get("playlist_index"))
+        return result
+
+    def _segmented(self, y, info, extra=None):
+        """Fetch video and audio streams side by side, each over several connections, then merge."""
+        info = y.process_ie_result(info, download=False, extra_info=extra)
+        formats = info.get("requested_formats") or [info]
+        if any(f.get("protocol") not in ("http", "https") for f in formats):
+            # DASH/HLS manifests and friends stay with yt-dlp's own downloaders
+            return y.process_ie_result(info, download=True)
+
+        final = y.prepare_filename(info)
+        base = os.path.splitext(final)[0]
+        paths = [f"{base}.f{f['format_id']}.{f['ext']}" for f in formats]
+        done = [0] * len(formats)
+        sizes = [f.get("filesize") or f.get("filesize_approx") or 0 for f in formats]
+        self._emit(status="destination", file_percent=0, info=info)
+        # one pacer for all streams: they share this instance's rate
+        pacer = Pacer(y.params) if y.params.get("ratelimit") or self._lease else None
+
+        idx = info.get("playlist_index")
+        self._track_partial(idx, *paths, *(p + ".part" for p in paths))
+
+        if self._m:
+            self._m.begin("download", idx)
+
+        def fetch(i):
+            def progress(n, total):
+                self._check_cancelled()
+                done[i], sizes[i] = n, total or sizes[i]
+                if self._m:
+                    self._received(idx, sum(done))
+                whole = sum(sizes)
+                if whole:
+                    self._emit(status="downloading", file_percent=min(100, int(sum(done) * 100 / whole)), info=info)
+            fmt = formats[i]
+            SegmentedDownloader(self.segments, progress=progress, throttle=pacer).fetch(fmt["url"], paths[i], fmt.get("http_headers"))
+
+        with ThreadPoolExecutor(max_workers=len(formats), thread_name_prefix="yt-stream") as pool:
+            for f in [pool.submit(fetch, i) for i in range(len(formats))]:
+                f.result()
+        if self._m:
+            self._m.end("download", idx)
+        self._emit(status="finished", file_percent=100, info=info)
+
+        if len(paths) > 1:
+            info["__files_to_merge"] = paths
+            info["filepath"] = final
+            if self.merger:
+                info = self._merge(y, info)
+            else:
+                self._emit(status="postprocess", file_percent=100, info=info)
+                started = time.monotonic()
+                with self._m.phase("merge", idx) if self._m else nullcontext():
+                    info = y.run_pp(FFmpegMergerPP(y), info)
+                self._pp_time(idx, time.monotonic() - started)
+        else:
+            os.replace(paths[0], final)
+            info["filepath"] = final
+        return info
+
+    def _merge(self, y, info):
+        """Merge ``info``'s downloaded streams into its filepath on the MergePool."""
+        idx = info.get("playlist_index")
+        files = info["__files_to_merge"]
+        if self._m:
+            self._m.end("download", idx)
+        self._emit(status="postprocess", file_percent=100, info=info)
+        with self._m.phase("merge", idx) if self._m else nullcontext():
+            result = self.merger.merge(files, info["filepath"])
+        self._pp_time(idx, result["seconds"])
+        if self._m:
+            self._m.event("merge", idx, method=result["method"], seconds=result["seconds"],
+                          threads=result["threads"])
+        if not y.params.get("keepvideo"):
+            for f in files:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+        return info
+
+    # ---------- playlist engine ----------
+    def _entry_done(self, idx, info=None):
+        self._entry_settled(idx)
+        if self._sync_plan:
+            self._sync_plan.mark_done(idx)
+        self._partials_done(idx)
+        if self.journal:
+            self.journal.mark(idx, "done", filepath=self._final_path(info or {}))
+        if self._m:
+            self._m.entry_done(idx)
+
+    def _entry_settled(self, idx):
+        # finished entries leave the in-flight map, so it stays as small as the worker pool
+        with self._lock:
+            self._decided.discard(idx)
+            self._pp_seconds.pop(idx or 0, None)
+            # low memory: at most one worker pool's worth of finished entries' yt-dlp leftovers at a time
+            sweep = self.low_memory and self._unswept >= self.concurrency
+            if sweep:
+                self._unswept = 0
+            if self._entry_percent is not None:
+                self._entry_percent.pop(idx, None)
+                self._done_percent += 100
+        if isinstance(self._sink, ProgressThrottle):
+            self._sink.forget(idx)
+        if sweep:
+            self._sweep()
+
+    @staticmethod
+    def _sweep():
+        """Free what finished entries' yt-dlp instances leave behind."""
+        # yt-dlp caches terminal support per logger for good, and every entry has its own logger
+        supports_terminal_sequences.cache_clear()
+        # every YoutubeDL leaves a one-off, randomly prefixed template in re's cache; re.purge() would
+        # also drop the compiled extractor patterns every entry needs again
+        if hasattr(_RE_TEMPLATES, "cache_clear"):
+            _RE_TEMPLATES.cache_clear()
+        # the instances themselves are reference cycles (extractors, downloaders and post-processors
+        # point back at them): free them now rather than at the collector's next full pass
+        gc.collect()
+
+    def _download_entry(self, base_opts, entry, idx, total, pipeline=None):
+        self._check_cancelled()
+        stored = self._from_store(entry, idx)
+        if stored:
+            self._entry_done(idx, stored)
+            return
+        opts = dict(base_opts)
+        opts["noplaylist"] = True
+        opts["logger"] = self._Logger(self, index=idx)
+        if pipeline:
+            # post-processing happens in the pipeline pool, not inline
+            opts.pop("postprocessors", None)
+            pipeline.acquire(self)
+        url = entry.get("url") or entry.get("webpage_url") or entry.get("id")
+        try:
+            y, info, specs = self._retrying(lambda: self._fetch_entry(opts, base_opts, entry, url, idx, total,
+                                                                      pipeline), url, idx)
+        except BaseException as e:
+            if pipeline:
+                pipeline.release()
+            if self._entry_failed(entry, idx, e):
+                return
+            raise
+        if y is None:
+            # materialised from the content store: nothing to convert
+            if pipeline:
+                pipeline.release()
+            self._entry_done(idx, info)
+            return
+        if pipeline:
+            if self.low_memory:
+                info = _slim(info)  # the pipeline may hold it a while before FFmpeg gets to it
+            pipeline.submit(self._postprocess_entry, y, info, idx, pipeline, specs, entry)
+            return
+        self._close(y)
+        self._record_item(info, entry)
+        self._entry_done(idx, info)
+
+    def _fetch_entry(self, opts, base_opts, entry, url, idx, total, pipeline=None):
+        """One try at an entry: extract (or take from the cache), pick formats, download.
+
+        Returns (y, info, specs); y is None when the content store already had the video.
+        """
+        y = None
+        with self._lock:
+            # FFmpeg time of a failed earlier try is not part of what this file cost
+            self._pp_seconds.pop(idx or 0, None)
+            self._unswept += 1
+        # extra_info rides along into every hook's info_dict, like yt-dlp's own playlist loop; without
+        # "playlist" yt-dlp takes the video for a lone one and drops playlist_index
+        extra = {"playlist": (self._probe or {}).get("title"), "playlist_index": idx, "n_entries": total,
+                 "playlist_count": total}
+        try:
+            raw = self.cache.get(url, opts) if self.cache else None
+            if raw is None:
+                with self._m.phase("extract", idx) if self._m else nullcontext(), \
+                        self._extractor(opts, idx) as ey:
+                    if not self.context:
+                        y = ey  # no pool: keep the instance for the download as before
+                    raw = ey.extract_info(url, download=False, process=False, ie_key=entry.get("ie_key"))
+                if self.cache:
+                    raw = _cacheable(raw)
+                    self.cache.put(url, opts, raw)
+            stored = self._from_store(raw, idx, entry)
+            if stored:
+                self._close(y)
+                return None, stored, None
+            overrides = self._format_overrides(raw, idx)
+            specs = overrides.get("postprocessors") or base_opts.get("postprocessors")
+            if pipeline:
+                overrides.pop("postprocessors", None)
+            if y is None or overrides:
+                self._close(y)
+                y = self._YDL(dict(opts, **overrides), outer=self, index=idx)
+            return y, self._process(y, raw, extra), specs
+        except BaseException:
+            # a retry starts over with a new instance
+            self._close(y)
+            raise
+
+    def _entry_failed(self, entry, idx, error):
+        """Book a failed entry in the journal and metrics; True if the run carries on without it."""
+        if isinstance(error, DownloadCancelled):
+            return False
+        if self.journal:
+            self.journal.mark(idx, "failed", error=str(error))
+        if self._m:
+            self._m.error(str(error), idx)
+            self._m.entry_done(idx, ok=False)
+        if self.continue_on_error and isinstance(error, Exception):
+            # give up on this entry only; the rest of the playlist carries on
+            self._record_failure(entry, idx, error)
+            self._entry_settled(idx)
+            return True
+        return False
+
+    def _postprocess_entry(self, y, info, idx, pipeline, specs=None, entry=None):
+        try:
+            self._check_cancelled()
+            info = dict(info)
+            info["filepath"] = self._final_path(info)
+            self._emit(status="postprocess", file_percent=0, info=info)
+            for spec in specs or pipeline.specs:
+                spec = dict(spec)
+                pp = get_postprocessor(spec.pop("key"))(y, **spec)
+                if self.progress_cb or self._m or self.store:
+                    pp.add_progress_hook(self._yt_postprocessor_hook)
+                info = y.run_pp(pp, info)
+            self._record_item(info, entry)
+        except BaseException as e:
+            # a failed conversion fails its entry, as a failed download does
+            if self._entry_failed(entry or {"title": info.get("title")}, idx, e):
+                return
+            raise
+        else:
+            self._entry_done(idx, info)
+        finally:
+            self._close(y)
+            pipeline.release()
+
+    def _run_entries(self, opts):
+        """Download entries as the stream yields them, at most ``concurrency`` at a time.
+
+        Entries are pulled only when a worker is free, so memory stays bounded
+        by the pool size whatever the playlist length, and the first items
+        start while the extractor is still paging through the rest.
+        """
+        self._entry_percent = {}
+        self._done_percent = 0
+        pipeline = None
+        # failed downloads and failed conversions alike: no further entry starts after one
+        failures = []
+        if opts.get("postprocessors") and self.postprocess_workers > 0 and self.entries.total != 1:
+            pipeline = _PostprocessPipeline(opts["postprocessors"], self.postprocess_workers,
+                                            depth=self.concurrency + self.postprocess_workers, failures=failures)
+        slots = threading.Semaphore(self.concurrency)
+
+        def settle(future):
+            slots.release()
+            if not future.cancelled() and future.exception() is not None:
+                failures.append(future.exception())
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="yt-entry") as pool:
+                plan = self._sync_plan
+                for i, e in enumerate(self.entries, start=1):
+                    if plan and plan.is_done(e) and (self.archive is None or self._archived(e)):
+                        # fetched by an earlier sync, unchanged and (per the archive) still on disk:
+                        # not even a "skipped" update
+                        self._entry_settled(i)
+                        continue
+                    if (self.journal and self.journal.is_done(i)) or (self._archived(e) and not
+                                                                       (plan and plan.is_changed(e))):
+                        if plan:
+                            plan.mark_done(i)
+                        # already fetched into this folder -> no extraction, no download
+                        self._emit(status="skipped", file_percent=100,
+                                   info={"title": e.get("title") or "", "playlist_index": i,
+                                         "n_entries": self.entries.total})
+                        self._entry_settled(i)
+                        continue
+                    if not self._take_slot(slots, failures):
+                        break   # stop pulling entries after the first failure (unless continue_on_error) or a cancel
+                    pool.submit(self._download_entry, opts, e, i, self.entries.total,
+                                pipeline).add_done_callback(settle)
+            if failures:
+                raise failures[0]
+            self._check_cancelled()
+            if pipeline:
+                pipeline.join()
+        finally:
+            if pipeline:
+                pipeline.close()
+            self._entry_percent = None
+
+    def _take_slot(self, slots, failures):
+        """Wait for a free worker; False once no further entry should start."""
+        while not failures and not self.cancelled:
+            if slots.acquire(timeout=0.25):
+                return True
+        return False
+
+    def _run(self, opts):
+        self._current_index = 0
+        self.failed = []
+        self._decided = set()
+        info = self.probe()
+        if self.bandwidth:
+            self._lease = self.bandwidth.register(self.bandwidth_weight, self.rate_limit)
+        try:
+            if self.entries is not None:
+                self._run_entries(opts)
+            elif self._archived(info):
+                self._emit(status="skipped", file_percent=100, info=info)
+            elif self._from_store(info):
+                self._partials_done(None)
+                if self._m:
+                    self._m.entry_done()
+            else:
+                # reuse the probed info dict instead of resolving the URL again
+                y = self._YDL(dict(opts, **self._format_overrides(info)), outer=self)
+                try:
+                    self._record_item(self._retrying(lambda: self._process(y, dict(info)), self.url), info)
+                finally:
+                    self._close(y)
+                self._partials_done(None)
+                if self._m:
+                    self._m.entry_done()
+            if self._sync_plan:
+                # only a run that got through its playlist leaves a snapshot to sync against
+                self.sync.commit(self._sync_plan)
+            if self.journal:
+                self.journal.discard()
+            if self._m:
+                self._m.finish(True)
+        except BaseException as e:
+            if self._m:
+                self._m.finish(False, (self._stop_mode or "cancelled") if isinstance(e, DownloadCancelled) else str(e))
+            if self._stop_mode == "cancel" and self.partial_policy == "delete":
+                self._discard_partials()
+            raise
+        finally:
+            if self._sync_plan:
+                self.sync_report = self._sync_plan.report()
+            if self._lease:
+                self._lease.release()
+                self._lease = None
+            if isinstance(self._sink, ProgressThrottle):
+                self._sink.flush()
+        return (info.get("title") or "").split("|")[0].strip()
 
     # ---------- public API ----------
     def mp3_download(self):
         self.download_type = False
-        self.current_index = 0
         opts = dict(self.common_opts)
-        self._prefetch_total_items(opts)
         opts["postprocessors"] = [{
             "key": "FFmpegExtractAudio",
             "preferredcodec": "mp3",
             "preferredquality": self.quality
         }]
-        y = self._YDL(opts, outer=self)
-        info = y.extract_info(self.url, download=True)
-        return (info.get("title") or "").split("|")[0].strip()
+        return self._run(opts)
 
     def mp4_download(self):
         self.download_type = True
-        self.current_index = 0
         opts = dict(self.common_opts)
-        self._prefetch_total_items(opts)
         opts["merge_output_format"] = "mp4"
-        y = self._YDL(opts, outer=self)
-        info = y.extract_info(self.url, download=True)
-        return (info.get("title") or "").split("|")[0].strip()
+        return self._run(opts)
@@ -0,0 +1,108 @@
+from __future__ import unicode_literals
+import threading
+from contextlib import contextmanager
+
+# options that change how a URL is extracted; instances are pooled per combination
+_EXTRACT_KEYS = ("noplaylist", "extract_flat", "cookiefile", "cookiesfrombrowser", "proxy", "source_address")
+# options the request director and cookie jar are built from; sessions are shared per combination
+_SESSION_KEYS = ("proxy", "source_address", "cookiefile", "cookiesfrombrowser")
+
+
+class DownloaderContext(object):
+    """Long-lived yt-dlp state shared by every Download that is given it.
+
+    - one HTTP request director and one cookie jar for all YoutubeDL
+      instances with the same proxy, source address and cookie source,
+      instead of a re-read cookie file per call; connections are pooled and
+      kept alive across jobs when yt-dlp uses its ``requests`` handler
+      (``requests`` installed, as the README asks), while its urllib
+      fallback still opens one per request; jobs that set these
+      differently get a session of their own rather than another job's
+      connections;
+    - a pool of extraction-only YoutubeDL instances, checked out one caller
+      at a time, so extractor objects are created on first use and then
+      kept with their warm state (player code, tokens, login) across jobs
+      and playlist entries.
+
+    Instances are never shared by two threads at once; the director and the
+    cookie jar are thread-safe.
+    """
+
+    def __init__(self, params=None, pool_size=8):
+        self.params = dict(params or {})
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._idle = {}         # extraction key -> idle YoutubeDL instances
+        self._bases = {}        # session key -> YoutubeDL owning that session's director and cookie jar
+        self.created = 0
+        self.reused = 0
+
+    # ---------- shared session ----------
+    def _session(self, params):
+        import yt_dlp as ydl  # type: ignore
+        key = tuple((k, str(params.get(k))) for k in _SESSION_KEYS)
+        with self._lock:
+            base = self._bases.get(key)
+            if base is None:
+                own = {k: params[k] for k in _SESSION_KEYS if params.get(k) is not None}
+                base = ydl.YoutubeDL(dict({k: v for k, v in self.params.items() if k not in _SESSION_KEYS},
+                                          quiet=True, no_warnings=True, **own))
+                self._bases[key] = base
+            return base
+
+    def bind(self, y):
+        """Point ``y`` at the shared connection pool and cookie jar of its proxy/address/cookie settings."""
+        base = self._session(y.params)
+        if y is base:
+            return y
+        if hasattr(base, "_request_director"):
+            own = y.__dict__.get("_request_director")
+            y._request_director = base._request_director
+            if own is not None and own is not base._request_director:
+                own.close()
+        y.cookiejar = base.cookiejar
+        return y
+
+    # ---------- pooled extractors ----------
+    @staticmethod
+    def _key(opts):
+        return tuple((k, str(opts.get(k))) for k in _EXTRACT_KEYS)
+
+    @contextmanager
+    def extractor(self, opts, logger=None):
+        """Borrow an extraction YoutubeDL for ``opts``; the logger is swapped in for this use only."""
+        key = self._key(opts)
+        with self._lock:
+            idle = self._idle.get(key)
+            y = idle.pop() if idle else None
+            if y is not None:
+                self.reused += 1
+        if y is None:
+            params = {k: opts[k] for k in _EXTRACT_KEYS if opts.get(k) is not None}
+            params.update(quiet=True, skip_download=True)
+            import yt_dlp as ydl  # type: ignore
+            y = self.bind(ydl.YoutubeDL(dict(self.params, **params)))
+            with self._lock:
+                self.created += 1
+        y.params["logger"] = logger
+        try:
+            yield y
+        finally:
+            y.params["logger"] = None
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.pool_size:
+                    idle.append(y)
+
+    def stats(self):
+        with self._lock:
+            return {"created": self.created, "reused": self.reused,
+                    "idle": sum(len(v) for v in self._idle.values())}
+
+    def close(self):
+        with self._lock:
+            bases, self._bases = list(self._bases.values()), {}
+            self._idle.clear()
+        for base in bases:
+            if hasattr(base, "close"):
+                base.close()
@@ -0,0 +1,211 @@
+from __future__ import unicode_literals
+import collections
+import threading
+
+# acodec prefix -> the file extension FFmpegExtractAudio keeps it in without re-encoding
+_AUDIO_EXT = (("mp4a", "m4a"), ("aac", "m4a"), ("opus", "opus"), ("vorbis", "vorbis"),
+              ("mp3", "mp3"), ("flac", "flac"))
+# video codecs that go into an .mp4 as they are
+_MP4_VCODECS = ("avc1", "h264", "av01", "hev1", "hvc1")
+
+# rough costs used to estimate what a decision saved (no FFmpeg run is timed for the path not taken)
+_TRANSCODE_CPU_PER_S = 0.02     # CPU seconds per second of audio re-encoded to mp3
+_COPY_CPU_PER_MB = 0.004        # CPU seconds per MiB stream-copied by an FFmpeg merge
+_LOSSLESS_KBPS = 1411           # the "Best" quality: take the best source there is
+
+
+def _audio_only(f):
+    return f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+
+
+def _video_only(f):
+    return f.get("acodec") == "none" and f.get("vcodec") not in (None, "none")
+
+
+def _progressive(f):
+    return f.get("vcodec") not in (None, "none") and f.get("acodec") not in (None, "none")
+
+
+def _audio_ext(f):
+    codec = (f.get("acodec") or "").lower()
+    for prefix, ext in _AUDIO_EXT:
+        if codec.startswith(prefix):
+            return ext
+    return None
+
+
+def _kbps(f):
+    return f.get("abr") or f.get("tbr") or 0
+
+
+def _size(f, duration):
+    size = f.get("filesize") or f.get("filesize_approx")
+    if not size and f.get("tbr") and duration:
+        size = f["tbr"] * 1000 / 8 * duration
+    return int(size or 0)
+
+
+class FormatSelector(object):
+    """Picks the cheapest format path to the requested output for each video.
+
+    Audio: if an audio-only stream already has a codec in ``accept_audio``,
+    it is kept as is (FFmpegExtractAudio only copies/remuxes it); otherwise
+    the smallest stream at or above the requested bitrate is transcoded.
+    Video: nothing above ``max_height`` is fetched, a single progressive
+    format wins over a video+audio pair when it is at least as tall (no
+    merge), and pairs prefer codecs that fit the mp4 container.
+
+    Decisions are cached per extractor + video id (and in ``cache``, a
+    MetadataCache, across runs); ``stats()`` reports bytes and estimated
+    CPU seconds saved against yt-dlp's default ``bestaudio``/``bv*+ba``.
+    """
+
+    # in-memory decisions kept for a long session; older ones are still in ``cache``
+    MAX_DECISIONS = 256
+
+    def __init__(self, accept_audio=("mp3",), max_height=None, cache=None):
+        self.accept_audio = tuple(a.strip().lower() for a in accept_audio if a.strip())
+        self.max_height = int(max_height) if max_height else None
+        self.cache = cache
+        self._decisions = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"decisions": 0, "cache_hits": 0, "copies": 0, "transcodes": 0,
+                       "merges": 0, "merges_avoided": 0, "bytes_saved": 0, "cpu_saved_s": 0.0}
+
+    # ---------- entry point ----------
+    def decide(self, info, video, quality, count=True):
+        """Return the decision dict for ``info`` (process=False result), or None to keep the defaults.
+
+        ``count=False`` leaves ``stats()`` alone, for a retry of a video already counted.
+        """
+        formats = [f for f in (info.get("formats") or []) if f.get("format_id") and f.get("url")]
+        if not formats or not info.get("id"):
+            return None
+        key = f"{info.get('extractor_key') or info.get('ie_key')}:{info['id']}:{self.signature(video, quality)}"
+        with self._lock:
+            decision = self._decisions.get(key)
+        cached = decision is not None
+        if decision is None and self.cache:
+            decision = self.cache.get("format-decision:" + key)
+            cached = decision is not None
+        if decision is None:
+            duration = info.get("duration") or 0
+            decision = (self._video(formats, duration) if video
+                        else self._audio(formats, duration, int(quality or _LOSSLESS_KBPS)))
+            if decision is None:
+                return None
+            if self.cache:
+                self.cache.put("format-decision:" + key, None, decision)
+        with self._lock:
+            self._decisions[key] = decision
+            self._decisions.move_to_end(key)
+            if len(self._decisions) > self.MAX_DECISIONS:
+                self._decisions.popitem(last=False)
+            if count:
+                self._count(decision, cached)
+        return decision
+
+    def signature(self, video, quality):
+        """The settings a decision depends on, besides the video itself."""
+        if video:
+            return f"video:{self.max_height or 0}"
+        return f"audio:{quality}:{','.join(self.accept_audio)}"
+
+    def _count(self, decision, cached):
+        # caller holds the lock
+        s = self._stats
+        s["decisions"] += 1
+        s["cache_hits"] += int(cached)
+        action = decision["action"]
+        if action == "copy":
+            s["copies"] += 1
+        elif action == "transcode":
+            s["transcodes"] += 1
+        elif action == "merge":
+            s["merges"] += 1
+        elif action == "single":
+            s["merges_avoided"] += 1
+        s["bytes_saved"] += decision["bytes_saved"]
+        s["cpu_saved_s"] += decision["cpu_saved_s"]
+
+    # ---------- audio ----------
+    def _closest(self, formats, kbps):
+        if kbps >= _LOSSLESS_KBPS:
+            return max(formats, key=_kbps)
+        enough = [f for f in formats if _kbps(f) >= kbps * 0.9]
+        return min(enough, key=_kbps) if enough else max(formats, key=_kbps)
+
+    def _audio(self, formats, duration, kbps):
+        audio = [f for f in formats if _audio_only(f)]
+        if not audio:
+            return None
+        default = max(audio, key=_kbps)     # what "bestaudio" would fetch
+        accepted = [f for f in audio if _audio_ext(f) in self.accept_audio]
+        if accepted:
+            pick = self._closest(accepted, kbps)
+            codec, action = _audio_ext(pick), "copy"
+            cpu_saved = duration * _TRANSCODE_CPU_PER_S
+        else:
+            pick = self._closest(audio, kbps)
+            codec = "mp3" if "mp3" in self.accept_audio or not self.accept_audio else self.accept_audio[0]
+            action, cpu_saved = "transcode", 0.0
+        return {
+            "format": f"{pick['format_id']}/bestaudio/best",
+            "action": action,
+            "codec": codec,
+            "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": codec,
+                                "preferredquality": str(kbps)}],
+            "bytes_saved": max(0, _size(default, duration) - _size(pick, duration)),
+            "cpu_saved_s": cpu_saved,
+        }
+
+    # ---------- video ----------
+    def _fits(self, f):
+        return not self.max_height or (f.get("height") or 0) <= self.max_height
+
+    def _video(self, formats, duration):
+        rank = lambda f: (f.get("height") or 0, f.get("tbr") or 0)
+        videos = [f for f in formats if _video_only(f)]
+        audio = [f for f in formats if _audio_only(f)]
+        progressive = [f for f in formats if _progressive(f) and self._fits(f)]
+        # what "bv*+ba/b" would fetch, ignoring the height cap
+        if videos and audio:
+            default_bytes = _size(max(videos, key=rank), duration) + _size(max(audio, key=_kbps), duration)
+        else:
+            default_bytes = _size(max(formats, key=rank), duration)
+
+        fitting = [f for f in videos if self._fits(f)]
+        pair = None
+        if fitting and audio:
+            top = max(f.get("height") or 0 for f in fitting)
+            same = [f for f in fitting if (f.get("height") or 0) == top]
+            v = max(same, key=lambda f: ((f.get("vcodec") or "").startswith(_MP4_VCODECS), f.get("tbr") or 0))
+            a = max(audio, key=lambda f: (_audio_ext(f) == "m4a", _kbps(f)))
+            pair = (v, a)
+        single = max(progressive, key=rank) if progressive else None
+        fallback = f"bv*[height<={self.max_height}]+ba/b[height<={self.max_height}]/b" if self.max_height else "bv*+ba/b"
+
+        if single and (pair is None or (single.get("height") or 0) >= (pair[0].get("height") or 0)):
+            size = _size(single, duration)
+            return {
+                "format": f"{single['format_id']}/{fallback}",
+                "action": "single",
+                "height": single.get("height"),
+                "bytes_saved": max(0, default_bytes - size),
+                "cpu_saved_s": size / 2 ** 20 * _COPY_CPU_PER_MB,
+            }
+        if pair is None:
+            return None
+        v, a = pair
+        return {
+            "format": f"{v['format_id']}+{a['format_id']}/{fallback}",
+            "action": "merge",
+            "height": v.get("height"),
+            "bytes_saved": max(0, default_bytes - _size(v, duration) - _size(a, duration)),
+            "cpu_saved_s": 0.0,
+        }
+
+    # ---------- reporting ----------
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,288 @@
+from __future__ import unicode_literals
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+# fields kept per playlist entry; enough to download it again without re-extracting the playlist
+_ENTRY_KEYS = ("id", "url", "webpage_url", "ie_key", "title")
+# states after which an entry is not touched again in this run; records of these are synced to disk
+_TERMINAL = ("done", "failed")
+# the log is rewritten as one snapshot once it holds this many records more than the live state
+_COMPACT_SLACK = 1000
+# the in-memory record of a failed entry without a .part file in compact mode; shared, never mutated
+_FAILED = {"state": "failed"}
+
+
+def compact_entry(entry):
+    return {k: entry.get(k) for k in _ENTRY_KEYS if entry.get(k) is not None}
+
+
+class JobJournal(object):
+    """Crash-safe record of one job's progress.
+
+    Holds the job spec, the flat entry list and a state per entry, including
+    the ``.part`` file and byte offset of entries that were mid-download.
+    On disk it is a log of JSON lines: a snapshot of the whole journal, then
+    one record per change, so a change costs one appended line however long
+    the playlist is. Records are written at most every ``interval`` seconds
+    (progress ticks of one entry collapse into the latest) and fsynced only
+    when they include a finished or failed entry; a torn last line from a
+    crash is ignored on load. The log is compacted into a fresh snapshot
+    (temp file + rename) when it grows well past the live state.
+
+    Finished entries are kept as a bitmap rather than a record each, so a
+    long job's memory does not grow with what is already done. With
+    ``compact`` (low-memory mode) a failed entry keeps only its state and
+    ``.part`` file in memory; the error text is in the log.
+    """
+
+    def __init__(self, path, spec, interval=1.0):
+        self.path = path
+        self.spec = dict(spec)
+        self.interval = interval
+        self.title = None
+        self.entries = None     # None until the playlist has been expanded once
+        self.entries_complete = True    # False while a streamed playlist is still being expanded
+        self.states = {}        # "idx" -> {"state": ..., "tmpfilename": ..., "downloaded_bytes": ...}; not done ones
+        self.created = time.time()
+        self.compact = False
+        self._done = bytearray()    # bit per entry index
+        self._lock = threading.Lock()
+        self._pending = []      # records not yet written
+        self._ticks = {}        # "idx" -> latest unwritten progress record
+        self._sync = False      # the pending records include a terminal state
+        self._saved_at = 0.0
+        self._records = 0       # records in the log after its snapshot
+        self._file = None
+        self._discarded = False
+
+    # ---------- locating ----------
+    @staticmethod
+    def key(spec):
+        raw = json.dumps([spec.get(k) for k in ("url", "save_path", "quality", "playlist", "video")])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def open(cls, folder, spec):
+        """Load the journal for ``spec`` if one exists, otherwise start a new one."""
+        path = os.path.join(folder, cls.key(spec) + ".json")
+        if os.path.isfile(path):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, KeyError):
+                pass
+        os.makedirs(folder, exist_ok=True)
+        return cls(path, spec)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.loads(f.readline())
+            j = cls(path, data["spec"])
+            j.title = data.get("title")
+            j.entries = data.get("entries")
+            j.entries_complete = data.get("entries_complete", True)
+            j.created = data.get("created") or j.created
+            for idx in data.get("done") or ():
+                j._set_done(idx)
+            for idx, rec in (data.get("states") or {}).items():
+                j._apply({"op": "state", "idx": idx, "rec": rec})
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break       # torn by a crash mid-write; everything before it stands
+                j._apply(rec)
+                j._records += 1
+        return j
+
+    @classmethod
+    def unfinished(cls, folder):
+        journals = []
+        for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+            try:
+                journals.append(cls.load(path))
+            except (OSError, ValueError, KeyError):
+                continue
+        return journals
+
+    # ---------- state ----------
+    def _set_done(self, idx):
+        idx = int(idx)
+        byte = idx >> 3
+        if byte >= len(self._done):
+            self._done.extend(bytes(byte + 1 - len(self._done)))
+        self._done[byte] |= 1 << (idx & 7)
+
+    def _apply(self, rec):
+        # one log record onto the in-memory state (also used when replaying on load)
+        op = rec.get("op")
+        if op == "entries":
+            self.title = rec.get("title")
+            self.entries = rec.get("entries")
+            self.entries_complete = rec.get("complete", True)
+        elif op == "entry":
+            if self.entries is None:
+                self.entries = []
+            self.entries.append(rec["entry"])
+        elif op == "entries_done":
+            self.entries_complete = True
+        elif op == "state":
+            key, fields = str(rec["idx"]), rec["rec"]
+            if fields.get("state") == "done":
+                self._set_done(key)
+                self.states.pop(key, None)
+            elif self.compact and fields.get("state") == "failed":
+                part = (self.states.pop(key, None) or {}).get("tmpfilename")
+                self.states[key] = {"state": "failed", "tmpfilename": part} if part else _FAILED
+            else:
+                rec = self.states.get(key)
+                if rec is None or rec is _FAILED:
+                    rec = self.states[key] = {}
+                rec.update(fields)
+
+    def _record(self, rec, sync=False, now=False):
+        # caller holds the lock; returns whether the pending records are due to be written
+        self._apply(rec)
+        self._pending.append(rec)
+        self._sync = self._sync or sync
+        return now or time.monotonic() - self._saved_at >= self.interval
+
+    # ---------- recording ----------
+    def set_entries(self, entries, title=None, complete=True):
+        with self._lock:
+            self._record({"op": "entries", "title": title, "complete": complete,
+                          "entries": None if entries is None else [compact_entry(e) for e in entries]})
+        self.save()
+
+    def add_entry(self, entry):
+        """Append one entry of a streamed playlist; written with the next flush."""
+        with self._lock:
+            due = self._record({"op": "entry", "entry": compact_entry(entry)})
+        if due:
+            self.flush()
+
+    def entries_done(self):
+        with self._lock:
+            self._record({"op": "entries_done"}, sync=True)
+        self.flush()
+
+    def state(self, idx):
+        if self.is_done(idx):
+            return "done"
+        return (self.states.get(str(idx)) or {}).get("state")
+
+    def is_done(self, idx):
+        idx = int(idx)
+        byte = idx >> 3
+        return byte < len(self._done) and bool(self._done[byte] >> (idx & 7) & 1)
+
+    def mark(self, idx, state, **fields):
+        with self._lock:
+            # a progress tick still waiting is superseded by the new state
+            self._ticks.pop(str(idx), None)
+            due = self._record({"op": "state", "idx": str(idx), "rec": dict(fields, state=state)},
+                               sync=state in _TERMINAL)
+        if due:
+            self.flush()
+
+    def progress(self, idx, tmpfilename, downloaded_bytes, total_bytes=None):
+        key = str(idx)
+        rec = {"op": "state", "idx": key, "rec": {"state": "downloading", "tmpfilename": tmpfilename,
+                                                  "downloaded_bytes": downloaded_bytes, "total_bytes": total_bytes}}
+        with self._lock:
+            if self.is_done(idx):
+                return
+            self._apply(rec)
+            self._ticks[key] = rec
+            due = time.monotonic() - self._saved_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Append the records not written yet; fsync if one of them finishes or fails an entry."""
+        with self._lock:
+            if self._discarded or not (self._pending or self._ticks):
+                return
+            if self._file is None and not os.path.isfile(self.path):
+                self._save()
+                return
+            records = self._pending + list(self._ticks.values())
+            if self._records + len(records) > _COMPACT_SLACK + 2 * (len(self.entries or ()) + len(self.states)):
+                self._save()
+                return
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            self._file.flush()
+            if self._sync:
+                os.fsync(self._file.fileno())
+            self._records += len(records)
+            self._clear()
+
+    def save(self):
+        """Rewrite the log as a single snapshot of the journal."""
+        with self._lock:
+            if not self._discarded:
+                self._save()
+
+    def _save(self):
+        data = {
+            "spec": self.spec,
+            "title": self.title,
+            "created": self.created,
+            "updated": time.time(),
+            "entries": self.entries,
+            "entries_complete": self.entries_complete,
+            "states": self.states,
+            "done": [i for i in range(len(self._done) * 8) if self.is_done(i)],
+        }
+        self._close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._records = 0
+        self._clear()
+
+    def _clear(self):
+        self._pending, self._ticks, self._sync = [], {}, False
+        self._saved_at = time.monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Write what is pending and let go of the file (the job stopped; the journal stays for a resume)."""
+        self.flush()
+        with self._lock:
+            self._close()
+
+    def discard(self, remove_partials=False):
+        """Forget the job (finished or cancelled): nothing left to resume.
+
+        With ``remove_partials`` the ``.part`` files of unfinished entries go too.
+        """
+        with self._lock:
+            self._discarded = True
+            self._close()
+            self._clear()
+            partials = [rec.get("tmpfilename") for rec in self.states.values()
+                        if remove_partials and rec.get("tmpfilename")]
+            for p in [self.path, self.path + ".tmp"] + partials:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    # ---------- summary ----------
+    @property
+    def done_count(self):
+        return sum(bin(b).count("1") for b in self._done)
@@ -0,0 +1,364 @@
+from __future__ import unicode_literals
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from JobJournal import JobJournal
+from AsyncCore import LoopThread, run_blocking, run_download
+
+PENDING = "pending"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# the Download._emit payload fields a snapshot carries
+_PROGRESS_KEYS = ("status", "file_percent", "overall_percent", "idx", "total", "title", "seen")
+
+
+class Job(object):
+    _ids = itertools.count(1)
+
+    def __init__(self, url, save_path, quality, playlist=False, video=False, priority=0, options=None):
+        self.id = next(Job._ids)
+        self.url = url
+        self.save_path = save_path
+        self.quality = quality
+        self.playlist = playlist
+        self.video = video
+        self.priority = priority
+        self.options = dict(options or {})  # per-job Download kwargs on top of the queue's
+        self.state = PENDING
+        self.title = None
+        self.progress = None   # last payload from Download._emit
+        self.result = None     # returned name on success
+        self.error = None
+        self.failed = []       # playlist entries given up on (Download.failed) when continue_on_error
+        self.sync = None       # Download.sync_report of a playlist sync
+        self.created = time.time()
+        self._download = None
+
+    def spec(self):
+        return {"url": self.url, "save_path": self.save_path, "quality": self.quality,
+                "playlist": self.playlist, "video": self.video, "options": self.options}
+
+    def snapshot(self):
+        """The job as API clients see it: state plus the last progress payload."""
+        p = self.progress or {}
+        return {"id": self.id, "url": self.url, "state": self.state, "title": self.title,
+                "percent": self.percent, "playlist": self.playlist, "video": self.video,
+                "quality": self.quality, "save_path": self.save_path, "result": self.result,
+                "error": self.error, "failed": self.failed, "sync": self.sync,
+                "progress": {k: p[k] for k in _PROGRESS_KEYS if k in p}}
+
+    @property
+    def percent(self):
+        p = self.progress or {}
+        value = p.get("overall_percent")
+        if value is None:
+            value = p.get("file_percent")
+        return 100 if self.state == DONE else int(value or 0)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.state} {self.url}>"
+
+
+class JobQueue(object):
+    """Priority queue of download jobs, at most ``max_jobs`` running at once.
+
+    All jobs share one set of Download keyword arguments (metadata cache,
+    archive, playlist concurrency, ...), so the setup is done once per queue
+    rather than once per URL. Jobs are asyncio tasks on ``loop`` (a
+    LoopThread, started on demand) and their blocking yt-dlp work runs on a
+    pool of ``max_jobs`` threads; ``job_timeout`` fails a job that runs
+    longer. ``on_update(job)``, and every function given to ``add_listener``,
+    is called from those threads whenever a job changes. With ``journal_dir`` every job keeps a JobJournal there, and
+    ``restore()`` re-queues the ones a crash or exit left behind. Jobs that
+    finish with failed entries append a JSON line to ``failed_report``.
+    """
+
+    def __init__(self, max_jobs=2, on_update=None, journal_dir=None, job_timeout=None, loop=None,
+                 failed_report=None, **download_kwargs):
+        self.max_jobs = max(1, int(max_jobs))
+        self.on_update = on_update
+        self._listeners = []
+        self.journal_dir = journal_dir
+        self.job_timeout = job_timeout
+        self.failed_report = failed_report
+        self._report_lock = threading.Lock()
+        self.download_kwargs = download_kwargs
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._running = 0
+        self._stopped = False
+        self._loop = loop
+        self._own_loop = loop is None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="job-worker")
+
+    # ---------- adding ----------
+    def add(self, url, save_path, quality, playlist=False, video=False, priority=0, **options):
+        job = Job(url, save_path, quality, playlist, video, priority, options)
+        with self._cv:
+            self._jobs[job.id] = job
+            self._push(job)
+        self._notify(job)
+        self._ensure_workers()
+        return job
+
+    def add_many(self, urls, save_path, quality, playlist=False, video=False, priority=0, **options):
+        return [self.add(u, save_path, quality, playlist, video, priority, **options) for u in urls]
+
+    def add_file(self, path, save_path, quality, playlist=False, video=False, priority=0, **options):
+        """Queue every URL in a text file (one per line, '#' starts a comment)."""
+        with open(path, encoding="utf-8") as f:
+            return self.add_many(parse_urls(f.read()), save_path, quality, playlist, video, priority, **options)
+
+    def restore(self):
+        """Queue every unfinished job found in the journal folder; returns the new jobs."""
+        if not self.journal_dir:
+            return []
+        with self._cv:
+            known = {JobJournal.key(j.spec()) for j in self._jobs.values() if j.state not in FINAL_STATES}
+        jobs = []
+        for journal in JobJournal.unfinished(self.journal_dir):
+            spec = journal.spec
+            if JobJournal.key(spec) in known:
+                continue
+            job = self.add(spec["url"], spec["save_path"], spec["quality"], spec.get("playlist", False),
+                           spec.get("video", False), **(spec.get("options") or {}))
+            job.title = journal.title
+            jobs.append(job)
+        return jobs
+
+    def _push(self, job):
+        # caller holds the condition
+        heapq.heappush(self._heap, (-job.priority, next(self._seq), job))
+
+    # ---------- per-job control ----------
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cv:
+            return sorted(self._jobs.values(), key=lambda j: j.id)
+
+    def set_priority(self, job_id, priority):
+        with self._cv:
+            job = self._jobs[job_id]
+            job.priority = priority
+            if job.state == PENDING:
+                # stale heap entries are skipped by _take()
+                self._push(job)
+
+    def pause(self, job_id):
+        with self._cv:
+            job = self._jobs[job_id]
+            if job.state not in (PENDING, RUNNING):
+                return False
+            was_running = job.state == RUNNING
+            job.state = PAUSED
+        if was_running and job._download:
+            # the .part files stay, so resuming continues from that offset
+            job._download.pause()
+        self._notify(job)
+        return True
+
+    def resume(self, job_id):
+        with self._cv:
+            job = self._jobs[job_id]
+            if job.state != PAUSED:
+                return False
+            job.state = PENDING
+            self._push(job)
+        self._notify(job)
+        self._ensure_workers()
+        return True
+
+    def cancel(self, job_id):
+        with self._cv:
+            job = self._jobs[job_id]
+            if job.state in FINAL_STATES:
+                return False
+            was_running = job.state == RUNNING
+            was_paused = job.state == PAUSED
+            job.state = CANCELLED
+            self._cv.notify_all()
+        if was_running and job._download:
+            job._download.cancel()
+        elif was_paused and self.journal_dir:
+            # nothing is running to clean up after itself: drop the paused job's partial files here
+            JobJournal.open(self.journal_dir, job.spec()).discard(remove_partials=self._partial_policy(job) == "delete")
+        self._notify(job)
+        return True
+
+    def _partial_policy(self, job):
+        return job.options.get("partial_policy") or self.download_kwargs.get("partial_policy") or "delete"
+
+    def remove_finished(self):
+        with self._cv:
+            for job_id in [j.id for j in self._jobs.values() if j.state in FINAL_STATES]:
+                del self._jobs[job_id]
+
+    # ---------- scheduler ----------
+    def _ensure_workers(self):
+        with self._cv:
+            if self._stopped:
+                return
+            if self._loop is None:
+                self._loop = LoopThread("job-queue").start()
+        self._loop.call_soon(self._pump)
+
+    def _take(self):
+        # caller holds the condition
+        while self._heap:
+            neg_priority, _, job = heapq.heappop(self._heap)
+            if job.state == PENDING and -neg_priority == job.priority:
+                return job
+        return None
+
+    def _pump(self):
+        # on the loop thread: start queued jobs while slots are free
+        while True:
+            with self._cv:
+                if self._stopped or self._running >= self.max_jobs:
+                    return
+                job = self._take()
+                if job is None:
+                    return
+                job.state = RUNNING
+                self._running += 1
+            asyncio.ensure_future(self._run(job)).add_done_callback(self._job_finished)
+
+    def _job_finished(self, task):
+        with self._cv:
+            self._running -= 1
+            self._cv.notify_all()
+        self._pump()
+
+    async def _run(self, job):
+        # the download engine (and yt_dlp with it) is imported by the first job, not at startup
+        from DownloadMethods import Download, DownloadCancelled
+
+        def progress_cb(payload):
+            job.progress = payload
+            if payload.get("title"):
+                job.title = payload["title"]
+            self._notify(job)
+
+        job.error = None
+        job.failed = []
+        job.sync = None
+        self._notify(job)
+        journal = JobJournal.open(self.journal_dir, job.spec()) if self.journal_dir else None
+        try:
+            downloader = Download(job.url, job.save_path, job.quality, job.playlist, job.video,
+                                  progress_cb=progress_cb, journal=journal,
+                                  **dict(self.download_kwargs, **job.options))
+            job._download = downloader
+            if job.state != RUNNING:
+                raise DownloadCancelled()
+            started = time.monotonic()
+            title, idx, total = await run_blocking(self._executor, downloader.first_title,
+                                                   on_cancel=downloader.cancel, timeout=self.job_timeout)
+            job.title = job.title or title
+            job.progress = {"status": "starting", "file_percent": 0, "overall_percent": 0,
+                            "idx": idx, "total": total, "title": title}
+            self._notify(job)
+            left = None if self.job_timeout is None else max(0.0, self.job_timeout - (time.monotonic() - started))
+            job.result = await run_download(downloader, job.video, self._executor, left)
+            job.failed = list(downloader.failed)
+            job.state = DONE
+            if job.failed:
+                self._report_failed(job)
+        except (DownloadCancelled, asyncio.CancelledError):
+            if job.state == RUNNING:
+                job.state = CANCELLED
+        except asyncio.TimeoutError:
+            job.error = f"timed out after {self.job_timeout:g}s"
+            job.state = FAILED
+        except Exception as e:
+            job.error = str(e)
+            job.state = FAILED
+        finally:
+            job.sync = job._download.sync_report if job._download else None
+            job._download = None
+            if journal and job.state == CANCELLED:
+                journal.discard()
+            elif journal:
+                journal.close()
+        self._notify(job)
+
+    def _report_failed(self, job):
+        if not self.failed_report:
+            return
+        line = json.dumps({"ts": time.time(), "url": job.url, "title": job.title, "save_path": job.save_path,
+                           "failed": job.failed}, ensure_ascii=False)
+        try:
+            with self._report_lock, open(self.failed_report, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+    def add_listener(self, fn):
+        """Also call ``fn(job)`` on every job update (a control API, a second view)."""
+        self._listeners = self._listeners + [fn]
+
+    def remove_listener(self, fn):
+        self._listeners = [f for f in self._listeners if f is not fn]
+
+    def _notify(self, job):
+        for fn in [self.on_update] + self._listeners:
+            if fn:
+                try:
+                    fn(job)
+                except Exception:
+                    pass
+
+    # ---------- lifecycle ----------
+    def active(self):
+        with self._cv:
+            return sum(1 for j in self._jobs.values() if j.state in (PENDING, RUNNING))
+
+    def wait(self, timeout=None):
+        """Block until no job is pending or running."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            while any(j.state in (PENDING, RUNNING) for j in self._jobs.values()):
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cv.wait(left)
+        return True
+
+    def stop(self):
+        """Stop the queue; running jobs are paused, so their journal and partial files survive for restore()."""
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        for job in self.jobs():
+            if job.state == RUNNING:
+                self.pause(job.id)
+        if self._loop and self._own_loop:
+            self._loop.stop(timeout=10)
+        self._executor.shutdown(wait=False)
+
+
+def parse_urls(text):
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            continue
+        for part in line.split():
+            if part.startswith("http://") or part.startswith("https://"):
+                urls.append(part)
+    return urls
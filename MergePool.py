@@ -0,0 +1,134 @@
+from __future__ import unicode_literals
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from AppPaths import ffmpeg_exe, ffprobe_exe
+
+# codecs the mp4 muxer takes as they are; anything else in that stream is re-encoded
+_MP4_COPY = {
+    "video": ("h264", "hevc", "av1", "vp9", "mpeg4"),
+    "audio": ("aac", "mp3", "opus", "flac", "alac", "ac3", "eac3"),
+}
+_ENCODE = {
+    "video": ["libx264", "-preset", "veryfast", "-crf", "20"],
+    "audio": ["aac", "-b:a", "192k"],
+}
+# keep a console window from flashing up for every ffmpeg run in the windowed build
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+class MergeError(RuntimeError):
+    pass
+
+
+def probe_streams(path, ffprobe=None):
+    """[(codec_type, codec_name), ...] of a media file, or None without a working ffprobe."""
+    ffprobe = ffprobe if ffprobe is not None else ffprobe_exe()
+    if not ffprobe:
+        return None
+    try:
+        out = subprocess.run([ffprobe, "-v", "error", "-show_entries", "stream=codec_type,codec_name",
+                              "-of", "json", path], capture_output=True, check=True, timeout=60,
+                             creationflags=_NO_WINDOW).stdout
+        return [(s.get("codec_type"), s.get("codec_name")) for s in json.loads(out or b"{}").get("streams", [])]
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+class MergePool(object):
+    """Merges separately downloaded video and audio streams, a bounded number at a time.
+
+    Each merge is one ffmpeg process; at most ``workers`` run at once and
+    each gets ``cpu_count / workers`` threads, so parallel merges don't
+    oversubscribe the CPU. ffprobe decides per stream: codecs the container
+    takes are stream-copied, only the others are re-encoded. Output goes to
+    a temp file next to the target and is renamed over it when complete.
+    ``merge()`` blocks until its turn has come and the file is written.
+    """
+
+    def __init__(self, workers=None, threads=None, container="mp4", ffmpeg=None, ffprobe=None):
+        cpus = os.cpu_count() or 2
+        self.workers = max(1, int(workers or max(1, cpus // 2)))
+        self.threads = max(1, int(threads or cpus // self.workers))
+        self.container = container
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yt-merge")
+        self._lock = threading.Lock()
+        self._stats = {"merges": 0, "copies": 0, "transcodes": 0, "seconds": 0.0}
+
+    # ---------- planning ----------
+    def plan(self, inputs):
+        """ffmpeg -map/-c arguments for ``inputs`` and whether everything is a stream copy."""
+        args, copy_all, out = [], True, 0
+        for i, path in enumerate(inputs):
+            streams = probe_streams(path, self.ffprobe)
+            if streams is None:
+                # no ffprobe: map like yt-dlp's merger and hope the codecs fit
+                args += ["-map", f"{i}:v:0?", "-map", f"{i}:a:0?"]
+                continue
+            for kind in ("video", "audio"):
+                codec = next((name for t, name in streams if t == kind), None)
+                if codec is None:
+                    continue
+                args += ["-map", f"{i}:{kind[0]}:0"]
+                allowed = _MP4_COPY[kind] if self.container == "mp4" else None
+                if allowed is None or codec in allowed:
+                    args += [f"-c:{out}", "copy"]
+                else:
+                    args += [f"-c:{out}"] + _ENCODE[kind]
+                    copy_all = False
+                out += 1
+        if not any(a.startswith("-c:") for a in args):
+            args += ["-c", "copy"]
+        return args, copy_all
+
+    # ---------- running ----------
+    def _run(self, inputs, output):
+        ffmpeg = self.ffmpeg or ffmpeg_exe() or "ffmpeg"
+        if os.path.isdir(ffmpeg):
+            ffmpeg = os.path.join(ffmpeg, "ffmpeg")
+        args, copy_all = self.plan(inputs)
+        base, ext = os.path.splitext(output)
+        tmp = f"{base}.temp{ext}"   # same folder, so the final rename is atomic
+        cmd = [ffmpeg, "-y", "-nostdin", "-loglevel", "error"]
+        for path in inputs:
+            cmd += ["-i", path]
+        cmd += args + ["-threads", str(self.threads), "-f", self.container, tmp]
+        started = time.monotonic()
+        try:
+            proc = subprocess.run(cmd, capture_output=True, creationflags=_NO_WINDOW)
+        except OSError as e:
+            raise MergeError(f"cannot run ffmpeg: {e}") from e
+        if proc.returncode != 0:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise MergeError(f"ffmpeg merge failed ({proc.returncode}): "
+                             f"{proc.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+        os.replace(tmp, output)
+        seconds = time.monotonic() - started
+        with self._lock:
+            s = self._stats
+            s["merges"] += 1
+            s["copies" if copy_all else "transcodes"] += 1
+            s["seconds"] += seconds
+        return {"method": "copy" if copy_all else "transcode", "seconds": seconds, "threads": self.threads}
+
+    def submit(self, inputs, output):
+        return self._pool.submit(self._run, list(inputs), output)
+
+    def merge(self, inputs, output):
+        return self.submit(inputs, output).result()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, threads=self.threads)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,132 @@
+from __future__ import unicode_literals
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# options that change what extract_info returns; everything else is irrelevant to the key
+_KEY_OPTS = ("noplaylist", "extract_flat", "format", "merge_output_format", "cookiefile")
+
+
+class MetadataCache(object):
+    """On-disk cache of extracted info dicts.
+
+    Entries are zlib-compressed JSON in a small SQLite file, each with its own
+    TTL. When the stored size goes over ``max_bytes`` the least recently used
+    entries are evicted first.
+    """
+
+    def __init__(self, path, ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS info ("
+            " key TEXT PRIMARY KEY, url TEXT, created REAL, expires REAL,"
+            " accessed REAL, size INTEGER, data BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS info_accessed ON info(accessed)")
+        self._db.commit()
+
+    # ---------- keys ----------
+    @staticmethod
+    def key(url, opts=None):
+        opts = opts or {}
+        relevant = {k: opts.get(k) for k in _KEY_OPTS if opts.get(k) is not None}
+        raw = json.dumps([url, relevant], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    # ---------- get/put ----------
+    def get(self, url, opts=None):
+        """Return the cached info dict, or None when missing or stale."""
+        k = self.key(url, opts)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT expires, data FROM info WHERE key=?", (k,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            expires, data = row
+            if expires and expires < now:
+                self._db.execute("DELETE FROM info WHERE key=?", (k,))
+                self._db.commit()
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._db.execute("UPDATE info SET accessed=? WHERE key=?", (now, k))
+            self._db.commit()
+            self._hits += 1
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def put(self, url, opts, info, ttl=None):
+        if info is None:
+            return
+        data = zlib.compress(json.dumps(info, default=str).encode("utf-8"), 6)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO info (key, url, created, expires, accessed, size, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url, opts), url, now, expires, now, len(data), sqlite3.Binary(data)),
+            )
+            self._evict()
+            self._db.commit()
+
+    def invalidate(self, url, opts=None):
+        with self._lock:
+            self._db.execute("DELETE FROM info WHERE key=?", (self.key(url, opts),))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM info")
+            self._db.commit()
+
+    def _evict(self):
+        # caller holds the lock
+        self._db.execute("DELETE FROM info WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM info").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for k, size in self._db.execute("SELECT key, size FROM info ORDER BY accessed ASC").fetchall():
+            self._db.execute("DELETE FROM info WHERE key=?", (k,))
+            self._evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ---------- statistics ----------
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,307 @@
+from __future__ import unicode_literals
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PHASES = ("extract", "download", "merge", "postprocess")
+
+
+class Metrics(object):
+    """Hub that fans metric events out to pluggable sinks.
+
+    A sink is any callable taking one event dict. Events carry a ``type``
+    ("phase", "first_byte", "retry", "warning", "error", "entry", "job"),
+    the job id and URL, and the playlist index (0 for single videos).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, sinks=()):
+        self._sinks = list(sinks)
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self._sinks = [s for s in self._sinks if s is not sink]
+
+    def job(self, url):
+        return JobMetrics(self, next(self._ids), url)
+
+    def publish(self, event):
+        event.setdefault("ts", time.time())
+        with self._lock:
+            sinks = list(self._sinks)
+        for sink in sinks:
+            try:
+                sink(event)
+            except Exception:
+                pass
+
+
+class JobMetrics(object):
+    """Timings and counters of one Download, per entry and for the whole job."""
+
+    def __init__(self, hub, job_id, url):
+        self.hub = hub
+        self.id = job_id
+        self.url = url
+        self.started = time.monotonic()
+        self.entries = {}   # idx -> record of entries still running; dropped in entry_done
+        self._totals = {"bytes": 0, "entries": 0, **{p + "_s": 0.0 for p in PHASES}}
+        self._open = {}     # (idx, phase) -> start
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.warnings = 0
+        self.errors = 0
+
+    def _entry(self, idx):
+        idx = int(idx or 0)
+        rec = self.entries.get(idx)
+        if rec is None:
+            rec = self.entries[idx] = {"idx": idx, "started": time.monotonic(), "first_byte_s": None,
+                                       "bytes": 0, "retries": 0, "errors": 0}
+        return rec
+
+    def _publish(self, type_, idx=None, **fields):
+        fields.update(type=type_, job=self.id, url=self.url, idx=int(idx or 0))
+        self.hub.publish(fields)
+
+    # ---------- phases ----------
+    def begin(self, phase, idx=None):
+        with self._lock:
+            rec = self._entry(idx)
+            now = time.monotonic()
+            if phase == "download":
+                # time to first byte counts from here, not from the job's or the entry's start
+                rec.setdefault("download_started", now)
+            self._open.setdefault((int(idx or 0), phase), now)
+
+    def end(self, phase, idx=None, **fields):
+        with self._lock:
+            start = self._open.pop((int(idx or 0), phase), None)
+            if start is None:
+                return
+            seconds = time.monotonic() - start
+            rec = self._entry(idx)
+            rec[phase + "_s"] = rec.get(phase + "_s", 0.0) + seconds
+        self._publish("phase", idx, phase=phase, seconds=seconds, **fields)
+
+    @contextmanager
+    def phase(self, phase, idx=None):
+        self.begin(phase, idx)
+        try:
+            yield
+        finally:
+            self.end(phase, idx)
+
+    # ---------- counters ----------
+    def first_byte(self, idx=None):
+        with self._lock:
+            rec = self._entry(idx)
+            if rec["first_byte_s"] is not None:
+                return
+            rec["first_byte_s"] = time.monotonic() - rec.get("download_started", rec["started"])
+        self._publish("first_byte", idx, seconds=rec["first_byte_s"])
+
+    def bytes(self, idx, downloaded):
+        with self._lock:
+            rec = self._entry(idx)
+            rec["bytes"] = max(rec["bytes"], int(downloaded or 0))
+
+    def retry(self, message, idx=None):
+        with self._lock:
+            self.retries += 1
+            self._entry(idx)["retries"] += 1
+        self._publish("retry", idx, message=message)
+
+    def warning(self, message, idx=None):
+        with self._lock:
+            self.warnings += 1
+        self._publish("warning", idx, message=message)
+
+    def error(self, message, idx=None):
+        with self._lock:
+            self.errors += 1
+            self._entry(idx)["errors"] += 1
+        self._publish("error", idx, message=message)
+
+    def event(self, type_, idx=None, **fields):
+        """Publish a free-form event (e.g. a format decision) tagged with this job."""
+        self._publish(type_, idx, **fields)
+
+    # ---------- summaries ----------
+    def entry_done(self, idx=None, ok=True):
+        with self._lock:
+            # fold the record into the job totals, so a long playlist keeps no per-entry state
+            rec = self._entry(idx)
+            del self.entries[rec["idx"]]
+            # phases still open end here; a failed entry's are dropped rather than counted
+            now = time.monotonic()
+            for key in [k for k in self._open if k[0] == rec["idx"]]:
+                start = self._open.pop(key)
+                if ok:
+                    rec[key[1] + "_s"] = rec.get(key[1] + "_s", 0.0) + now - start
+            rec.pop("download_started", None)
+            self._totals["entries"] += int(bool(rec["idx"]))
+            self._totals["bytes"] += rec["bytes"]
+            for p in PHASES:
+                self._totals[p + "_s"] += rec.get(p + "_s", 0.0)
+        elapsed = time.monotonic() - rec.pop("started")
+        dl = rec.get("download_s") or 0.0
+        rec.update(ok=ok, seconds=elapsed, throughput_bps=(rec["bytes"] / dl) if dl else None)
+        self._publish("entry", idx, **{k: v for k, v in rec.items() if k != "idx"})
+
+    def finish(self, ok=True, error=None):
+        with self._lock:
+            live = list(self.entries.values())
+            total_bytes = self._totals["bytes"] + sum(r["bytes"] for r in live)
+            phases = {p: self._totals[p + "_s"] + sum(r.get(p + "_s", 0.0) for r in live) for p in PHASES}
+            entries = self._totals["entries"] + len([r for r in live if r["idx"]])
+        seconds = time.monotonic() - self.started
+        self._publish("job", None, ok=ok, error=error, seconds=seconds, entries=entries,
+                      bytes=total_bytes, throughput_bps=total_bytes / seconds if seconds else None,
+                      phases=phases, retries=self.retries, warnings=self.warnings, errors=self.errors)
+
+
+# ---------- sinks ----------
+class CallbackSink(object):
+    """In-process sink; ``types`` limits which event types reach the callback."""
+
+    def __init__(self, callback, types=None):
+        self.callback = callback
+        self.types = set(types) if types else None
+
+    def __call__(self, event):
+        if self.types is None or event.get("type") in self.types:
+            self.callback(event)
+
+
+class JsonLinesSink(object):
+    """Appends events to a JSON-lines file.
+
+    Once the file passes ``max_bytes`` it is rotated: ``path`` becomes
+    ``path.1``, ``path.1`` becomes ``path.2`` and so on, and files past
+    ``backups`` are deleted, so the log never holds much more than
+    ``max_bytes * (backups + 1)``. ``max_bytes=None`` never rotates.
+    """
+
+    def __init__(self, path, max_bytes=8 * 1024 * 1024, backups=2):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(0, int(backups))
+        self._lock = threading.Lock()
+        self._f = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+            if self.max_bytes and self._f.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        self._f.close()
+        for i in range(self.backups, 0, -1):
+            src = f"{self.path}.{i - 1}" if i > 1 else self.path
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i}")
+        if not self.backups:
+            os.remove(self.path)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+class PrometheusSink(object):
+    """Aggregates events into counters and renders the Prometheus text format.
+
+    ``serve(port)`` exposes them on ``http://host:port/metrics``.
+    """
+
+    def __init__(self, prefix="ytdl"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._server = None
+
+    def _inc(self, name, value=1, **labels):
+        # ints stay ints (counts, bytes) so they render exactly however large they grow
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def __call__(self, event):
+        t = event.get("type")
+        with self._lock:
+            if t == "phase":
+                self._inc("phase_seconds_total", event["seconds"], phase=event["phase"])
+                self._inc("phase_count_total", phase=event["phase"])
+            elif t == "first_byte":
+                self._inc("first_byte_seconds_total", event["seconds"])
+                self._inc("first_byte_count_total")
+            elif t in ("retry", "warning", "error"):
+                self._inc({"retry": "retries_total", "warning": "warnings_total", "error": "errors_total"}[t])
+            elif t == "entry":
+                self._inc("entries_total", result="ok" if event.get("ok") else "failed")
+                self._inc("bytes_total", event.get("bytes") or 0)
+            elif t == "format":
+                self._inc("format_decisions_total", action=event.get("action"))
+                self._inc("format_bytes_saved_total", event.get("bytes_saved") or 0)
+                self._inc("format_cpu_saved_seconds_total", event.get("cpu_saved_s") or 0)
+            elif t == "job":
+                self._inc("jobs_total", result="ok" if event.get("ok") else "failed")
+                self._inc("job_seconds_total", event.get("seconds") or 0)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._counters.items())
+        seen = set()
+        for (name, labels), value in items:
+            full = f"{self.prefix}_{name}"
+            if full not in seen:
+                lines.append(f"# TYPE {full} counter")
+                seen.add(full)
+            lab = ",".join(f'{k}="{v}"' for k, v in labels)
+            text = "%d" % value if isinstance(value, int) else repr(float(value))
+            lines.append(f"{full}{{{lab}}} {text}" if lab else f"{full} {text}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,247 @@
+from __future__ import unicode_literals
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from JobJournal import compact_entry
+
+# consecutive entries that must line up with the snapshot before the rest of the listing is taken from it
+_ANCHOR = 5
+# playlist fields kept as last-seen markers
+_MARKER_KEYS = ("playlist_count", "modified_date")
+
+
+def _eid(entry):
+    return entry.get("id") or entry.get("url")
+
+
+def _snap(entry):
+    # compact_entry plus the duration, which tells a re-uploaded or re-cut video from the old one
+    e = compact_entry(entry)
+    if entry.get("duration"):
+        e["duration"] = entry["duration"]
+    return e
+
+
+def moved_ids(old_ids, new_ids):
+    """Ids in both lists that changed place relative to the others.
+
+    The longest run of common ids that kept their order counts as staying
+    put (a longest increasing subsequence), so one item dragged to the top
+    is one move, not a shift of everything it passed.
+    """
+    pos = {}
+    for i, x in enumerate(old_ids):
+        pos.setdefault(x, i)
+    seq = [(pos[x], x) for x in dict.fromkeys(new_ids) if x in pos]
+    tails, tail_at, prev = [], [], [None] * len(seq)
+    for i, (p, _) in enumerate(seq):
+        k = bisect.bisect_left(tails, p)
+        if k == len(tails):
+            tails.append(p)
+            tail_at.append(i)
+        else:
+            tails[k] = p
+            tail_at[k] = i
+        prev[i] = tail_at[k - 1] if k else None
+    keep = set()
+    i = tail_at[-1] if tail_at else None
+    while i is not None:
+        keep.add(seq[i][1])
+        i = prev[i]
+    return [x for _, x in seq if x not in keep]
+
+
+class SyncPlan(object):
+    """One sync run of one playlist: its entries now, what changed, and what is already in the folder.
+
+    Iterating the plan walks the listing lazily, page by page as the caller
+    pulls, so the first entries can download while later pages are still
+    unread. ``entries`` grows as it goes: the part read from the extractor
+    plus, after an early stop, the unchanged rest from the snapshot. Once
+    the listing is known (``complete``) ``added``, ``removed`` and ``moved``
+    are filled in and ``on_listed(plan)`` is called. ``done`` holds the ids
+    downloaded by earlier syncs that are still valid; ``mark_done(idx)``
+    adds to it as the run goes.
+    """
+
+    def __init__(self, key, old, done, markers, count, anchor, source, on_listed=None):
+        self.key = key
+        self.entries = []
+        self.markers = markers
+        self.listed = 0         # entries read from the extractor this time
+        self.early = False      # the listing stopped at known entries
+        self.complete = False
+        self.added, self.removed, self.moved, self.changed = [], [], [], []
+        self.done = set(done)
+        self._old = old
+        self._old_ids = [_eid(e) for e in old]
+        self._count = count
+        self._anchor = anchor
+        self._source = source
+        self._on_listed = on_listed
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        old, old_ids = self._old, self._old_ids
+        by_id = {x: e for x, e in zip(old_ids, old)}
+        last = {x: j for j, x in enumerate(old_ids)}
+        anchor = min(self._anchor, len(old))
+        seen, tail = set(), []
+        seen_at = []    # sorted snapshot positions of the ids listed so far
+        for entry in self._source or ():
+            if not entry:
+                continue
+            e = _snap(entry)
+            x = _eid(e)
+            before = by_id.get(x)
+            if before and e.get("duration") and before.get("duration") and e["duration"] != before["duration"]:
+                self.changed.append(x)
+                with self._lock:
+                    self.done.discard(x)
+            self.entries.append(e)
+            self.listed += 1
+            if x not in seen and x in last:
+                bisect.insort(seen_at, last[x])
+            seen.add(x)
+            j = last.get(x)
+            if anchor and self.listed >= anchor and j is not None and j >= anchor - 1 and \
+                    all(old_ids[j - a] == _eid(self.entries[-1 - a]) for a in range(1, anchor)):
+                # the snapshot's remainder, less entries already listed above (moved up)
+                rest = len(old) - j - 1 - (len(seen_at) - bisect.bisect_right(seen_at, j))
+                if self._count is None or self.listed + rest == self._count:
+                    tail, self.early = [t for t in old[j + 1:] if _eid(t) not in seen], True
+                    self.entries.extend(tail)
+                    self._finish()
+                    yield e
+                    break
+            yield e
+        else:
+            self._finish()
+        yield from tail
+
+    def _finish(self):
+        ids = [_eid(e) for e in self.entries]
+        now, before = set(ids), set(self._old_ids)
+        self.added = [x for x in ids if x not in before]
+        self.removed = [x for x in self._old_ids if x not in now]
+        self.moved = moved_ids(self._old_ids, ids)
+        with self._lock:
+            self.done &= now
+        self._old = self._old_ids = self._source = None
+        self.complete = True
+        if self._on_listed:
+            self._on_listed(self)
+
+    def read(self):
+        """Walk the rest of the listing now (for callers that want the whole plan up front)."""
+        for _ in self:
+            pass
+        return self
+
+    def is_done(self, entry):
+        return _eid(entry) in self.done
+
+    def is_changed(self, entry):
+        return _eid(entry) in self.changed
+
+    def mark_done(self, idx):
+        with self._lock:
+            self.done.add(_eid(self.entries[idx - 1]))
+
+    def report(self):
+        with self._lock:
+            pending = sum(1 for e in self.entries if _eid(e) not in self.done)
+        return {"total": len(self.entries), "listed": self.listed, "stopped_early": self.early,
+                "complete": self.complete, "added": self.added, "removed": self.removed, "moved": self.moved,
+                "changed": self.changed, "pending": pending, "markers": self.markers}
+
+
+class PlaylistSync(object):
+    """Snapshots of mirrored playlists, so a re-run only reads and fetches what changed.
+
+    A snapshot is kept per playlist URL, folder and variant (kind and
+    quality). It holds the entries in order, the ids already downloaded
+    there and the playlist's last-seen markers (count, modified date).
+    ``plan()`` reads the flat listing lazily. As soon as ``anchor``
+    consecutive entries line up with the snapshot and the rest of the
+    snapshot brings the total to the reported ``playlist_count``, the rest
+    of the listing is taken from the snapshot and no further pages are
+    requested. New entries at the top, removals and moves are still seen.
+    Extractors that report no count stop at the first match. With ``full``
+    the whole listing is always read, for playlists that grow at the end
+    without reporting a count.
+    """
+
+    def __init__(self, path, full=False, anchor=_ANCHOR):
+        self.path = path
+        self.full = full
+        self.anchor = max(1, int(anchor))
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " key TEXT PRIMARY KEY, entries TEXT NOT NULL, done TEXT NOT NULL, markers TEXT NOT NULL,"
+            " synced REAL) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(url, folder, variant):
+        folder = os.path.normcase(os.path.abspath(folder))
+        return hashlib.sha1(f"{url}\0{folder}\0{variant}".encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        """The snapshot as {"entries", "done", "markers", "synced"}, or None before the first sync."""
+        with self._lock:
+            row = self._db.execute("SELECT entries, done, markers, synced FROM snapshots WHERE key=?",
+                                   (key,)).fetchone()
+        if row is None:
+            return None
+        return {"entries": json.loads(row[0]), "done": json.loads(row[1]), "markers": json.loads(row[2]),
+                "synced": row[3]}
+
+    # ---------- planning ----------
+    def plan(self, key, head, entries, on_listed=None):
+        """Compare the playlist (``head`` fields + lazy flat ``entries``) with its snapshot.
+
+        Nothing is read yet: iterate the returned plan (or call its ``read()``).
+        """
+        snap = self.load(key) or {"entries": [], "done": []}
+        markers = {k: head.get(k) for k in _MARKER_KEYS if head.get(k) is not None}
+        return SyncPlan(key, snap["entries"], snap["done"], markers, head.get("playlist_count"),
+                        0 if self.full else self.anchor, entries, on_listed)
+
+    def commit(self, plan):
+        """Save ``plan``'s listing and what is downloaded now as the playlist's snapshot.
+
+        A plan whose listing was not walked to the end is not saved (that
+        would drop the unread rest); returns whether it was.
+        """
+        if not plan.complete:
+            return False
+        with plan._lock:
+            done = sorted(plan.done)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO snapshots (key, entries, done, markers, synced) VALUES (?, ?, ?, ?, ?)",
+                (plan.key, json.dumps(plan.entries, ensure_ascii=False), json.dumps(done),
+                 json.dumps(plan.markers), time.time()),
+            )
+            self._db.commit()
+        return True
+
+    def forget(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM snapshots WHERE key=?", (key,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,42 @@
+from __future__ import unicode_literals
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from AsyncCore import LoopThread
+
+
+class QtAsyncBridge(QObject):
+    """Connects Qt's event loop to an asyncio loop running on a LoopThread.
+
+    ``submit(coro, on_done)`` schedules the coroutine on the asyncio loop;
+    ``on_done(result, error)`` is then called on the Qt thread, so slots
+    never block on downloads and asyncio code never touches widgets.
+    ``loop_thread`` can be shared, e.g. with the JobQueue.
+    """
+
+    _finished = pyqtSignal(object, object, object)     # on_done, result, error
+
+    def __init__(self, parent=None, loop_thread=None):
+        super().__init__(parent)
+        self.loop_thread = loop_thread or LoopThread("qt-asyncio").start()
+        self._finished.connect(self._deliver)
+
+    def submit(self, coro, on_done=None):
+        future = self.loop_thread.submit(coro)
+        if on_done:
+            future.add_done_callback(lambda f: self._finished.emit(
+                on_done, None if f.cancelled() or f.exception() else f.result(),
+                None if f.cancelled() else f.exception()))
+        return future
+
+    def run_blocking(self, fn, *args, on_done=None):
+        """Run a plain blocking call off the GUI thread (default executor) and report back."""
+        async def call():
+            return await self.loop_thread.loop.run_in_executor(None, fn, *args)
+        return self.submit(call(), on_done)
+
+    @pyqtSlot(object, object, object)
+    def _deliver(self, on_done, result, error):
+        on_done(result, error)
+
+    def stop(self):
+        self.loop_thread.stop(timeout=10)
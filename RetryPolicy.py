@@ -0,0 +1,254 @@
+from __future__ import unicode_literals
+import collections
+import http.client
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_HTTP_STATUS = re.compile(r"HTTP Error (\d{3})")
+# messages of errors that are worth another try although they carry no status code
+_TRANSIENT = re.compile(r"timed out|timeout|connection (?:reset|refused|aborted)|remote end closed|"
+                        r"incomplete ?read|temporary failure|name resolution|unable to download|"
+                        r"got error|network is unreachable|broken pipe", re.I)
+
+RETRYABLE = ("throttled", "server", "network")
+
+
+def _chain(exc):
+    """``exc`` and whatever it wraps: yt-dlp's exc_info/cause, then __cause__/__context__."""
+    seen = []
+    while exc is not None and exc not in seen and len(seen) < 8:
+        seen.append(exc)
+        wrapped = getattr(exc, "exc_info", None)
+        nxt = (wrapped[1] if isinstance(wrapped, tuple) and len(wrapped) > 1 else None) \
+            or getattr(exc, "cause", None) or exc.__cause__ or exc.__context__
+        exc = nxt if isinstance(nxt, BaseException) else None
+    return seen
+
+
+def _retry_after(exc):
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("Retry-After") if headers is not None else None
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None     # an HTTP date: leave it to the backoff
+
+
+def classify_error(exc):
+    """(kind, status, retry_after) of a failed attempt.
+
+    kind is "throttled" (429), "server" (5xx), "network" (timeouts, resets,
+    truncated bodies) or "fatal" (anything a retry won't fix: 4xx, unsupported
+    or unavailable videos, post-processing errors).
+    """
+    status = retry_after = None
+    chain = _chain(exc)
+    for e in chain:
+        code = getattr(e, "status", None) or getattr(e, "code", None)
+        if isinstance(code, int) and 100 <= code < 600:
+            status, retry_after = code, _retry_after(e)
+            break
+    if status is None:
+        m = _HTTP_STATUS.search(" ".join(str(e) for e in chain))
+        status = int(m.group(1)) if m else None
+    if status == 429:
+        return "throttled", status, retry_after
+    if status is not None and status >= 500:
+        return "server", status, retry_after
+    if status == 408:
+        return "network", status, retry_after
+    if status is not None and status >= 400:
+        return "fatal", status, None
+    if any(isinstance(e, (ConnectionError, TimeoutError, http.client.IncompleteRead)) for e in chain) \
+            or _TRANSIENT.search(" ".join(str(e) for e in chain)):
+        return "network", None, None
+    return "fatal", None, None
+
+
+def host_of(url, default=""):
+    return urlsplit(url or "").hostname or default
+
+
+class CircuitBreaker(object):
+    """Admission control for one host, shared by every job that talks to it.
+
+    Concurrency is adjusted additively-increase / multiplicatively-decrease:
+    a 429 or 5xx halves ``limit``, and each run of ``limit`` successes raises
+    it by one, up to ``max_limit``. When throttling dominates the recent
+    ``window`` of outcomes the breaker opens and no new attempt starts until
+    the cooldown (doubling with each consecutive trip, at least any
+    Retry-After the server sent) has passed; then one probe is let through
+    (half-open) and its outcome closes or re-opens the breaker.
+
+    Attempts name their ``item`` (its URL). Only an item's first failure
+    counts against the host: its retries failing again say something about
+    the item, not the host, so they neither lower the limit nor trip the
+    breaker, and while half-open an item that has already failed waits for
+    an untried one to take the probe.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    # items remembered as failing; the oldest are forgotten first
+    MAX_SUSPECTS = 256
+
+    def __init__(self, host, max_limit=8, window=20, trip_ratio=0.5, min_samples=4,
+                 cooldown=5.0, max_cooldown=300.0):
+        self.host = host
+        self.max_limit = max(1, int(max_limit))
+        self.limit = self.max_limit
+        self.trip_ratio = trip_ratio
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.trips = 0          # consecutive trips; reset by a successful probe
+        self.opened = 0         # trips over the breaker's life
+        self._outcomes = collections.deque(maxlen=window)   # True = throttled/server error
+        self._open_until = 0.0
+        self._in_flight = 0
+        self._successes = 0
+        self._suspects = collections.OrderedDict()     # items whose last attempt failed with pressure
+        self._fresh_waiting = 0     # untried items waiting for a slot
+        self._cv = threading.Condition()
+
+    def _admissible(self, now, suspect=False):
+        # caller holds the lock
+        if self.state == self.OPEN:
+            if now < self._open_until:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            return self._in_flight == 0 and not (suspect and self._fresh_waiting)
+        return self._in_flight < self.limit
+
+    @contextmanager
+    def slot(self, check=None, item=None):
+        """Hold one of the host's attempt slots; ``check()`` is polled while waiting (to raise on cancel)."""
+        with self._cv:
+            suspect = item is not None and item in self._suspects
+            if not suspect:
+                self._fresh_waiting += 1
+            try:
+                while not self._admissible(time.monotonic(), suspect):
+                    if check:
+                        check()
+                    wait = self._open_until - time.monotonic() if self.state == self.OPEN else 0.25
+                    self._cv.wait(min(0.25, max(0.01, wait)))
+            finally:
+                if not suspect:
+                    self._fresh_waiting -= 1
+            self._in_flight += 1
+        try:
+            yield self
+        finally:
+            with self._cv:
+                self._in_flight -= 1
+                self._cv.notify_all()
+
+    def record(self, kind=None, retry_after=None, item=None):
+        """Outcome of one attempt at ``item``: None for success, else a kind from ``classify_error``."""
+        pressure = kind in ("throttled", "server")
+        with self._cv:
+            now = time.monotonic()
+            if item is not None:
+                repeat = item in self._suspects
+                if pressure:
+                    self._suspects[item] = True
+                    self._suspects.move_to_end(item)
+                    while len(self._suspects) > self.MAX_SUSPECTS:
+                        self._suspects.popitem(last=False)
+                else:
+                    self._suspects.pop(item, None)
+                if pressure and repeat:
+                    if kind == "throttled" and retry_after:
+                        # a wait the server named still holds for everyone
+                        self._open_until = max(self._open_until, now + retry_after)
+                        self.state = self.OPEN
+                    self._cv.notify_all()
+                    return
+            self._outcomes.append(pressure)
+            if pressure:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            elif kind is None:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            if self.state == self.HALF_OPEN:
+                if pressure:
+                    self._trip(now, retry_after)
+                elif kind is None:
+                    self.state, self.trips = self.CLOSED, 0
+                    self._outcomes.clear()
+            elif self.state == self.CLOSED and pressure:
+                bad = sum(self._outcomes)
+                if len(self._outcomes) >= self.min_samples and bad >= self.trip_ratio * len(self._outcomes):
+                    self._trip(now, retry_after)
+                elif retry_after:
+                    # the server named a wait: nobody starts before it has passed
+                    self._open_until = max(self._open_until, now + retry_after)
+                    self.state = self.OPEN
+            self._cv.notify_all()
+
+    def _trip(self, now, retry_after=None):
+        # caller holds the lock
+        wait = min(self.max_cooldown, self.cooldown * 2 ** self.trips)
+        self._open_until = max(self._open_until, now + max(wait, retry_after or 0))
+        self.state = self.OPEN
+        self.trips += 1
+        self.opened += 1
+        self._outcomes.clear()
+
+    def snapshot(self):
+        with self._cv:
+            return {"host": self.host, "state": self.state, "limit": self.limit, "in_flight": self._in_flight,
+                    "opened": self.opened,
+                    "open_for_s": max(0.0, self._open_until - time.monotonic()) if self.state == self.OPEN else 0.0}
+
+
+class RetryPolicy(object):
+    """Per-item retries with exponential backoff and full jitter, plus one CircuitBreaker per host.
+
+    Give the same instance to every Download (e.g. through JobQueue's
+    download kwargs) so that all jobs hitting a throttled host back off
+    together. An item is tried at most ``attempts`` times; the wait before
+    try n+1 is uniform in [0, min(max_delay, base_delay * 2**n)], or the
+    server's Retry-After if that is longer.
+    """
+
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=60.0, host_concurrency=8, **breaker_kwargs):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.host_concurrency = host_concurrency
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self.retries = 0
+
+    def breaker(self, host):
+        with self._lock:
+            b = self._breakers.get(host)
+            if b is None:
+                b = self._breakers[host] = CircuitBreaker(host, self.host_concurrency, **self.breaker_kwargs)
+            return b
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait after the ``attempt``-th failed try."""
+        with self._lock:
+            self.retries += 1
+            delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+            retries = self.retries
+        return {"retries": retries, "hosts": [b.snapshot() for b in breakers]}
@@ -0,0 +1,188 @@
+from __future__ import unicode_literals
+import json
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class SegmentedDownloader(object):
+    """Fetch one HTTP resource over several connections.
+
+    The file is split into byte ranges, the ``.part`` file is preallocated to
+    the full size and every range is written at its own offset by its own
+    thread. Servers without Range support fall back to a single stream.
+    ``progress(done, total)`` is called from the segment threads; raising
+    from it aborts the whole download. ``throttle(nbytes)`` may block to
+    hold the combined rate of all segments down.
+
+    When a download stops early (pause, cancel, error) the unfinished
+    ranges are saved next to the ``.part`` file as ``.part.ranges``, and
+    the next ``fetch`` of the same path continues from those offsets. If the
+    server has stopped honouring Range by then, the bytes can't be skipped
+    and the single stream fetches the whole file again; it writes to its own
+    temp file and only replaces the saved ranges once it has succeeded, so
+    a failed fallback still leaves them to resume from later.
+    """
+
+    def __init__(self, segments=4, chunk_size=256 * 1024, min_segment=1024 * 1024,
+                 timeout=30, retries=3, progress=None, throttle=None):
+        self.segments = max(1, int(segments))
+        self.chunk_size = chunk_size
+        self.min_segment = min_segment
+        self.timeout = timeout
+        self.retries = retries
+        self.progress = progress
+        self.throttle = throttle
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+        self._pos = {}      # segment -> next byte offset to fetch
+
+    # ---------- probing ----------
+    def _open(self, url, headers, start=None, end=None):
+        req = urllib.request.Request(url, headers=dict(headers or {}))
+        if start is not None:
+            req.add_header("Range", f"bytes={start}-{'' if end is None else end}")
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def probe(self, url, headers=None):
+        """Return (size or None, ranges_supported)."""
+        with self._open(url, headers, 0, 0) as r:
+            if r.status == 206:
+                m = _CONTENT_RANGE.match(r.headers.get("Content-Range") or "")
+                if m and m.group(3) != "*":
+                    return int(m.group(3)), True
+            length = r.headers.get("Content-Length")
+            return (int(length) if length and r.status == 200 else None), False
+
+    def plan(self, size):
+        count = max(1, min(self.segments, size // self.min_segment or 1))
+        step = size // count
+        ranges = []
+        for i in range(count):
+            start = i * step
+            end = size - 1 if i == count - 1 else start + step - 1
+            ranges.append((start, end))
+        return ranges
+
+    # ---------- download ----------
+    def _advance(self, n):
+        if self.throttle:
+            self.throttle(n)
+        with self._lock:
+            self._done += n
+            done, total = self._done, self._total
+        if self.progress:
+            self.progress(done, total)
+
+    def _fetch_range(self, url, headers, part, slot, start, end, errors):
+        pos = start
+        attempt = 0
+        with open(part, "r+b") as f:
+            while pos <= end and not errors:
+                try:
+                    with self._open(url, headers, pos, end) as r:
+                        if r.status != 206:
+                            raise IOError(f"server ignored Range request (HTTP {r.status})")
+                        f.seek(pos)
+                        while pos <= end and not errors:
+                            block = r.read(min(self.chunk_size, end - pos + 1))
+                            if not block:
+                                break
+                            f.write(block)
+                            pos += len(block)
+                            self._pos[slot] = pos
+                            self._advance(len(block))
+                    if pos <= end:
+                        raise IOError(f"connection closed at byte {pos} of range {start}-{end}")
+                except (urllib.error.URLError, IOError, OSError) as e:
+                    attempt += 1
+                    if attempt > self.retries:
+                        errors.append(e)
+                        return
+                except BaseException as e:
+                    errors.append(e)
+                    return
+
+    def _fetch_single(self, url, headers, part):
+        with self._open(url, headers) as r, open(part, "wb") as f:
+            while True:
+                block = r.read(self.chunk_size)
+                if not block:
+                    break
+                f.write(block)
+                self._advance(len(block))
+
+    def fetch(self, url, path, headers=None):
+        """Download ``url`` to ``path``; returns the number of bytes written."""
+        part = path + ".part"
+        self._done = 0
+        size, ranged = self.probe(url, headers)
+        self._total = size or 0
+
+        state = part + ".ranges"
+        if not ranged or not size or self.segments == 1:
+            resumable = os.path.exists(state)
+            target = part + ".single" if resumable else part
+            try:
+                self._fetch_single(url, headers, target)
+            except BaseException:
+                if resumable:
+                    self._remove(target)
+                raise
+            os.replace(target, path)
+            if resumable:
+                self._remove(part)
+                self._remove(state)
+            return self._done
+
+        ranges = self._load_ranges(state, part, size)
+        if ranges is None:
+            with open(part, "wb") as f:
+                f.truncate(size)  # preallocate so every segment can write at its offset
+            ranges = self.plan(size)
+        self._done = size - sum(e - s + 1 for s, e in ranges)
+        self._pos = {i: s for i, (s, e) in enumerate(ranges)}
+
+        errors = []
+        threads = [
+            threading.Thread(target=self._fetch_range, args=(url, headers, part, i, s, e, errors),
+                             name=f"segment-{i}", daemon=True)
+            for i, (s, e) in enumerate(ranges)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            left = [(self._pos[i], e) for i, (s, e) in enumerate(ranges) if self._pos[i] <= e]
+            with open(state, "w", encoding="utf-8") as f:
+                json.dump({"size": size, "ranges": left}, f)
+            raise errors[0]
+        if os.path.exists(state):
+            os.remove(state)
+        os.replace(part, path)
+        return size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _load_ranges(state, part, size):
+        # ranges left by an interrupted fetch, if they still describe this file
+        try:
+            with open(state, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("size") == size and os.path.getsize(part) == size:
+                return [tuple(r) for r in data["ranges"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
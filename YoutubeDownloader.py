@@ -1,20 +1,60 @@
 from __future__ import unicode_literals
 import os
 import sys
-import threading
 
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QApplication, QFileDialog, QWidget
 from PyQt5.QtCore import QStandardPaths, QEventLoop, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor
 
-from DownloadMethods import Download
+from AppPaths import app_data_dir
+from MetadataCache import MetadataCache
+from DownloadArchive import DownloadArchive
+from JobQueue import JobQueue, parse_urls, RUNNING, PAUSED, PENDING, DONE, FINAL_STATES
+from JobJournal import JobJournal
+from BandwidthScheduler import BandwidthScheduler
+from Metrics import Metrics, JsonLinesSink
+from FormatSelector import FormatSelector
+from QtAsync import QtAsyncBridge
+from DownloaderContext import DownloaderContext
+from RetryPolicy import RetryPolicy
+from ContentStore import ContentStore
+from MergePool import MergePool
+from ControlServer import ControlServer
+
+# playlist entries downloaded side by side
+PLAYLIST_CONCURRENCY = 4
+# queued jobs running at the same time
+MAX_JOBS = 2
+# yt_dlp is imported in the background this long after the window is up
+ENGINE_PRELOAD_MS = 300
+# set to serve the local control API (ControlServer) on this port while the window is open
+CONTROL_PORT = int(os.environ.get("YTDL_CONTROL_PORT") or 0)
 
 
 def res_path(rel: str) -> str:
     base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base, rel)
 
+def _setup_ui(window):
+    """Build the widgets from Graphics_ui.py (compiled by YoutubeDownloader.spec), else parse Graphics.ui."""
+    ui_file = res_path("Graphics.ui")
+    try:
+        from Graphics_ui import Ui_MainWindow
+    except ImportError:
+        Ui_MainWindow = None
+    if Ui_MainWindow is not None:
+        compiled = sys.modules[Ui_MainWindow.__module__].__file__
+        # a source checkout may have edited the .ui since the last build
+        if not os.path.isfile(ui_file) or os.path.getmtime(compiled) >= os.path.getmtime(ui_file):
+            Ui_MainWindow().setupUi(window)
+            return
+    from PyQt5 import uic
+    uic.loadUi(ui_file, window)
+
+def _preload_engine():
+    import DownloadMethods  # noqa: F401  (pulls in yt_dlp)
+
 def _system_theme():
     try:
         if sys.platform.startswith("win"):
@@ -36,13 +76,11 @@ def _system_theme():
 
 class MainWindow(QtWidgets.QMainWindow):
     # >>> Thread-safe channels
-    sig_progress = pyqtSignal(dict)           # payload from downloader
-    sig_title    = pyqtSignal(str, object, object)  # title, idx, total
-    sig_finish   = pyqtSignal(bool, str)      # success, message
+    sig_job      = pyqtSignal(object)         # JobQueue.Job that changed
 
     def __init__(self):
         super().__init__()
-        uic.loadUi(res_path("Graphics.ui"), self)
+        _setup_ui(self)
 
         # Bind widgets
         self.label_top       = self.findChild(QtWidgets.QLabel,      "label")
@@ -62,7 +100,19 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Window props
         self.setWindowTitle("Youtube Downloader")
-        self.setFixedSize(592, 360) 
+        self.setFixedSize(592, 500)
+
+        # Queue view (filled from JobQueue updates, right-click for per-job actions)
+        self.list_queue = QtWidgets.QListWidget(self.central)
+        self.list_queue.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.list_queue.customContextMenuRequested.connect(self._queue_menu)
+        self.list_queue.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self._queue_items = {}
+
+        # Pause / Resume / Cancel act on the selected jobs, or on every job when nothing is selected
+        self.button_pause  = QtWidgets.QPushButton("Pause", self.central)
+        self.button_resume = QtWidgets.QPushButton("Resume", self.central)
+        self.button_cancel = QtWidgets.QPushButton("Cancel", self.central)
 
         # Be sure both labels can wrap/show fully
         self.label_done.setWordWrap(True)
@@ -103,26 +153,68 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Hand cursor on buttons
         pointing = QtGui.QCursor(QtCore.Qt.PointingHandCursor)
-        for btn in (self.button_download, self.button_set, self.themeButton):
+        for btn in (self.button_download, self.button_set, self.themeButton,
+                    self.button_pause, self.button_resume, self.button_cancel):
             btn.setCursor(pointing)
 
         # Signals/slots (thread-safe)
-        self.sig_progress.connect(self._on_progress_gui)
-        self.sig_title.connect(self._show_initial_title)
-        self.sig_finish.connect(self._on_download_finished_gui)
+        self.sig_job.connect(self._on_job_update)
 
         # Buttons
         self.button_download.clicked.connect(self.download_button)
         self.button_set.clicked.connect(self.set_button)
+        self.button_pause.clicked.connect(lambda: self._control_jobs(self.queue.pause, (PENDING, RUNNING)))
+        self.button_resume.clicked.connect(lambda: self._control_jobs(self.queue.resume, (PAUSED,)))
+        self.button_cancel.clicked.connect(self._cancel_jobs)
         self.themeButton.clicked.connect(self.toggle_theme)
 
         # State
+        self.meta_cache = MetadataCache(os.path.join(app_data_dir(), "metadata.sqlite"))
+        self.archive = DownloadArchive(os.path.join(app_data_dir(), "archive.sqlite"))
+        self.bandwidth = BandwidthScheduler()
+        self.metrics = Metrics([JsonLinesSink(os.path.join(app_data_dir(), "metrics.jsonl"))])
+        # one asyncio loop for the app: queue jobs run on it, results come back as Qt signals
+        self.bridge = QtAsyncBridge(self)
+        self.queue = JobQueue(
+            loop=self.bridge.loop_thread,
+            max_jobs=MAX_JOBS,
+            on_update=self.sig_job.emit,
+            journal_dir=os.path.join(app_data_dir(), "journal"),
+            concurrency=PLAYLIST_CONCURRENCY,
+            cache=self.meta_cache,
+            archive=self.archive,
+            bandwidth=self.bandwidth,
+            metrics=self.metrics,
+            formats=FormatSelector(cache=self.meta_cache),
+            context=DownloaderContext(),
+            retry=RetryPolicy(host_concurrency=MAX_JOBS * PLAYLIST_CONCURRENCY),
+            continue_on_error=True,
+            failed_report=os.path.join(app_data_dir(), "failed.jsonl"),
+            store=ContentStore(os.path.join(app_data_dir(), "store")),
+            merger=MergePool(),
+        )
         self.current_title = None
         self._saw_progress = False
 
         # >>> Place bottom widgets now and keep them placed on resize
         self._place_bottom_controls()
 
+        # Offer to continue jobs an earlier session left unfinished (journals are read off the GUI thread)
+        self.bridge.run_blocking(JobJournal.unfinished, self.queue.journal_dir, on_done=self._offer_resume)
+        self.control = None
+        if CONTROL_PORT:
+            # jobs submitted over the API show up in the queue list like any other
+            self.control = ControlServer(
+                self.queue, QStandardPaths.writableLocation(QStandardPaths.DownloadLocation),
+                port=CONTROL_PORT, token=os.environ.get("YTDL_CONTROL_TOKEN"), loop=self.bridge.loop_thread)
+            self.control.start()
+            # local tools read the token from here (a random one unless YTDL_CONTROL_TOKEN is set)
+            token_file = os.path.join(app_data_dir(), "control-token")
+            with open(os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                f.write(self.control.token)
+        # the window comes up without yt_dlp; warm it up off the GUI thread so the first job doesn't wait
+        QtCore.QTimer.singleShot(ENGINE_PRELOAD_MS, lambda: self.bridge.run_blocking(_preload_engine))
+
     # ---------- bottom controls placer ----------
     def _place_bottom_controls(self):
         """Anchor progress labels, bar and the Toggle Theme button."""
@@ -150,6 +242,15 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         safe_top = lower_row_bottom + 12
 
+        # --- Queue list right under the form, its control buttons below; labels/bar stay below them
+        queue_h = 92
+        self.list_queue.setGeometry(margin_left, safe_top, cw_w - (margin_left + margin_right), queue_h)
+        safe_top += queue_h + 6
+        ctl_w, ctl_h = 90, 26
+        for i, b in enumerate((self.button_pause, self.button_resume, self.button_cancel)):
+            b.setGeometry(margin_left + i * (ctl_w + 8), safe_top, ctl_w, ctl_h)
+        safe_top += ctl_h + 8
+
         # --- Toggle Theme (bottom-right, with a small right margin)
         btn = self.themeButton
         btn_w = max(150, btn.sizeHint().width())
@@ -231,38 +332,142 @@ class MainWindow(QtWidgets.QMainWindow):
             self.input_path.setText(folder)
 
     def download_button(self):
-        url = self.input_url.text().strip()
+        urls = parse_urls(self.input_url.text())
         save_path = self.input_path.text().strip()
 
-        if not (url.startswith("http://") or url.startswith("https://")):
+        if not urls:
             QtWidgets.QMessageBox.warning(self, "Invalid URL", "Please paste a valid video/playlist URL.")
             return
         if not os.path.isdir(save_path):
             QtWidgets.QMessageBox.warning(self, "Invalid Folder", "Please choose an existing download folder.")
             return
 
-        # Reset + show progress UI
-        self.label_done.setText("")
-        self.current_title = None
-        self._saw_progress = False
-        self._set_progress_text("Preparing…")
-        self.label_progress.show()
-        self.progress_bar.setValue(0)
-        self.progress_bar.show()
-
-        # Disable + busy cursor
-        self.button_download.setEnabled(False)
-        QApplication.setOverrideCursor(QtGui.QCursor(QtCore.Qt.BusyCursor))
-
-        quality = self.combo_quality.currentText()
-        playlist = self.radio_playlist.isChecked()
-        video_format = self.check_video.isChecked()
+        self._enqueue(lambda q, *args: q.add_many(urls, *args))
+        self.input_url.setText("")
 
-        threading.Thread(
-            target=self.download_thread,
-            args=(url, save_path, quality, playlist, video_format),
-            daemon=True,
-        ).start()
+    def add_url_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Add URLs from file", self.input_path.text(),
+                                              "Text files (*.txt);;All files (*)")
+        save_path = self.input_path.text().strip()
+        if not path:
+            return
+        if not os.path.isdir(save_path):
+            QtWidgets.QMessageBox.warning(self, "Invalid Folder", "Please choose an existing download folder.")
+            return
+        self._enqueue(lambda q, *args: q.add_file(path, *args))
+
+    def _enqueue(self, add):
+        # Reset + show progress UI when the queue was idle
+        if not self.queue.active():
+            self.label_done.setText("")
+            self.current_title = None
+            self._saw_progress = False
+            self._set_progress_text("Preparing…")
+            self.label_progress.show()
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+
+        add(self.queue, self.input_path.text().strip(), self.combo_quality.currentText(),
+            self.radio_playlist.isChecked(), self.check_video.isChecked())
+
+    def _offer_resume(self, left, error=None):
+        if error or not left:
+            return
+        names = "\n".join(f"• {j.title or j.spec.get('url')}" for j in left[:5])
+        more = f"\n… and {len(left) - 5} more" if len(left) > 5 else ""
+        answer = QtWidgets.QMessageBox.question(
+            self, "Resume downloads",
+            f"{len(left)} download(s) did not finish last time:\n{names}{more}\n\nResume them now?")
+        if answer == QtWidgets.QMessageBox.Yes:
+            self._enqueue(lambda q, *args: q.restore())
+        else:
+            for j in left:
+                j.discard(remove_partials=True)
+
+    # ---------- Queue view (GUI thread) ----------
+    def _queue_menu(self, pos):
+        item = self.list_queue.itemAt(pos)
+        job = self.queue.get(item.data(QtCore.Qt.UserRole)) if item else None
+        menu = QtWidgets.QMenu(self)
+        if job:
+            if job.state in (PENDING, RUNNING):
+                menu.addAction("Pause", lambda: self.queue.pause(job.id))
+            if job.state == PAUSED:
+                menu.addAction("Resume", lambda: self.queue.resume(job.id))
+            if job.state == PENDING:
+                menu.addAction("Move to top", lambda: self.queue.set_priority(
+                    job.id, max(j.priority for j in self.queue.jobs()) + 1))
+            if job.state not in FINAL_STATES:
+                menu.addAction("Cancel", lambda: self.queue.cancel(job.id))
+            menu.addSeparator()
+        menu.addAction("Add URLs from file…", self.add_url_file)
+        menu.addAction("Clear finished", self._clear_finished)
+        menu.addAction("Bandwidth limit…", self._ask_bandwidth)
+        menu.exec_(self.list_queue.viewport().mapToGlobal(pos))
+
+    def _selected_jobs(self, states):
+        ids = [it.data(QtCore.Qt.UserRole) for it in self.list_queue.selectedItems()]
+        jobs = [self.queue.get(i) for i in ids] if ids else self.queue.jobs()
+        return [j for j in jobs if j and j.state in states]
+
+    def _control_jobs(self, action, states):
+        for job in self._selected_jobs(states):
+            action(job.id)
+
+    def _cancel_jobs(self):
+        jobs = self._selected_jobs((PENDING, RUNNING, PAUSED))
+        if not jobs:
+            return
+        answer = QtWidgets.QMessageBox.question(
+            self, "Cancel downloads",
+            f"Cancel {len(jobs)} download(s)? Partially downloaded files will be deleted.")
+        if answer == QtWidgets.QMessageBox.Yes:
+            for job in jobs:
+                self.queue.cancel(job.id)
+
+    def _ask_bandwidth(self):
+        current = (self.bandwidth.global_limit or 0) // 1024
+        kbps, ok = QtWidgets.QInputDialog.getInt(
+            self, "Bandwidth limit", "Total download rate in KB/s (0 = unlimited):", current, 0, 10 ** 7, 64)
+        if ok:
+            # applies to running downloads too
+            self.bandwidth.set_global_limit(kbps * 1024)
+
+    def _clear_finished(self):
+        self.queue.remove_finished()
+        for job_id in list(self._queue_items):
+            if self.queue.get(job_id) is None:
+                self.list_queue.takeItem(self.list_queue.row(self._queue_items.pop(job_id)))
+
+    @QtCore.pyqtSlot(object)
+    def _on_job_update(self, job):
+        item = self._queue_items.get(job.id)
+        if item is None:
+            item = QtWidgets.QListWidgetItem()
+            item.setData(QtCore.Qt.UserRole, job.id)
+            self.list_queue.addItem(item)
+            self._queue_items[job.id] = item
+        name = job.title or job.url
+        detail = job.error if job.error else f"{job.percent}%"
+        if job.failed:
+            detail += f", {len(job.failed)} failed"
+            item.setToolTip(job.url + "".join(f"\n{f['idx']}: {f['title'] or f['url']} — {f['error']}"
+                                              for f in job.failed))
+        else:
+            item.setToolTip(job.url)
+        item.setText(f"[{job.state}] {name} — {detail}")
+
+        if job.state == RUNNING and job.progress:
+            if job.progress.get("status") == "starting" and not self._saw_progress:
+                self._show_initial_title(job.progress.get("title"), job.progress.get("idx"),
+                                         job.progress.get("total"))
+            else:
+                self._on_progress_gui(job.progress)
+        elif job.state in FINAL_STATES and not self.queue.active():
+            message = job.result or job.error or job.state
+            if job.failed:
+                message += f"\n{len(job.failed)} item(s) failed (see failed.jsonl)"
+            self._on_download_finished_gui(job.state == DONE, message)
 
     # ---------- Title helper (GUI thread) ----------
     @QtCore.pyqtSlot(str, object, object)
@@ -272,53 +477,6 @@ class MainWindow(QtWidgets.QMainWindow):
         shown = self.current_title or "..."
         self._set_progress_text(f"{prefix} — {shown} (0%)")
 
-    # ---------- Thread body ----------
-    def download_thread(self, url, save_path, quality, playlist, video_format):
-        try:
-            # Early metadata -> show title + idx/total quickly (works for playlists)
-            try:
-                import yt_dlp as ydl
-                probe = ydl.YoutubeDL({
-                    "quiet": True,
-                    "noplaylist": not playlist,
-                    # flat extract is reliable for counting entries/titles fast
-                    "extract_flat": True,
-                    "skip_download": True,
-                }).extract_info(url, download=False)
-
-                title, idx, total = None, None, None
-                if playlist and probe.get("entries"):
-                    entries = [e for e in (probe.get("entries") or []) if e]
-                    total = len(entries)
-                    if entries:
-                        first = entries[0]
-                        title = first.get("title") or first.get("fulltitle")
-                        idx = 1
-                else:
-                    title = probe.get("title") or probe.get("fulltitle")
-
-                if title:
-                    self.sig_title.emit(title, idx, total)
-            except Exception as e:
-                print(f"[APP] Title probe failed: {e}", flush=True)
-
-            # Download with thread-safe emitter
-            def thread_safe_emit(payload: dict):
-                self.sig_progress.emit(payload)
-
-            downloader = Download(
-                url, save_path, quality, playlist, video_format,
-                progress_cb=thread_safe_emit
-            )
-            name = downloader.mp4_download() if video_format else downloader.mp3_download()
-            self.sig_finish.emit(True, name)
-
-        except Exception as e:
-            self.sig_finish.emit(False, str(e))
-        finally:
-            QtCore.QTimer.singleShot(0, QtWidgets.QApplication.restoreOverrideCursor)
-
-
     # ---------- Progress + finish (GUI thread) ----------
     @QtCore.pyqtSlot(dict)
     def _on_progress_gui(self, payload: dict):
@@ -333,7 +491,11 @@ class MainWindow(QtWidgets.QMainWindow):
         file_p = payload.get("file_percent")
         overall = payload.get("overall_percent")
 
-        prefix = f"Downloading {idx}/{total}" if (idx and total) else "Downloading"
+        verb = {"postprocess": "Converting", "retrying": "Retrying", "failed": "Failed", "stored": "Reused"}.get(
+            payload.get("status"), "Downloading")
+        if idx and not total and payload.get("seen"):
+            total = f"{payload['seen']}+"   # playlist still growing
+        prefix = f"{verb} {idx}/{total}" if (idx and total) else verb
         shown_title = self.current_title or title or ""
         text = prefix + (f" — {shown_title}" if shown_title else "")
         if file_p is not None:
@@ -342,15 +504,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.progress_bar.setValue(int(overall if overall is not None else (file_p or 0)))
 
-        # force paint on Windows (helps when stdout is spammy)
-        self.progress_bar.repaint()
-        QApplication.processEvents(QEventLoop.AllEvents, 5)
-
     @QtCore.pyqtSlot(bool, str)
     def _on_download_finished_gui(self, success: bool, message: str):
-        QApplication.restoreOverrideCursor()
-        self.button_download.setEnabled(True)
-
         if success:
             if not self._saw_progress:
                 if not self.current_title and message:
@@ -373,6 +528,13 @@ class MainWindow(QtWidgets.QMainWindow):
             if self.statusBar():
                 self.statusBar().clearMessage()
 
+    def closeEvent(self, e):
+        if self.control:
+            self.control.close()
+        self.queue.stop()
+        self.bridge.stop()
+        super().closeEvent(e)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
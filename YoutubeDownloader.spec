@@ -1,53 +1,61 @@
-# -*- mode: python ; coding: utf-8 -*-
-from pathlib import Path
-
-block_cipher = None
-
-# Use the folder you run PyInstaller from
-BASE = Path.cwd()
-
-DATAS = [
-    (str(BASE / "Graphics.ui"), "."),
-    (str(BASE / "YouTube.ico"), "."),
-]
-
-BINARIES = [
-    (str(BASE / "tools" / "ffmpeg" / "ffmpeg.exe"),  "tools/ffmpeg"),
-    (str(BASE / "tools" / "ffmpeg" / "ffprobe.exe"), "tools/ffmpeg"),
-]
-
-HIDDEN = ["PyQt5", "PyQt5.QtCore", "PyQt5.QtGui", "PyQt5.QtWidgets", "yt_dlp"]
-
-a = Analysis(
-    ["YoutubeDownloader.py"],
-    pathex=[str(BASE)],
-    binaries=BINARIES,
-    datas=DATAS,
-    hiddenimports=HIDDEN,
-    hookspath=[],
-    runtime_hooks=[],
-    excludes=[],
-    noarchive=False,
-)
-
-pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    name="YoutubeDownloader",
-    icon=str(BASE / "YouTube.ico"),
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,                 # ok even if UPX is missing
-    console=False,            # GUI app
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+# -*- mode: python ; coding: utf-8 -*-
+from pathlib import Path
+
+block_cipher = None
+
+# Use the folder you run PyInstaller from
+BASE = Path.cwd()
+
+# Compile the .ui to Python once here instead of parsing it with uic.loadUi on every launch
+from PyQt5 import uic
+with open(BASE / "Graphics.ui", encoding="utf-8") as src, \
+        open(BASE / "Graphics_ui.py", "w", encoding="utf-8") as out:
+    uic.compileUi(src, out)
+
+DATAS = [
+    (str(BASE / "YouTube.ico"), "."),
+]
+
+BINARIES = [
+    (str(BASE / "tools" / "ffmpeg" / "ffmpeg.exe"),  "tools/ffmpeg"),
+    (str(BASE / "tools" / "ffmpeg" / "ffprobe.exe"), "tools/ffmpeg"),
+]
+
+# yt_dlp and Graphics_ui are only imported inside functions (after the window is up);
+# requests is what yt-dlp pools and keeps connections alive with (DownloaderContext), imported by it lazily
+HIDDEN = ["PyQt5", "PyQt5.QtCore", "PyQt5.QtGui", "PyQt5.QtWidgets", "yt_dlp", "Graphics_ui", "DownloadMethods",
+          "requests", "urllib3", "yt_dlp.networking._requests"]
+
+a = Analysis(
+    ["YoutubeDownloader.py"],
+    pathex=[str(BASE)],
+    binaries=BINARIES,
+    datas=DATAS,
+    hiddenimports=HIDDEN,
+    hookspath=[],
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+)
+
+pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    name="YoutubeDownloader",
+    icon=str(BASE / "YouTube.ico"),
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,                 # ok even if UPX is missing
+    console=False,            # GUI app
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
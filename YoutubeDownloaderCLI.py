@@ -0,0 +1,222 @@
+"""Headless entry point: same downloads as the GUI, no Qt.
+
+    python YoutubeDownloaderCLI.py URL [URL ...] [-o DIR] [--video] [--quality Best|Semi|Worst]
+                                   [--playlist] [--concurrency N] [--segments N] [--jobs N] [--batch-file FILE] [--json]
+
+With --json every job update is printed to stdout as one JSON object per line.
+With --serve PORT it also takes jobs over a local HTTP/JSON API (see ControlServer)
+and keeps running until interrupted.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from AppPaths import app_data_dir
+from DownloadArchive import DownloadArchive
+from MetadataCache import MetadataCache
+from JobQueue import JobQueue, parse_urls, DONE, FINAL_STATES
+from BandwidthScheduler import BandwidthScheduler
+from Metrics import Metrics, JsonLinesSink, PrometheusSink
+from FormatSelector import FormatSelector
+from DownloaderContext import DownloaderContext
+from RetryPolicy import RetryPolicy
+from ContentStore import ContentStore
+from MergePool import MergePool
+from ControlServer import ControlServer
+from PlaylistSync import PlaylistSync
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="YoutubeDownloaderCLI",
+                                 description="Download videos, audio and playlists without the GUI.")
+    ap.add_argument("urls", nargs="*", help="video or playlist URLs")
+    ap.add_argument("-a", "--batch-file", help="text file with one URL per line")
+    ap.add_argument("-o", "--output", default=os.getcwd(), help="output folder (default: current folder)")
+    ap.add_argument("--video", action="store_true", help="download video (mp4) instead of audio (mp3)")
+    ap.add_argument("-q", "--quality", choices=("Best", "Semi", "Worst"), default="Best")
+    ap.add_argument("-p", "--playlist", action="store_true", help="treat URLs as playlists")
+    ap.add_argument("-c", "--concurrency", type=int, default=4, help="playlist entries downloaded at once")
+    ap.add_argument("-s", "--segments", type=int, default=1,
+                    help="connections per video stream for large files (1 = off)")
+    ap.add_argument("-r", "--limit-rate", help="total download rate cap shared by all jobs, e.g. 2M or 500K")
+    ap.add_argument("--job-limit-rate", help="rate cap for each single job, e.g. 1M")
+    ap.add_argument("--accept-audio", default="mp3",
+                    help="audio codecs kept without re-encoding, e.g. mp3,m4a,opus (default: mp3)")
+    ap.add_argument("--max-height", type=int, help="never fetch video taller than this, e.g. 1080")
+    ap.add_argument("-j", "--jobs", type=int, default=2, help="URLs processed at once")
+    ap.add_argument("--timeout", type=float, help="fail a job that runs longer than this many seconds")
+    ap.add_argument("--retries", type=int, default=4,
+                    help="tries per item on throttling, server or network errors (1 = no retries)")
+    ap.add_argument("--keep-going", action="store_true",
+                    help="playlists: skip entries that keep failing instead of stopping the job")
+    ap.add_argument("--failed-report", metavar="FILE", help="append the entries given up on to FILE (JSON lines)")
+    ap.add_argument("--json", action="store_true", help="print progress as JSON lines")
+    ap.add_argument("--resume", action="store_true", help="also continue jobs left unfinished by an earlier run")
+    ap.add_argument("--metrics-jsonl", metavar="FILE", help="append per-phase metrics events to FILE")
+    ap.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on localhost:PORT/metrics")
+    ap.add_argument("--no-cache", action="store_true", help="do not use the metadata cache")
+    ap.add_argument("--no-archive", action="store_true", help="re-download items already in the archive")
+    ap.add_argument("--store", metavar="DIR",
+                    help="content store that downloads each video once and links it into every folder "
+                         "(default: in the app's cache folder)")
+    ap.add_argument("--no-store", action="store_true", help="do not reuse videos saved to other folders")
+    ap.add_argument("--low-memory", action="store_true",
+                    help="for huge playlists: keep only compact per-entry records (an interrupted job "
+                         "re-reads the playlist when resumed)")
+    ap.add_argument("--merge-workers", type=int,
+                    help="video+audio merges run at once (default: half the CPU cores)")
+    ap.add_argument("--sync", action="store_true",
+                    help="mirror playlists: compare each with its last snapshot, list only up to the known "
+                         "entries and fetch only new or changed ones (implies --playlist)")
+    ap.add_argument("--sync-full", action="store_true",
+                    help="with --sync, always read the whole listing (playlists that grow at the end)")
+    ap.add_argument("--serve", type=int, metavar="PORT",
+                    help="accept and report jobs over HTTP on localhost:PORT until interrupted")
+    ap.add_argument("--serve-host", default="127.0.0.1", help="address for --serve (default: 127.0.0.1)")
+    ap.add_argument("--serve-token", default=os.environ.get("YTDL_CONTROL_TOKEN"),
+                    help="bearer token every API request must carry (default: $YTDL_CONTROL_TOKEN, "
+                         "else a random one printed at start)")
+    return ap
+
+
+class _Printer(object):
+    """Serialises job updates from worker threads onto stdout."""
+
+    def __init__(self, as_json, stream=None):
+        self.as_json = as_json
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def __call__(self, job):
+        p = job.progress or {}
+        if self.as_json:
+            line = json.dumps({
+                "job": job.id,
+                "url": job.url,
+                "state": job.state,
+                "status": p.get("status"),
+                "file_percent": p.get("file_percent"),
+                "overall_percent": p.get("overall_percent"),
+                "idx": p.get("idx"),
+                "total": p.get("total"),
+                "seen": p.get("seen"),
+                "title": p.get("title") or job.title,
+                "result": job.result,
+                "error": job.error,
+                "failed": job.failed,
+                "sync": job.sync,
+            })
+        else:
+            # human output: one line per state change or status/item change
+            key = (job.state, p.get("status"), p.get("idx"))
+            if self._last.get(job.id) == key and job.state not in FINAL_STATES:
+                return
+            self._last[job.id] = key
+            total = p.get("total") or (f"{p['seen']}+" if p.get("seen") else None)
+            where = f" {p.get('idx')}/{total}" if p.get("idx") and total else ""
+            name = job.error or job.result or p.get("title") or job.title or job.url
+            line = f"[{job.id}] {job.state}{where} {p.get('status') or ''} {name}".replace("  ", " ")
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    urls = list(args.urls)
+    if args.batch_file:
+        with open(args.batch_file, encoding="utf-8") as f:
+            urls += parse_urls(f.read())
+    urls = parse_urls("\n".join(urls))
+    if not urls and not args.resume and args.serve is None:
+        print("error: no valid http(s) URLs given", file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.output):
+        print(f"error: output folder does not exist: {args.output}", file=sys.stderr)
+        return 2
+
+    kwargs = {"concurrency": args.concurrency, "bandwidth": BandwidthScheduler(args.limit_rate),
+              "context": DownloaderContext(), "continue_on_error": args.keep_going,
+              "low_memory": args.low_memory}
+    retry = kwargs["retry"] = RetryPolicy(attempts=args.retries, host_concurrency=max(args.concurrency, args.jobs))
+    if not args.no_cache:
+        kwargs["cache"] = MetadataCache(os.path.join(app_data_dir(), "metadata.sqlite"))
+    if not args.no_archive:
+        kwargs["archive"] = DownloadArchive(os.path.join(app_data_dir(), "archive.sqlite"))
+    if not args.no_store:
+        kwargs["store"] = ContentStore(args.store or os.path.join(app_data_dir(), "store"))
+    merger = kwargs["merger"] = MergePool(args.merge_workers)
+    if args.sync or args.sync_full:
+        args.playlist = True
+        kwargs["sync"] = PlaylistSync(os.path.join(app_data_dir(), "sync.sqlite"), full=args.sync_full)
+    formats = kwargs["formats"] = FormatSelector(args.accept_audio.split(","), args.max_height, kwargs.get("cache"))
+
+    if args.metrics_jsonl or args.metrics_port:
+        metrics = kwargs["metrics"] = Metrics()
+        if args.metrics_jsonl:
+            metrics.add_sink(JsonLinesSink(args.metrics_jsonl))
+        if args.metrics_port:
+            metrics.add_sink(PrometheusSink()).serve(args.metrics_port)
+
+    queue = JobQueue(max_jobs=args.jobs, on_update=_Printer(args.json), job_timeout=args.timeout,
+                     journal_dir=os.path.join(app_data_dir(), "journal"), failed_report=args.failed_report, **kwargs)
+    jobs = queue.restore() if args.resume else []
+    jobs += queue.add_many(urls, args.output, args.quality, args.playlist, args.video, segments=args.segments,
+                          rate_limit=args.job_limit_rate)
+    if args.serve is not None:
+        server = ControlServer(queue, args.output, args.quality, args.serve_host, args.serve, args.serve_token)
+        print(f"control API on http://{args.serve_host}:{server.start()}/jobs", file=sys.stderr)
+        if not args.serve_token:
+            print(f"control API token: {server.token}", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.close()
+            queue.stop()
+            return 0
+    try:
+        queue.wait()
+    except KeyboardInterrupt:
+        queue.stop()
+        return 130
+    saved = formats.stats()
+    if saved["decisions"]:
+        print(f"format choices: {saved['copies']} kept as is, {saved['merges_avoided']} without merge, "
+              f"{saved['bytes_saved'] / 2 ** 20:.1f} MiB and ~{saved['cpu_saved_s']:.0f}s CPU saved",
+              file=sys.stderr)
+    for job in jobs:
+        s = job.sync
+        if s:
+            how = "stopped at known entries" if s["stopped_early"] else "read in full"
+            print(f"[{job.id}] sync: {len(s['added'])} added, {len(s['removed'])} removed, {len(s['moved'])} moved, "
+                  f"{len(s['changed'])} changed; listed {s['listed']} of {s['total']} ({how}), "
+                  f"{s['pending']} not downloaded", file=sys.stderr)
+    failed = [(j, f) for j in jobs for f in j.failed]
+    for job, f in failed:
+        print(f"[{job.id}] failed {f['idx']}: {f['title'] or f['url']} after {f['attempts']} tries: {f['error']}",
+              file=sys.stderr)
+    store = kwargs.get("store")
+    if store:
+        s = store.stats()
+        if s["reuses"]:
+            print(f"content store: {s['reuses']} reused ({s['hardlink']} hardlinks, {s['reflink']} reflinks, "
+                  f"{s['copy']} copies), {s['bytes_saved'] / 2 ** 20:.1f} MiB and ~{s['cpu_saved_s']:.0f}s FFmpeg "
+                  f"saved so far", file=sys.stderr)
+    m = merger.stats()
+    if m["merges"]:
+        print(f"merges: {m['copies']} stream copies, {m['transcodes']} re-encoded, "
+              f"{m['seconds']:.0f}s in ffmpeg ({m['workers']} at a time)", file=sys.stderr)
+    if retry.retries:
+        print(f"retries: {retry.retries}", file=sys.stderr)
+    return 0 if all(j.state == DONE for j in jobs) and not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Many clients watching jobs over the control API: SSE push vs polling.
+
+    python benchmarks/bench_control.py [--jobs N] [--watchers N] [--poll MS] [--size BYTES] [--rate BYTES/S]
+
+Runs a JobQueue with a ControlServer against the local fake media server,
+submits N videos over POST /jobs and attaches W clients spread over them.
+"sse" clients hold one /jobs/<id>/events stream each; "poll" clients
+GET /jobs/<id> every --poll ms until the job ends. Prints one JSON line per
+mode: updates clients received, HTTP requests made, how late clients saw
+each job end (median / max), wall time and this process's CPU seconds.
+"""
+from __future__ import unicode_literals
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from JobQueue import JobQueue, FINAL_STATES
+from ControlServer import ControlServer
+from fake_server import FakeMediaServer
+
+
+def _lag(ended, job_id):
+    # how long after the job ended a client noticed
+    now = time.monotonic()
+    return max(0.0, now - ended.get(job_id, now))
+
+
+TOKEN = "bench"
+
+
+def _head(method, path, port, length=None):
+    extra = f"Content-Length: {length}\r\n" if length is not None else ""
+    return (f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAuthorization: Bearer {TOKEN}\r\n"
+            f"{extra}\r\n").encode("ascii")
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(_head(method, path, port, len(data)) + data)
+    raw = await reader.read()
+    writer.close()
+    return json.loads(raw.split(b"\r\n\r\n", 1)[1])
+
+
+async def sse_client(port, job_id, ended):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(_head("GET", f"/jobs/{job_id}/events", port))
+    updates, lag = 0, None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"data: "):
+            updates += 1
+            if json.loads(line[6:])["state"] in FINAL_STATES:
+                lag = _lag(ended, job_id)
+    writer.close()
+    return updates, 1, lag or 0.0
+
+
+async def poll_client(port, job_id, ended, interval):
+    updates = requests = 0
+    last = None
+    while True:
+        job = await _request(port, "GET", f"/jobs/{job_id}")
+        requests += 1
+        if job != last:
+            updates, last = updates + 1, job
+        if job["state"] in FINAL_STATES:
+            return updates, requests, _lag(ended, job_id)
+        await asyncio.sleep(interval)
+
+
+def run(mode, srv, args, out):
+    ended = {}
+    queue = JobQueue(max_jobs=4, on_update=lambda j: j.state in FINAL_STATES and ended.setdefault(j.id, time.monotonic()))
+    server = ControlServer(queue, out, "Worst", port=0, token=TOKEN)
+    port = server.start()
+
+    async def main():
+        created = await _request(port, "POST", "/jobs", {"urls": [srv.video_url(i) for i in range(1, args.jobs + 1)],
+                                                         "video": True})
+        ids = [j["id"] for j in created["jobs"]]
+        clients = [sse_client(port, ids[i % len(ids)], ended) if mode == "sse"
+                   else poll_client(port, ids[i % len(ids)], ended, args.poll / 1000.0)
+                   for i in range(args.watchers)]
+        return await asyncio.gather(*clients)
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    results = asyncio.run(main())
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    server.close()
+    queue.stop()
+    lag = [r[2] for r in results]
+    return {"mode": mode, "jobs": args.jobs, "watchers": args.watchers,
+            "updates": sum(r[0] for r in results), "requests": sum(r[1] for r in results),
+            "end_lag_median_ms": round(statistics.median(lag) * 1000, 1), "end_lag_max_ms": round(max(lag) * 1000, 1),
+            "wall_s": round(wall, 3), "cpu_s": round(cpu, 3)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--jobs", type=int, default=8)
+    ap.add_argument("--watchers", type=int, default=400)
+    ap.add_argument("--poll", type=float, default=250.0, help="poll interval in ms")
+    ap.add_argument("--size", type=int, default=2 * 1024 * 1024)
+    ap.add_argument("--rate", type=int, default=1024 * 1024, help="per-connection server rate, bytes/s")
+    args = ap.parse_args(argv)
+
+    results = []
+    with FakeMediaServer(args.jobs, args.size, rate=args.rate) as srv:
+        for mode in ("poll", "sse"):
+            with tempfile.TemporaryDirectory() as out:
+                results.append(run(mode, srv, args, out))
+            print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time-to-first-byte: three metadata passes (old flow) vs one shared pass.
+
+    python benchmarks/bench_extraction.py URL [URL ...] [--playlist] [--video]
+
+The old flow is replayed as it used to run on a click: flat title probe,
+full non-flat prefetch of every entry, then extract_info(download=True).
+Each run stops as soon as the first media byte is reported.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp as ydl  # type: ignore
+from yt_dlp.utils import DownloadCancelled  # type: ignore
+
+from DownloadMethods import Download
+
+
+class _FirstByte(DownloadCancelled):
+    msg = "first byte reached"
+
+
+def _stop_on_first_byte(d):
+    if d.get("status") == "downloading" and d.get("downloaded_bytes"):
+        raise _FirstByte()
+
+
+def legacy_ttfb(url, save_path, playlist, video):
+    t0 = time.perf_counter()
+    ydl.YoutubeDL({"quiet": True, "noplaylist": not playlist,
+                   "extract_flat": True, "skip_download": True}).extract_info(url, download=False)
+    dl = Download(url, save_path, "Worst", playlist, video)
+    opts = dict(dl.common_opts)
+    opts.pop("logger", None)
+    opts["quiet"] = True
+    ydl.YoutubeDL(opts).extract_info(url, download=False)
+    opts["progress_hooks"] = [_stop_on_first_byte]
+    try:
+        ydl.YoutubeDL(opts).extract_info(url, download=True)
+    except _FirstByte:
+        pass
+    return time.perf_counter() - t0
+
+
+def shared_ttfb(url, save_path, playlist, video):
+    t0 = time.perf_counter()
+    dl = Download(url, save_path, "Worst", playlist, video)
+    dl.first_title()
+    opts = dict(dl.common_opts)
+    opts.pop("logger", None)
+    opts["quiet"] = True
+    opts["progress_hooks"] = [_stop_on_first_byte]
+    try:
+        dl._run(opts)
+    except _FirstByte:
+        pass
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("urls", nargs="+")
+    ap.add_argument("--playlist", action="store_true")
+    ap.add_argument("--video", action="store_true")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for url in args.urls:
+            for name, fn in (("legacy", legacy_ttfb), ("shared", shared_ttfb)):
+                times = [fn(url, tmp, args.playlist, args.video) for _ in range(args.repeat)]
+                results.append({"url": url, "flow": name, "ttfb_s": min(times), "runs": times})
+                print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
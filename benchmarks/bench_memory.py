@@ -0,0 +1,110 @@
+"""Peak memory of a playlist download as the playlist grows, normal vs low-memory mode.
+
+    python benchmarks/bench_memory.py [--sizes 20,100,1000] [--concurrency N] [--tolerance F] [--max-per-entry BYTES]
+
+Downloads an N-entry playlist of tiny clips from the local fake media server
+under tracemalloc, with progress, metrics, format selection and a job
+journal switched on the way the app runs them. The baseline is taken after
+the playlist has been resolved (yt-dlp's generic RSS extractor reads a whole
+feed at once; paged extractors such as YouTube's don't), so "peak" is what
+the download loop itself adds on top. "retained" is what is still allocated
+after the run, counted from before the playlist was resolved and once
+garbage has been collected; its growth per entry between
+the smallest and the largest size is what a long playlist costs for good.
+Prints one JSON line per run and exits non-zero if, in low-memory mode, the
+peak at the largest size exceeds the one at the smallest by more than
+``tolerance`` (default 50%) or retained memory grows by more than
+``max_per_entry`` bytes per entry (default 512).
+"""
+from __future__ import unicode_literals
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DownloadMethods import Download
+from FormatSelector import FormatSelector
+from JobJournal import JobJournal
+from Metrics import Metrics, CallbackSink
+from fake_server import FakeMediaServer
+
+
+def measure(srv, n, low_memory, concurrency):
+    metrics = Metrics([CallbackSink(lambda e: None)])
+    with tempfile.TemporaryDirectory() as out:
+        url = srv.playlist_url(n)
+        # the journal JobQueue gives every job
+        journal = JobJournal.open(os.path.join(out, "journal"), {"url": url, "save_path": out, "quality": "Worst",
+                                                                 "playlist": True, "video": True})
+        dl = Download(url, out, "Worst", playlist=True, download_type=True,
+                      concurrency=concurrency, progress_cb=lambda p: None, metrics=metrics,
+                      formats=FormatSelector(), low_memory=low_memory, journal=journal)
+        t0 = time.perf_counter()
+        # from empty process-wide caches, so what earlier runs left in them counts for none of this one
+        Download._sweep()
+        start = tracemalloc.get_traced_memory()[0]
+        dl.first_title()    # resolve the playlist; the download loop's peak is measured from here
+        gc.collect()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        dl.mp4_download()
+        wall = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        current = tracemalloc.get_traced_memory()[0]
+    return {"entries": n, "low_memory": low_memory, "peak_kib": round((peak - base) / 1024, 1),
+            "retained_kib": round((current - start) / 1024, 1), "wall_s": round(wall, 2)}
+
+
+def per_entry(small, large):
+    """Bytes retained per extra entry between two runs of the same mode."""
+    return (large["retained_kib"] - small["retained_kib"]) * 1024 / max(1, large["entries"] - small["entries"])
+
+
+def peak_growth(small, large):
+    """How much higher the download loop's peak is in the larger run, as a fraction of the smaller one's."""
+    return large["peak_kib"] / max(1.0, small["peak_kib"]) - 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="20,100,1000", help="comma-separated playlist lengths")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--size", type=int, default=4096, help="bytes per clip")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="low-memory peak growth allowed, smallest to largest")
+    ap.add_argument("--max-per-entry", type=int, default=512, help="bytes a low-memory run may retain per entry")
+    args = ap.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    tracemalloc.start()
+    results = []
+    with FakeMediaServer(max(sizes), args.size) as srv:
+        measure(srv, 5, True, args.concurrency)     # warm-up: imports, extractor set-up
+        for low_memory in (False, True):
+            for n in sizes:
+                results.append(measure(srv, n, low_memory, args.concurrency))
+                print(json.dumps(results[-1]), flush=True)
+    tracemalloc.stop()
+
+    normal = [r for r in results if not r["low_memory"]]
+    low = [r for r in results if r["low_memory"]]
+    summary = {"retained_b_per_entry": round(per_entry(normal[0], normal[-1]), 1),
+               "low_memory_retained_b_per_entry": round(per_entry(low[0], low[-1]), 1),
+               "max_per_entry": args.max_per_entry,
+               "low_memory_peak_growth": round(peak_growth(low[0], low[-1]), 3),
+               "tolerance": args.tolerance}
+    print(json.dumps(summary), flush=True)
+    ok = (summary["low_memory_retained_b_per_entry"] <= args.max_per_entry
+          and summary["low_memory_peak_growth"] <= args.tolerance)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
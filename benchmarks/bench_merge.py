@@ -0,0 +1,114 @@
+"""Video+audio merges: one at a time with ffmpeg defaults vs the MergePool.
+
+    python benchmarks/bench_merge.py [--items N] [--seconds S] [--workers N,N,...]
+
+Renders N synthetic stream pairs with ffmpeg's lavfi sources: "copyable"
+pairs (H.264 video-only mp4 + AAC audio-only m4a) and "transcode" pairs
+(MPEG-2 video + PCM audio in mkv, which mp4 can't take as they are). The
+baseline merges them one after another the way yt-dlp's merger does:
+``-c copy`` when that works, otherwise a default re-encode of every stream.
+The pool runs the same merges with per-stream copy/encode decisions from
+ffprobe and tuned thread counts. Prints one JSON line per run with wall
+time and the CPU seconds ffmpeg used.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:     # Windows: CPU time is not reported
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AppPaths import ffmpeg_exe, ffprobe_exe
+from MergePool import MergePool
+
+PAIRS = {
+    "copyable": (("-c:v", "libx264", "-preset", "ultrafast", "-an"), "mp4", ("-c:a", "aac", "-vn"), "m4a"),
+    "transcode": (("-c:v", "mpeg2video", "-an"), "mkv", ("-c:a", "pcm_s16le", "-vn"), "mkv"),
+}
+
+
+def _ffmpeg(*args):
+    subprocess.run([ffmpeg_exe() or "ffmpeg", "-y", "-nostdin", "-loglevel", "error"] + list(args), check=True)
+
+
+def make_pairs(folder, kind, items, seconds):
+    vargs, vext, aargs, aext = PAIRS[kind]
+    pairs = []
+    for i in range(items):
+        v = os.path.join(folder, f"{kind}{i}.fv.{vext}")
+        a = os.path.join(folder, f"{kind}{i}.fa.{aext}")
+        _ffmpeg("-f", "lavfi", "-i", f"testsrc2=duration={seconds}:size=1280x720:rate=30", *vargs, v)
+        _ffmpeg("-f", "lavfi", "-i", f"sine=frequency={220 + i}:duration={seconds}", *aargs, a)
+        pairs.append((v, a))
+    return pairs
+
+
+def _child_cpu():
+    if resource is None:
+        return None
+    r = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return r.ru_utime + r.ru_stime
+
+
+def baseline(pairs, out):
+    for i, (v, a) in enumerate(pairs):
+        target = os.path.join(out, f"serial{i}.mp4")
+        try:
+            _ffmpeg("-i", v, "-i", a, "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", target)
+        except subprocess.CalledProcessError:
+            _ffmpeg("-i", v, "-i", a, "-map", "0:v:0", "-map", "1:a:0", "-c:v", "libx264", "-c:a", "aac", target)
+
+
+def pooled(pairs, out, workers):
+    pool = MergePool(workers=workers)
+    try:
+        futures = [pool.submit(pair, os.path.join(out, f"pool{workers}-{i}.mp4")) for i, pair in enumerate(pairs)]
+        methods = [f.result()["method"] for f in futures]
+    finally:
+        pool.close()
+    return {"copy": methods.count("copy"), "transcode": methods.count("transcode"), "threads": pool.threads}
+
+
+def timed(fn, *args):
+    cpu0, t0 = _child_cpu(), time.perf_counter()
+    extra = fn(*args) or {}
+    wall = time.perf_counter() - t0
+    cpu = _child_cpu()
+    return dict(extra, wall_s=round(wall, 3), ffmpeg_cpu_s=round(cpu - cpu0, 3) if cpu is not None else None)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=6, help="stream pairs per kind")
+    ap.add_argument("--seconds", type=float, default=10.0, help="length of each synthetic clip")
+    ap.add_argument("--workers", default=f"1,{max(1, (os.cpu_count() or 2) // 2)}",
+                    help="MergePool sizes to try, comma-separated")
+    args = ap.parse_args(argv)
+    if not (ffmpeg_exe() and ffprobe_exe()):
+        print("ffmpeg and ffprobe are needed (tools/ffmpeg or PATH)", file=sys.stderr)
+        return 2
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in PAIRS:
+            pairs = make_pairs(tmp, kind, args.items, args.seconds)
+            runs = [("serial-default", baseline, ())]
+            runs += [(f"pool-{w}", pooled, (int(w),)) for w in args.workers.split(",") if w.strip()]
+            for name, fn, extra in runs:
+                out = tempfile.mkdtemp(dir=tmp)
+                results.append(dict(timed(fn, pairs, out, *extra), kind=kind, run=name, items=len(pairs)))
+                print(json.dumps(results[-1]), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Progress-path microbenchmark: events per second and GUI-side CPU time.
+
+    python benchmarks/bench_progress.py [--ticks N] [--tick-us US]
+
+Replays a synthetic download through Download._emit the way yt-dlp does on a
+fast link: every byte-counter tick arrives through report_progress, the
+progress hook and the logger. "before" is the raw path (progress_rate=0) with the old
+forced repaint + processEvents in the GUI slot; "after" is the throttled path
+with the plain slot. The slot runs against a real MainWindow on Qt's
+offscreen platform when PyQt5 is available, otherwise against a stand-in
+that formats the same label text.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from DownloadMethods import Download
+
+
+def _gui_handlers():
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import QEventLoop
+        import YoutubeDownloader
+    except ImportError:
+        def plain(payload):
+            idx, total = payload.get("idx"), payload.get("total")
+            prefix = f"Downloading {idx}/{total}" if (idx and total) else "Downloading"
+            return f"{prefix} — {payload.get('title')} ({payload.get('file_percent')}%)"
+        return "stand-in", plain, plain, None
+
+    app = QApplication.instance() or QApplication([])
+    w = YoutubeDownloader.MainWindow()
+    w.progress_bar.show()
+
+    def legacy(payload):
+        w._on_progress_gui(payload)
+        w.progress_bar.repaint()
+        QApplication.processEvents(QEventLoop.AllEvents, 5)
+
+    return "qt-offscreen", legacy, w._on_progress_gui, (app, w)
+
+
+def run(handler, rate, ticks, tick_us, total_bytes=50 * 1024 * 1024):
+    cpu = [0.0]
+    delivered = [0]
+
+    def timed(payload):
+        delivered[0] += 1
+        t0 = time.thread_time()
+        handler(payload)
+        cpu[0] += time.thread_time() - t0
+
+    dl = Download("http://bench.local/v", ".", "Best", progress_cb=timed, progress_rate=rate)
+    info = {"title": "synthetic clip"}
+    t0 = time.perf_counter()
+    dl._emit(status="starting", file_percent=0, info=info)
+    for i in range(1, ticks + 1):
+        fp = int(i * total_bytes / ticks * 100 / total_bytes)
+        for _ in range(3):  # report_progress, progress hook, logger
+            dl._emit(status="downloading", file_percent=fp, info=info)
+        if tick_us:
+            end = time.perf_counter() + tick_us / 1e6
+            while time.perf_counter() < end:
+                pass
+    dl._emit(status="finished", file_percent=100, info=info)
+    if rate:
+        dl._sink.flush()
+    wall = time.perf_counter() - t0
+    return {
+        "rate_hz": rate,
+        "emitted": 3 * ticks + 2,
+        "delivered": delivered[0],
+        "delivered_per_s": delivered[0] / wall,
+        "gui_cpu_s": cpu[0],
+        "wall_s": wall,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--ticks", type=int, default=20000)
+    ap.add_argument("--tick-us", type=int, default=100, help="simulated time between yt-dlp ticks")
+    ap.add_argument("--rate", type=int, default=15)
+    args = ap.parse_args(argv)
+
+    kind, legacy, plain, keep = _gui_handlers()
+    results = [
+        dict(run(legacy, 0, args.ticks, args.tick_us), case="before", gui=kind),
+        dict(run(plain, args.rate, args.ticks, args.tick_us), case="after", gui=kind),
+    ]
+    for r in results:
+        print(json.dumps(r), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
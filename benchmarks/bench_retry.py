@@ -0,0 +1,112 @@
+"""Retries, backoff and circuit breaking against a server that injects faults.
+
+    python benchmarks/bench_retry.py [--items N] [--fault-rate P] [--concurrency N] [--size BYTES]
+
+Downloads one playlist from the local fake media server in three set-ups,
+all with continue-on-error so a failed entry doesn't end the run:
+  - "transient": a share of page and media requests answer 503;
+  - "throttled": the same share answers 429 with Retry-After: 1;
+  - "broken":    two clips always fail, everything else is clean.
+Each runs with no retry policy and with one. Prints one JSON line per run
+(entries ok/failed, retries, faults served, requests, breaker trips, wall
+time) and exits non-zero if a retried run lost a transient entry, a run
+got through "broken" without reporting both bad clips, or the retried
+"broken" run let the bad clips' own retries trip the host's breaker: it
+may open at most once per bad clip and must finish within the retries'
+backoff (plus those cooldowns) of the unretried run.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DownloadMethods import Download
+from RetryPolicy import RetryPolicy
+from fake_server import FakeMediaServer
+
+BROKEN = (2, 3)
+COOLDOWN = 0.5
+
+SCENARIOS = {
+    "transient": lambda rate: {"fault_rate": rate, "fault_status": 503},
+    "throttled": lambda rate: {"fault_rate": rate, "fault_status": 429, "retry_after": 1},
+    "broken": lambda rate: {"fault_items": BROKEN, "fault_status": 500},
+}
+
+
+def run(args, scenario, retry):
+    faults = SCENARIOS[scenario](args.fault_rate)
+    policy = RetryPolicy(attempts=args.attempts, base_delay=0.05, max_delay=2.0,
+                         host_concurrency=args.concurrency, cooldown=COOLDOWN) if retry else None
+    with FakeMediaServer(args.items, args.size, seed=args.seed, **faults) as srv, \
+            tempfile.TemporaryDirectory() as out:
+        dl = Download(srv.playlist_url(), out, "Worst", playlist=True, download_type=True,
+                      concurrency=args.concurrency, retry=policy, continue_on_error=True)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            dl.mp4_download()
+        except Exception as e:      # the playlist itself could not be read
+            error = str(e)
+        wall = time.perf_counter() - t0
+        stats = policy.stats() if policy else {"retries": 0, "hosts": []}
+        return {
+            "scenario": scenario,
+            "retry": retry,
+            "ok": args.items - len(dl.failed) if error is None else 0,
+            "failed": sorted(f["idx"] for f in dl.failed),
+            "error": error,
+            "retries": stats["retries"],
+            "breaker_trips": sum(h["opened"] for h in stats["hosts"]),
+            "faults_served": srv.faults,
+            "requests": srv.requests,
+            "wall_s": wall,
+        }
+
+
+def backoff_budget(attempts, base_delay=0.05, max_delay=2.0):
+    """Longest total wait one item's retries can add."""
+    return sum(min(max_delay, base_delay * 2 ** n) for n in range(1, attempts))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=12)
+    ap.add_argument("--fault-rate", type=float, default=0.25)
+    ap.add_argument("--attempts", type=int, default=6)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--size", type=int, default=128 * 1024)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    results, bad = [], []
+    for scenario in SCENARIOS:
+        for retry in (False, True):
+            result = run(args, scenario, retry)
+            results.append(result)
+            print(json.dumps(result), flush=True)
+            if retry and scenario != "broken" and (result["failed"] or result["error"]):
+                bad.append(f"{scenario}: retried run still lost {result['failed'] or result['error']}")
+            if scenario == "broken" and result["failed"] != list(BROKEN):
+                bad.append(f"broken: expected entries {list(BROKEN)} reported failed, got {result['failed']}")
+            if scenario == "broken" and retry:
+                trips = len(BROKEN)
+                limit = (results[-2]["wall_s"] + backoff_budget(args.attempts)
+                         + COOLDOWN * (2 ** trips - 1) + 5.0)
+                if result["breaker_trips"] > trips:
+                    bad.append(f"broken: the bad clips' retries tripped the breaker {result['breaker_trips']} times")
+                if result["wall_s"] > limit:
+                    bad.append(f"broken: took {result['wall_s']:.1f}s with retries, expected under {limit:.1f}s")
+    for line in bad:
+        print("FAIL " + line, file=sys.stderr)
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
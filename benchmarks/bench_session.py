@@ -0,0 +1,79 @@
+"""Per-job setup cost: a fresh YoutubeDL per call vs a shared DownloaderContext.
+
+    python benchmarks/bench_session.py [--jobs N] [--items N] [--size BYTES] [--latency MS]
+
+Runs the same batch twice against the local fake media server: N single
+videos plus one N-item playlist. "per-call" is Download as it was (new
+YoutubeDL instances, new connections each time); "shared" hands every
+Download one DownloaderContext. Reports time to first byte per job, wall
+time, TCP connections opened and YoutubeDL instances created. Exits
+non-zero if the shared context does not open fewer connections than the
+per-call run (pooling needs the requests package; yt-dlp's urllib
+fallback opens one per request).
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DownloadMethods import Download
+from DownloaderContext import DownloaderContext
+from Metrics import Metrics, CallbackSink
+from fake_server import FakeMediaServer
+
+
+def run_batch(srv, jobs, context):
+    events = []
+    metrics = Metrics([CallbackSink(events.append, types=("first_byte",))])
+    conns = srv.connections
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as out:
+        for i in range(1, jobs + 1):
+            Download(srv.video_url(i), out, "Worst", download_type=True, metrics=metrics,
+                     context=context).mp4_download()
+        Download(srv.playlist_url(), out, "Worst", playlist=True, download_type=True, concurrency=2,
+                 metrics=metrics, context=context).mp4_download()
+    wall = time.perf_counter() - t0
+    ttfb = [e["seconds"] for e in events]
+    return {
+        "wall_s": wall,
+        "ttfb_median_s": statistics.median(ttfb) if ttfb else None,
+        "ttfb_max_s": max(ttfb) if ttfb else None,
+        "connections": srv.connections - conns,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--jobs", type=int, default=10, help="single-video jobs per batch")
+    ap.add_argument("--items", type=int, default=10, help="playlist length")
+    ap.add_argument("--size", type=int, default=512 * 1024)
+    ap.add_argument("--latency", type=float, default=20.0, help="ms added to every server response")
+    args = ap.parse_args(argv)
+
+    results = []
+    with FakeMediaServer(args.items, args.size, latency=args.latency / 1000.0) as srv:
+        for name in ("per-call", "shared"):
+            context = DownloaderContext() if name == "shared" else None
+            result = dict(run_batch(srv, args.jobs, context), case=name)
+            if context:
+                result["context"] = context.stats()
+                context.close()
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    per_call, shared = results
+    if shared["connections"] >= per_call["connections"]:
+        print("shared context did not pool connections (is requests installed?)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
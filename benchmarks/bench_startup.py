@@ -0,0 +1,117 @@
+"""Cold-start time of the headless CLI vs the Qt GUI.
+
+    python benchmarks/bench_startup.py [--repeat N] [--profile] [--top N]
+
+Each sample is a fresh interpreter. The CLI sample imports the CLI module and
+parses a command line; the GUI sample imports the GUI module and builds
+the main window on the offscreen Qt platform. "gui" is the shipped startup
+(Graphics.ui compiled the way YoutubeDownloader.spec does it, yt_dlp left for
+the background preload); "gui_eager" is the old one (engine imported up
+front, .ui parsed with uic.loadUi). Prints one JSON line per target; with
+--profile each line also carries a ``python -X importtime`` breakdown.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WINDOW = ("from PyQt5.QtWidgets import QApplication; app = QApplication([]); "
+           "import YoutubeDownloader as m; w = m.MainWindow(); ")
+
+TARGETS = {
+    "cli": "import YoutubeDownloaderCLI as m; m.build_parser().parse_args(['http://x'])",
+    "gui": _WINDOW + "assert 'yt_dlp' not in sys.modules; w.queue.stop()",
+    "gui_eager": ("import DownloadMethods; from PyQt5 import uic; " + _WINDOW.replace(
+        "w = m.MainWindow(); ",
+        "m._setup_ui = lambda w: uic.loadUi(m.res_path('Graphics.ui'), w); w = m.MainWindow(); ")
+        + "w.queue.stop()"),
+    "cli_qt_free": "import sys, YoutubeDownloaderCLI; assert 'PyQt5' not in sys.modules",
+}
+# modules whose cumulative import time is reported on their own with --profile
+WATCH = ("yt_dlp", "DownloadMethods", "PyQt5.uic", "PyQt5.QtWidgets")
+
+
+def compile_ui(out_dir):
+    """Write Graphics_ui.py into ``out_dir`` like the PyInstaller spec does; False without PyQt5."""
+    try:
+        from PyQt5 import uic
+    except ImportError:
+        return False
+    with open(os.path.join(ROOT, "Graphics.ui"), encoding="utf-8") as src, \
+            open(os.path.join(out_dir, "Graphics_ui.py"), "w", encoding="utf-8") as out:
+        uic.compileUi(src, out)
+    return True
+
+
+def _env(ui_dir):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    if ui_dir:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ui_dir, env.get("PYTHONPATH")]))
+    return env
+
+
+def sample(code, ui_dir=None):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import sys; " + code], cwd=ROOT, env=_env(ui_dir), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def import_profile(code, ui_dir=None, top=10):
+    """Run once under ``-X importtime``; total and per-module cumulative import time in ms."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import sys; " + code], cwd=ROOT,
+                          env=_env(ui_dir), check=True, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    roots, cumulative = [], {}
+    for line in proc.stderr.splitlines():
+        fields = line[len("import time:"):].split("|") if line.startswith("import time:") else ()
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue    # not an importtime line, or the header
+        ms = int(fields[1]) / 1000.0
+        name = fields[2].strip()
+        cumulative[name] = ms
+        if len(fields[2]) - len(fields[2].lstrip()) == 1:     # nesting adds two spaces per level
+            roots.append((name, ms))
+    roots.sort(key=lambda r: r[1], reverse=True)
+    return {
+        "imports_ms": round(sum(ms for _, ms in roots), 1),
+        "modules": len(cumulative),
+        "watch_ms": {name: round(cumulative[name], 1) for name in WATCH if name in cumulative},
+        "top_ms": [[name, round(ms, 1)] for name, ms in roots[:top]],
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--profile", action="store_true", help="add a -X importtime breakdown per target")
+    ap.add_argument("--top", type=int, default=10, help="slowest top-level imports listed with --profile")
+    args = ap.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ui_dir = tmp if compile_ui(tmp) else None
+        for name, code in TARGETS.items():
+            target_ui = ui_dir if name == "gui" else None
+            try:
+                times = [sample(code, target_ui) for _ in range(args.repeat)]
+                result = {"target": name, "best_s": min(times), "runs": times}
+                if name == "gui":
+                    result["compiled_ui"] = bool(target_ui)
+                if args.profile:
+                    result["profile"] = import_profile(code, target_ui, args.top)
+                results.append(result)
+            except subprocess.CalledProcessError as e:
+                results.append({"target": name, "error": f"exit {e.returncode}"})
+            print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Re-listing a mirrored playlist: full flat extraction vs PlaylistSync's early stop.
+
+    python benchmarks/bench_sync.py [--items N] [--page-size N] [--latency MS] [--download-items N]
+
+The fake media server lists a playlist a page at a time (/playlist.json),
+each page costing --latency like a real continuation request. After a
+first sync has stored the snapshot, the playlist is changed between runs:
+unchanged, new clips at the top, clips removed from the middle, one clip
+moved up, one clip appended at the end. Each state is listed in full (what
+every run costs without sync) and through PlaylistSync.plan. Prints one
+JSON line per state: pages and seconds for both, and the added / removed /
+moved counts the sync reported.
+
+Then the same states run end to end through Download(sync=...) on a
+--download-items playlist (yt-dlp lists it through the plugin extractor in
+benchmarks/yt_dlp_plugins; 0 skips this part). Each of those lines has the
+pages the whole run requested, next to what PlaylistSync.plan alone needs
+for that state, and the clips it fetched.
+
+Exits non-zero if a report disagrees with the actual change, the planned
+listing differs from the real playlist, a download run requests more
+pages than the plan or fetches other than the new clips.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PlaylistSync import PlaylistSync
+from fake_server import FakeMediaServer
+
+
+def listing(srv, size):
+    """(head, lazy entries) like a flat extract_info: the first page is read up front, the rest on demand."""
+    def page(p):
+        with urllib.request.urlopen(f"{srv.base_url}/playlist.json?page={p}&size={size}") as r:
+            return json.loads(r.read())
+
+    first = page(0)
+
+    def entries():
+        data, p = first, 0
+        while data["entries"]:
+            yield from data["entries"]
+            p += 1
+            data = page(p)
+
+    return {k: v for k, v in first.items() if k != "entries"}, entries()
+
+
+def changes(items):
+    mid = items // 2
+    return [
+        ("unchanged", lambda ids: ids),
+        ("prepend-3", lambda ids: [items + 1, items + 2, items + 3] + ids),
+        ("remove-2", lambda ids: [i for i in ids if i not in (mid, mid + 1)]),
+        ("move-1", lambda ids: [ids[-10]] + [i for i in ids if i != ids[-10]]),
+        ("append-1", lambda ids: ids + [items + 4]),
+    ]
+
+
+def timed(srv, fn):
+    pages, t0 = srv.pages, time.perf_counter()
+    result = fn()
+    return result, srv.pages - pages, time.perf_counter() - t0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--latency", type=float, default=300.0, help="ms per page request")
+    ap.add_argument("--download-items", type=int, default=100, help="playlist size of the end-to-end runs")
+    args = ap.parse_args(argv)
+
+    bad = 0
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeMediaServer(args.items, latency=args.latency / 1000.0) as srv:
+        sync = PlaylistSync(os.path.join(tmp, "sync.sqlite"))
+        key = sync.key(srv.playlist_url(), tmp, "bench")
+        srv.playlist = list(range(1, args.items + 1))
+        sync.commit(sync.plan(key, *listing(srv, args.page_size)).read())
+        for name, change in changes(args.items):
+            before = [f"clip-{i}" for i in srv.playlist]
+            srv.playlist = change(list(srv.playlist))
+            after = [f"clip-{i}" for i in srv.playlist]
+            full, full_pages, full_s = timed(srv, lambda: list(listing(srv, args.page_size)[1]))
+            plan, sync_pages, sync_s = timed(srv, lambda: sync.plan(key, *listing(srv, args.page_size)).read())
+            sync.commit(plan)
+            ok = ([e["id"] for e in plan.entries] == after
+                  and set(plan.added) == set(after) - set(before)
+                  and set(plan.removed) == set(before) - set(after)
+                  and bool(plan.moved) == (name == "move-1"))
+            bad += not ok
+            print(json.dumps({"state": name, "items": len(after), "full_pages": full_pages,
+                              "full_s": round(full_s, 3), "sync_pages": sync_pages, "sync_s": round(sync_s, 3),
+                              "listed": plan.listed, "stopped_early": plan.early, "added": len(plan.added),
+                              "removed": len(plan.removed), "moved": len(plan.moved), "ok": ok}), flush=True)
+        sync.close()
+        if args.download_items:
+            bad += end_to_end(args, tmp)
+    return 1 if bad else 0
+
+
+def end_to_end(args, tmp):
+    """Every state through Download(sync=...); returns the number of states that went wrong."""
+    from DownloadMethods import Download
+
+    bad, out = 0, os.path.join(tmp, "out")
+    os.makedirs(out)
+    with FakeMediaServer(args.download_items, 2048, latency=args.latency / 1000.0) as srv:
+        ref = PlaylistSync(os.path.join(tmp, "ref.sqlite"))
+        sync = PlaylistSync(os.path.join(tmp, "download.sqlite"))
+        key = ref.key(srv.paged_url(args.page_size), tmp, "bench")
+        srv.playlist = list(range(1, args.download_items + 1))
+        before = []
+        for name, change in [("first", lambda ids: ids)] + changes(args.download_items):
+            srv.playlist = change(list(srv.playlist))
+            after = [f"clip-{i}" for i in srv.playlist]
+            plan, plan_pages, _ = timed(srv, lambda: ref.plan(key, *listing(srv, args.page_size)).read())
+            ref.commit(plan)
+            files = len(os.listdir(out))
+            dl = Download(srv.paged_url(args.page_size), out, "Worst", playlist=True, download_type=True,
+                          concurrency=8, sync=sync)
+            _, pages, seconds = timed(srv, dl.mp4_download)
+            fetched = len(os.listdir(out)) - files
+            new = len(set(after) - set(before))
+            ok = pages <= plan_pages and fetched == new and len(dl.sync_report["added"]) == new
+            bad += not ok
+            print(json.dumps({"state": name, "download": True, "items": len(after), "pages": pages,
+                              "plan_pages": plan_pages, "seconds": round(seconds, 3), "fetched": fetched,
+                              "stopped_early": dl.sync_report["stopped_early"], "ok": ok}), flush=True)
+            before = after
+        ref.close()
+        sync.close()
+    return bad
+
+
+if __name__ == "__main__":
+    sys.exit(main())
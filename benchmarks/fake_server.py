@@ -0,0 +1,306 @@
+"""Local HTTP server with synthetic media that yt-dlp's generic extractor understands.
+
+    python benchmarks/fake_server.py [--items N] [--size BYTES] [--rate BPS] [--latency MS]
+
+Routes:
+    /media/<i>.mp4      media bytes; HEAD, Range and 206 supported
+    /watch/<i>.html     page with an HTML5 <video> pointing at /media/<i>.mp4
+    /playlist.rss       RSS feed linking every watch page (?n= overrides the item count)
+    /playlist.json      the same list a page at a time (?page=P&size=S), like a paged extractor;
+                        yt-dlp lists paged_url() through benchmarks/yt_dlp_plugins
+
+Media is a deterministic byte pattern unless ``sample`` names a real file
+(e.g. one made by ``make_sample``), which FFmpeg post-processing needs.
+``rate`` caps every connection in bytes/s and ``latency`` delays every
+response, so runs are reproducible without touching the network. Setting
+``playlist`` to a list of clip numbers changes which clips the playlists
+list, and in what order.
+
+With ``ranges=False`` Range headers are ignored (200 and the whole file).
+
+Fault injection (for retry tests): each watch page and media request fails
+with ``fault_status`` (429 sends ``Retry-After: retry_after``) with
+probability ``fault_rate``, and the first ``fault_first`` requests of every
+path always fail. ``fault_items`` lists clips that always fail. Draws come
+from a seeded RNG, so a run is repeatable.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+_PATTERN = bytes(range(256)) * 256   # 64 KiB block repeated as synthetic media
+
+
+def make_sample(path, seconds=5, ffmpeg=None):
+    """Render a small real mp4 (test pattern + tone) with ffmpeg; returns path or None."""
+    ffmpeg = ffmpeg or shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    subprocess.run([
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=320x240:rate=25",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path,
+    ], check=True)
+    return path
+
+
+class FakeMediaServer(object):
+    """Threaded server on localhost; use as a context manager or start()/stop()."""
+
+    def __init__(self, items=5, size=4 * 1024 * 1024, sample=None, rate=None, latency=0.0, port=0,
+                 fault_rate=0.0, fault_status=503, fault_first=0, fault_items=(), retry_after=None, seed=1,
+                 ranges=True):
+        self.items = items
+        self.sample = sample
+        self.size = os.path.getsize(sample) if sample else size
+        self.rate = rate
+        self.latency = latency
+        self.port = port
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.fault_first = fault_first
+        self.fault_items = set(fault_items)
+        self.retry_after = retry_after
+        self.ranges = ranges    # False: ignore Range headers and always send the whole file, like some CDNs
+        self.playlist = None    # clip numbers listed by the playlists; None = 1..items
+        self.pages = 0
+        self._rng = random.Random(seed)
+        self._hits = {}         # path -> requests so far
+        self.faults = 0
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._data = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self.sample:
+            with open(self.sample, "rb") as f:
+                self._data = f.read()
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-media", daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    # ---------- URLs ----------
+    def video_url(self, i=1):
+        return f"{self.base_url}/watch/{i}.html"
+
+    def playlist_url(self, n=None):
+        return f"{self.base_url}/playlist.rss" + (f"?n={n}" if n else "")
+
+    def paged_url(self, size=100):
+        return f"{self.base_url}/playlist.json?size={size}"
+
+    # ---------- content ----------
+    def _slice(self, start, end):
+        if self._data is not None:
+            return self._data[start:end + 1]
+        out = bytearray()
+        pos = start
+        while pos <= end:
+            off = pos % len(_PATTERN)
+            block = _PATTERN[off:off + (end - pos + 1)]
+            out += block
+            pos += len(block)
+        return bytes(out)
+
+    def _watch_page(self, i):
+        return (f"<!DOCTYPE html><html><head><title>Synthetic clip {i}</title>"
+                f'<meta property="og:title" content="Synthetic clip {i}"></head><body>'
+                f'<video src="/media/{i}.mp4" controls></video></body></html>')
+
+    def _listed(self, n=None):
+        return list(self.playlist) if self.playlist is not None else list(range(1, (n or self.items) + 1))
+
+    def _feed(self, n):
+        items = "".join(f"<item><title>Synthetic clip {i}</title><link>{self.video_url(i)}</link>"
+                        f"<guid>clip-{i}</guid></item>" for i in self._listed(n))
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>Synthetic playlist</title><link>{self.base_url}/</link>{items}</channel></rss>")
+
+    def _page(self, query):
+        page, size = int((query.get("page") or [0])[0]), int((query.get("size") or [100])[0])
+        listed = self._listed()
+        with self._lock:
+            self.pages += 1
+        entries = [{"id": f"clip-{i}", "url": self.video_url(i), "title": f"Synthetic clip {i}"}
+                   for i in listed[page * size:(page + 1) * size]]
+        return json.dumps({"title": "Synthetic playlist", "playlist_count": len(listed), "entries": entries})
+
+    def _fault(self, path, item):
+        """Status to fail this request with, or None to serve it."""
+        with self._lock:
+            first = False
+            if self.fault_first:    # counted only when needed: the dict grows with every path
+                n = self._hits[path] = self._hits.get(path, 0) + 1
+                first = n <= self.fault_first
+            fail = (item in self.fault_items or first
+                    or (self.fault_rate and self._rng.random() < self.fault_rate))
+            if fail:
+                self.faults += 1
+        return self.fault_status if fail else None
+
+    def _handler(self):
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with srv._lock:
+                    srv.connections += 1
+
+            def do_HEAD(self):
+                self._route(head=True)
+
+            def do_GET(self):
+                self._route(head=False)
+
+            def _route(self, head):
+                with srv._lock:
+                    srv.requests += 1
+                if srv.latency:
+                    time.sleep(srv.latency)
+                url = urlparse(self.path)
+                m = re.match(r"^/(media|watch)/(\d+)\.(mp4|html)$", url.path)
+                if url.path == "/playlist.rss":
+                    n = int((parse_qs(url.query).get("n") or [srv.items])[0])
+                    self._text(srv._feed(n), "application/rss+xml", head)
+                elif url.path == "/playlist.json":
+                    self._text(srv._page(parse_qs(url.query)), "application/json", head)
+                elif m and srv._fault(url.path, int(m.group(2))):
+                    self._error(srv.fault_status, head)
+                elif m and m.group(1) == "watch":
+                    self._text(srv._watch_page(int(m.group(2))), "text/html; charset=utf-8", head)
+                elif m and m.group(1) == "media":
+                    self._media(head)
+                else:
+                    self.send_error(404)
+
+            def _error(self, status, head):
+                body = f"injected {status}".encode("ascii")
+                self.send_response(status)
+                if status == 429 and srv.retry_after is not None:
+                    self.send_header("Retry-After", str(srv.retry_after))
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def _text(self, text, ctype, head):
+                body = text.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def _media(self, head):
+                size = srv.size
+                start, end = 0, size - 1
+                rng = _RANGE.match(self.headers.get("Range") or "") if srv.ranges else None
+                if rng and (rng.group(1) or rng.group(2)):
+                    if rng.group(1):
+                        start = int(rng.group(1))
+                        end = min(int(rng.group(2)), size - 1) if rng.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(rng.group(2)))
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Accept-Ranges", "bytes" if srv.ranges else "none")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                if head:
+                    return
+                chunk = 64 * 1024
+                t0 = time.monotonic()
+                sent = 0
+                pos = start
+                try:
+                    while pos <= end:
+                        block = srv._slice(pos, min(end, pos + chunk - 1))
+                        self.wfile.write(block)
+                        pos += len(block)
+                        sent += len(block)
+                        if srv.rate:
+                            delay = sent / srv.rate - (time.monotonic() - t0)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                with srv._lock:
+                    srv.bytes_sent += sent
+
+        return Handler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=5)
+    ap.add_argument("--size", type=int, default=4 * 1024 * 1024)
+    ap.add_argument("--sample", help="serve this media file instead of synthetic bytes")
+    ap.add_argument("--rate", type=int, help="bytes/s per connection")
+    ap.add_argument("--latency", type=float, default=0.0, help="ms added to every response")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fault-rate", type=float, default=0.0, help="share of page/media requests that fail")
+    ap.add_argument("--fault-status", type=int, default=503, help="HTTP status of injected failures")
+    args = ap.parse_args(argv)
+
+    with FakeMediaServer(args.items, args.size, args.sample, args.rate, args.latency / 1000.0, args.port,
+                         fault_rate=args.fault_rate, fault_status=args.fault_status) as srv:
+        print(f"video:    {srv.video_url(1)}\nplaylist: {srv.playlist_url()}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
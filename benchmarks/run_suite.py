@@ -0,0 +1,193 @@
+"""Reproducible end-to-end benchmark of Download against the local fake media server.
+
+    python benchmarks/run_suite.py [--items N] [--size BYTES] [--concurrency 1,2,4] [--kinds mp3,mp4]
+                                   [--repeat N] [--rate BPS] [--latency MS] [--out FILE] [--compare OLD.json]
+
+For every kind (mp3_download / mp4_download), scenario (single video,
+playlist) and playlist concurrency it records time-to-first-byte, items
+per minute, progress events and the CPU spent in the progress path, peak
+traced memory and extract / post-processing time. Results go to a JSON
+file (benchmarks/results/ by default); --compare prints the relative
+change of each case against an earlier results file.
+"""
+from __future__ import unicode_literals
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DownloadMethods import Download
+from Metrics import Metrics, CallbackSink
+from fake_server import FakeMediaServer, make_sample
+
+# metrics compared by --compare; True = lower is better
+_KEY_METRICS = {
+    "ttfb_s": True,
+    "wall_s": True,
+    "items_per_min": False,
+    "progress_events": True,
+    "progress_cpu_s": True,
+    "peak_mem_bytes": True,
+    "postprocess_s": True,
+}
+
+
+def run_case(srv, kind, scenario, concurrency, trace_memory):
+    events = []
+    progress = {"emitted": 0, "delivered": 0, "cpu": 0.0}
+    lock = threading.Lock()
+
+    def on_progress(payload):
+        progress["delivered"] += 1
+
+    playlist = scenario == "playlist"
+    url = srv.playlist_url() if playlist else srv.video_url(1)
+    metrics = Metrics([CallbackSink(events.append)])
+    served = srv.bytes_sent
+    with tempfile.TemporaryDirectory() as out:
+        dl = Download(url, out, "Worst", playlist, kind == "mp4", progress_cb=on_progress,
+                      concurrency=concurrency, metrics=metrics)
+        emit = dl._emit
+
+        def timed_emit(**kw):
+            # CPU of the whole progress path on the download threads (throttle + callback)
+            t0 = time.thread_time()
+            try:
+                emit(**kw)
+            finally:
+                with lock:
+                    progress["emitted"] += 1
+                    progress["cpu"] += time.thread_time() - t0
+
+        dl._emit = timed_emit
+        if trace_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            getattr(dl, kind + "_download")()
+        finally:
+            wall = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            if trace_memory:
+                tracemalloc.stop()
+
+    first_bytes = [e["seconds"] for e in events if e["type"] == "first_byte"]
+    phases = {}
+    for e in events:
+        if e["type"] == "phase":
+            phases[e["phase"]] = phases.get(e["phase"], 0.0) + e["seconds"]
+    items = len([e for e in events if e["type"] == "entry" and e.get("ok")])
+    return {
+        "wall_s": wall,
+        "ttfb_s": min(first_bytes) if first_bytes else None,
+        "items": items,
+        "items_per_min": items / wall * 60 if wall else None,
+        "progress_emitted": progress["emitted"],
+        "progress_events": progress["delivered"],
+        "progress_cpu_s": progress["cpu"],
+        "peak_mem_bytes": peak,
+        "extract_s": phases.get("extract", 0.0),
+        "download_s": phases.get("download", 0.0),
+        "postprocess_s": phases.get("postprocess", 0.0) + phases.get("merge", 0.0),
+        "bytes_served": srv.bytes_sent - served,
+    }
+
+
+def _median(runs, key):
+    values = [r[key] for r in runs if r.get(key) is not None]
+    return statistics.median(values) if values else None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["case"]: r for r in json.load(f)["results"]}
+    for r in results:
+        old = baseline.get(r["case"])
+        if not old:
+            continue
+        delta = {}
+        for key, lower_better in _KEY_METRICS.items():
+            a, b = old.get(key), r.get(key)
+            if a and b is not None:
+                change = (b - a) / a
+                delta[key] = {"old": a, "new": b, "change": round(change, 4),
+                              "better": change < 0 if lower_better else change > 0}
+        print(json.dumps({"case": r["case"], "vs": os.path.basename(baseline_path), "delta": delta}), flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=8, help="playlist length")
+    ap.add_argument("--size", type=int, default=8 * 1024 * 1024, help="bytes per synthetic item (no ffmpeg)")
+    ap.add_argument("--concurrency", default="1,2,4", help="comma separated playlist concurrency values")
+    ap.add_argument("--kinds", default="mp3,mp4")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--rate", type=int, help="server bytes/s per connection")
+    ap.add_argument("--latency", type=float, default=0.0, help="ms added to every server response")
+    ap.add_argument("--no-tracemalloc", action="store_true", help="skip memory tracing (it slows Python code down)")
+    ap.add_argument("--out", help="results file (default: benchmarks/results/suite-<time>.json)")
+    ap.add_argument("--compare", metavar="OLD.json", help="print the change against an earlier results file")
+    args = ap.parse_args(argv)
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg and "mp3" in kinds:
+        # audio extraction cannot run on synthetic bytes
+        print("ffmpeg not found: skipping mp3 cases", file=sys.stderr)
+        kinds.remove("mp3")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = make_sample(os.path.join(tmp, "sample.mp4")) if ffmpeg else None
+        with FakeMediaServer(args.items, args.size, sample, args.rate, args.latency / 1000.0) as srv:
+            cases = []
+            for kind in kinds:
+                cases.append((kind, "single", 1))
+                cases += [(kind, "playlist", c) for c in levels]
+            results = []
+            for kind, scenario, concurrency in cases:
+                runs = [run_case(srv, kind, scenario, concurrency, not args.no_tracemalloc)
+                        for _ in range(args.repeat)]
+                summary = {key: _median(runs, key) for key in runs[0]}
+                summary.update(case=f"{kind}/{scenario}/c{concurrency}", kind=kind, scenario=scenario,
+                               concurrency=concurrency, runs=runs)
+                results.append(summary)
+                print(json.dumps({k: v for k, v in summary.items() if k != "runs"}), flush=True)
+
+    try:
+        import yt_dlp.version
+        ytdlp_version = yt_dlp.version.__version__
+    except ImportError:
+        ytdlp_version = None
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "yt_dlp": ytdlp_version,
+        "ffmpeg": bool(ffmpeg),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                   time.strftime("suite-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""yt-dlp plugin extractor for the fake media server's paged /playlist.json listing.
+
+yt-dlp loads plugins from ``yt_dlp_plugins`` packages on sys.path, so any
+run with benchmarks/ on the path lists ``FakeMediaServer.paged_url()`` a
+page at a time, the way a site extractor pages a long playlist: the first
+page up front, the next one only when the entries before it are used up.
+"""
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class FakePagedPlaylistIE(InfoExtractor):
+    IE_NAME = "fake:paged"
+    _VALID_URL = r"(?P<base>http://127\.0\.0\.1:\d+)/playlist\.json\?size=(?P<size>\d+)$"
+
+    def _page(self, base, size, page):
+        return self._download_json(f"{base}/playlist.json?page={page}&size={size}", "playlist",
+                                   note=f"Downloading page {page}")
+
+    def _entries(self, base, size, first):
+        data, page = first, 0
+        while data["entries"]:
+            for e in data["entries"]:
+                yield self.url_result(e["url"], video_id=e["id"], video_title=e["title"])
+            page += 1
+            data = self._page(base, size, page)
+
+    def _real_extract(self, url):
+        base, size = self._match_valid_url(url).group("base", "size")
+        first = self._page(base, size, 0)
+        return self.playlist_result(self._entries(base, size, first), "synthetic", first["title"],
+                                    playlist_count=first["playlist_count"])
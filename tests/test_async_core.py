@@ -0,0 +1,114 @@
+"""run_blocking and LoopThread: cancelled or timed-out work is stopped and waited for; JobQueue on top."""
+from __future__ import unicode_literals
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from AsyncCore import LoopThread, run_blocking
+from fake_server import FakeMediaServer
+
+
+class _Work(object):
+    """Blocking work that runs until stopped, like a download until Download.cancel()."""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.finished = False
+
+    def __call__(self):
+        self.stop.wait(10)
+        time.sleep(0.05)    # unwinding takes a moment
+        self.finished = True
+        return "done"
+
+
+class RunBlockingTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.loop = LoopThread("test-loop").start()
+
+    def tearDown(self):
+        self.loop.stop(timeout=5)
+        self.executor.shutdown(wait=True)
+
+    def test_result(self):
+        self.assertEqual(self.loop.submit(run_blocking(self.executor, lambda: 42)).result(5), 42)
+
+    def test_timeout_stops_and_waits_for_the_worker(self):
+        work = _Work()
+        future = self.loop.submit(run_blocking(self.executor, work, on_cancel=work.stop.set, timeout=0.1))
+        with self.assertRaises(asyncio.TimeoutError):
+            future.result(5)
+        self.assertTrue(work.finished)     # not left running behind the timed-out task
+
+    def test_cancel_stops_and_waits_for_the_worker(self):
+        work = _Work()
+        future = self.loop.submit(run_blocking(self.executor, work, on_cancel=work.stop.set))
+        time.sleep(0.1)
+        future.cancel()
+        deadline = time.monotonic() + 5
+        while not work.finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(work.stop.is_set())
+        self.assertTrue(work.finished)
+
+    def test_stop_cancels_tasks_still_running(self):
+        work = _Work()
+        self.loop.submit(run_blocking(self.executor, work, on_cancel=work.stop.set))
+        time.sleep(0.1)
+        self.loop.stop(timeout=5)
+        self.assertTrue(work.finished)
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        from JobQueue import JobQueue
+        self.JobQueue = JobQueue
+        self.out = tempfile.TemporaryDirectory()
+        # slow transfers, so jobs are still running when cancelled or timed out
+        self.srv = FakeMediaServer(4, 4 * 1024 * 1024, rate=256 * 1024)
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        self.out.cleanup()
+
+    def test_timeout_fails_the_job(self):
+        queue = self.JobQueue(max_jobs=1, job_timeout=1.0)
+        job = queue.add(self.srv.video_url(1), self.out.name, "Worst", video=True)
+        self.assertTrue(queue.wait(15))
+        queue.stop()
+        self.assertEqual(job.state, "failed")
+        self.assertIn("timed out", job.error)
+
+    def test_cancel_running_and_pending_jobs(self):
+        ran = set()
+        queue = self.JobQueue(max_jobs=1, on_update=lambda j: j.state == "running" and ran.add(j.id))
+        running = queue.add(self.srv.video_url(1), self.out.name, "Worst", video=True)
+        waiting = queue.add(self.srv.video_url(2), self.out.name, "Worst", video=True)
+        deadline = time.monotonic() + 10
+        # the job is marked running before its first update goes out: wait for the update
+        while running.id not in ran and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+        queue.cancel(running.id)
+        queue.cancel(waiting.id)
+        self.assertTrue(queue.wait(15))
+        queue.stop()
+        self.assertEqual((running.state, waiting.state), ("cancelled", "cancelled"))
+        self.assertEqual(ran, {running.id})
+
+
+if __name__ == "__main__":
+    unittest.main()
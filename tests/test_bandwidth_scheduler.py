@@ -0,0 +1,140 @@
+"""BandwidthScheduler shares measured on real transfers from the local fake media server."""
+from __future__ import unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from BandwidthScheduler import BandwidthScheduler, Pacer
+from SegmentedDownload import SegmentedDownloader
+from fake_server import FakeMediaServer
+
+KIB = 1024
+MIB = 1024 * 1024
+WARMUP = 0.4        # seconds before measuring: connection set-up and the pacer's first burst
+WINDOW = 1.2
+TOLERANCE = 0.2     # measured rates must be within 20% of the share
+
+
+class Stop(Exception):
+    pass
+
+
+class _Job(object):
+    """One job's lease feeding a paced download, as DownloadMethods does for segmented fetches."""
+
+    def __init__(self, srv, scheduler, folder, i, weight=1.0, limit=None):
+        self.lease = scheduler.register(weight, limit)
+        self.params = self.lease.attach({})
+        self.samples = [(time.monotonic(), 0)]
+        self.stopped = False
+        self.error = None
+        url = f"{srv.base_url}/media/{i}.mp4"
+        path = os.path.join(folder, f"{i}.mp4")
+        fetcher = SegmentedDownloader(1, chunk_size=16 * KIB, progress=self._progress, throttle=Pacer(self.params))
+        self.thread = threading.Thread(target=self._run, args=(fetcher, url, path), daemon=True)
+        self.thread.start()
+
+    def _run(self, fetcher, url, path):
+        try:
+            fetcher.fetch(url, path)
+        except Stop:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def _progress(self, done, total):
+        if self.stopped:
+            raise Stop()
+        self.samples.append((time.monotonic(), done))
+
+    def received(self, at):
+        n = 0
+        for t, done in self.samples:
+            if t > at:
+                break
+            n = done
+        return n
+
+    def rate(self, start, end):
+        return (self.received(end) - self.received(start)) / (end - start)
+
+    def stop(self):
+        self.stopped = True
+        self.thread.join(10)
+        self.lease.detach(self.params)
+        self.lease.release()
+
+
+class BandwidthSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.srv = FakeMediaServer(items=4, size=256 * MIB)
+        self.srv.start()
+        self.jobs = []
+
+    def tearDown(self):
+        for job in self.jobs:
+            job.stop()
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _start(self, scheduler, *specs):
+        for i, (weight, limit) in enumerate(specs, 1):
+            self.jobs.append(_Job(self.srv, scheduler, self.tmp, i, weight, limit))
+        return self.jobs
+
+    def _measure(self, delay=WARMUP, window=WINDOW):
+        time.sleep(delay)
+        start = time.monotonic()
+        time.sleep(window)
+        end = time.monotonic()
+        for job in self.jobs:
+            self.assertIsNone(job.error)
+        return [job.rate(start, end) for job in self.jobs]
+
+    def assertRate(self, measured, expected):
+        self.assertAlmostEqual(measured / expected, 1.0, delta=TOLERANCE,
+                               msg=f"{measured / KIB:.0f} KiB/s, expected {expected / KIB:.0f} KiB/s")
+
+    def test_global_cap_is_shared_evenly(self):
+        scheduler = BandwidthScheduler("2M")
+        self._start(scheduler, (1, None), (1, None))
+        a, b = self._measure()
+        self.assertRate(a + b, 2 * MIB)
+        self.assertRate(a, MIB)
+        self.assertRate(b, MIB)
+
+    def test_job_cap_leaves_the_rest_to_others(self):
+        scheduler = BandwidthScheduler("2M")
+        self._start(scheduler, (1, "256K"), (1, None))
+        a, b = self._measure()
+        self.assertRate(a, 256 * KIB)
+        self.assertRate(b, 2 * MIB - 256 * KIB)
+
+    def test_weighted_shares(self):
+        scheduler = BandwidthScheduler("2M")
+        self._start(scheduler, (3, None), (1, None))
+        a, b = self._measure()
+        self.assertRate(a, 1.5 * MIB)
+        self.assertRate(b, 0.5 * MIB)
+
+    def test_live_global_limit_change(self):
+        scheduler = BandwidthScheduler("1M")
+        self._start(scheduler, (1, None))
+        before, = self._measure()
+        scheduler.set_global_limit("3M")
+        after, = self._measure(delay=0.2)
+        self.assertRate(before, MIB)
+        self.assertRate(after, 3 * MIB)
+
+
+if __name__ == "__main__":
+    unittest.main()
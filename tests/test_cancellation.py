@@ -0,0 +1,103 @@
+"""Cancel and pause mid-download: partial files are deleted or kept, and a paused job continues where it stopped."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+SIZE = 1024 * 1024
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class CancellationTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import Download, DownloadCancelled
+        self.Download, self.DownloadCancelled = Download, DownloadCancelled
+        self.tmp = tempfile.mkdtemp()
+        # about four seconds a file, so there is time to stop it half way
+        self.srv = FakeMediaServer(2, SIZE, rate=256 * 1024)
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _files(self):
+        return sorted(os.listdir(self.tmp))
+
+    def _stopped(self, stop, **kwargs):
+        """Start a download, call ``stop(dl)`` once bytes are on disk, return the exception it ended with."""
+        dl = self.Download(self.srv.video_url(1), self.tmp, "Worst", download_type=True, **kwargs)
+        ended = []
+
+        def run():
+            try:
+                dl.mp4_download()
+            except BaseException as e:
+                ended.append(e)
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and not any(
+                f.endswith(".part") and os.path.getsize(os.path.join(self.tmp, f)) for f in self._files()):
+            time.sleep(0.02)
+        stop(dl)
+        worker.join(10)
+        self.assertFalse(worker.is_alive())
+        return ended[0] if ended else None
+
+    def test_cancel_deletes_partial_files(self):
+        error = self._stopped(lambda dl: dl.cancel())
+        self.assertIsInstance(error, self.DownloadCancelled)
+        self.assertEqual(self._files(), [])
+
+    def test_cancel_keeps_partial_files_when_asked(self):
+        error = self._stopped(lambda dl: dl.cancel(keep_partial=True))
+        self.assertIsInstance(error, self.DownloadCancelled)
+        self.assertEqual([f for f in self._files() if f.endswith(".part")], self._files())
+        self.assertEqual(len(self._files()), 1)
+
+    def test_keep_policy_set_up_front_keeps_partial_files(self):
+        self._stopped(lambda dl: dl.cancel(), partial_policy="keep")
+        self.assertEqual(len([f for f in self._files() if f.endswith(".part")]), 1)
+
+    def test_pause_keeps_the_part_file_and_the_next_run_continues(self):
+        error = self._stopped(lambda dl: dl.pause())
+        self.assertIn("paused", str(error))
+        part = [f for f in self._files() if f.endswith(".part")]
+        self.assertEqual(len(part), 1)
+        kept = os.path.getsize(os.path.join(self.tmp, part[0]))
+        deadline = time.monotonic() + 10
+        while not self.srv.bytes_sent and time.monotonic() < deadline:
+            time.sleep(0.05)    # the stopped response is counted once its handler gives up
+        sent = self.srv.bytes_sent
+        self.Download(self.srv.video_url(1), self.tmp, "Worst", download_type=True).mp4_download()
+        done = [f for f in self._files() if f.endswith(".mp4")]
+        self.assertEqual(len(done), 1)
+        self.assertEqual(os.path.getsize(os.path.join(self.tmp, done[0])), SIZE)
+        # only the missing bytes were fetched again
+        self.assertLessEqual(self.srv.bytes_sent - sent, SIZE - kept + 64 * 1024)
+
+    def test_discarding_partials_removes_their_leftovers(self):
+        dl = self.Download(self.srv.video_url(1), self.tmp, "Worst", download_type=True)
+        part = os.path.join(self.tmp, "clip.mp4.part")
+        for name in (part, part + ".ytdl", part + ".ranges", part + "-Frag3", os.path.join(self.tmp, "other.mp4")):
+            open(name, "wb").close()
+        dl._track_partial(2, part)
+        dl._discard_partials()
+        self.assertEqual(self._files(), ["other.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
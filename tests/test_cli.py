@@ -0,0 +1,89 @@
+"""Headless CLI: imports without Qt, argument errors, progress lines and a download end to end."""
+from __future__ import unicode_literals
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import YoutubeDownloaderCLI as cli
+from fake_server import FakeMediaServer
+
+
+def _job(state="running", **progress):
+    return types.SimpleNamespace(id=1, url="https://example.com/v", state=state, progress=progress or None,
+                                 title=None, result=None, error=None, failed=[], sync=None)
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _main(self, *argv):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            code = cli.main(list(argv))
+        return code, err.getvalue()
+
+    def test_import_loads_neither_qt_nor_yt_dlp(self):
+        out = subprocess.run([sys.executable, "-c", "import sys, YoutubeDownloaderCLI; "
+                                                    "print('PyQt5' in sys.modules, 'yt_dlp' in sys.modules)"],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ["False", "False"])
+
+    def test_no_urls_is_a_usage_error(self):
+        code, err = self._main("not-a-url", "-o", self.tmp.name)
+        self.assertEqual(code, 2)
+        self.assertIn("no valid http(s) URLs", err)
+
+    def test_missing_output_folder_is_a_usage_error(self):
+        code, err = self._main("https://example.com/v", "-o", os.path.join(self.tmp.name, "missing"))
+        self.assertEqual(code, 2)
+        self.assertIn("output folder does not exist", err)
+
+    def test_human_output_has_one_line_per_change(self):
+        out = io.StringIO()
+        printer = cli._Printer(False, out)
+        for p in (10, 20, 30):
+            printer(_job(status="downloading", file_percent=p, idx=2, total=5, title="Clip"))
+        printer(_job(status="finished", file_percent=100, idx=2, total=5, title="Clip"))
+        printer(_job(state="done", status="finished", idx=2, total=5, title="Clip"))
+        self.assertEqual(out.getvalue().splitlines(), ["[1] running 2/5 downloading Clip",
+                                                       "[1] running 2/5 finished Clip",
+                                                       "[1] done 2/5 finished Clip"])
+
+    def test_json_output_has_one_object_per_update(self):
+        out = io.StringIO()
+        printer = cli._Printer(True, out)
+        printer(_job(status="downloading", file_percent=10, idx=None, seen=40))
+        printer(_job(status="downloading", file_percent=10, idx=None, seen=40))
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual((lines[0]["state"], lines[0]["seen"], lines[0]["total"]), ("running", 40, None))
+
+    @unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+    def test_downloads_a_video(self):
+        cache = os.path.join(self.tmp.name, "cache")
+        out = io.StringIO()
+        with FakeMediaServer(1, 4096) as srv, \
+                mock.patch.dict(os.environ, {"XDG_CACHE_HOME": cache, "LOCALAPPDATA": cache}), \
+                contextlib.redirect_stdout(out):
+            code, _ = self._main(srv.video_url(1), "-o", self.tmp.name, "--video", "-q", "Worst", "--json")
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])["state"], "done")
+        self.assertEqual(len([f for f in os.listdir(self.tmp.name) if f.endswith(".mp4")]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
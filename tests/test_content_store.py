@@ -0,0 +1,73 @@
+"""ContentStore: indexing a download and placing it into other folders."""
+from __future__ import unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ContentStore import ContentStore
+
+DATA = bytes(range(256)) * 64
+
+
+class ContentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = ContentStore(os.path.join(self.tmp, "store"))
+        self.key = ContentStore.key("Youtube", "abc", "audio:128")
+        first = os.path.join(self.tmp, "a")
+        os.makedirs(first)
+        path = os.path.join(first, "clip.mp3")
+        with open(path, "wb") as f:
+            f.write(DATA)
+        self.store.put(self.key, path, cpu_s=2.5)
+        self.folder = os.path.join(self.tmp, "b")
+        os.makedirs(self.folder)
+        self.dest = os.path.join(self.folder, "clip.mp3")
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _read(self, path=None):
+        with open(path or self.dest, "rb") as f:
+            return f.read()
+
+    def test_materialise_into_new_folder(self):
+        self.assertEqual(self.store.materialise(self.key, self.folder), self.dest)
+        self.assertEqual(self._read(), DATA)
+        stats = self.store.stats()
+        self.assertEqual((stats["reuses"], stats["bytes_saved"]), (1, len(DATA)))
+
+    def test_other_file_with_the_name_is_kept(self):
+        with open(self.dest, "wb") as f:
+            f.write(DATA[:100])
+        other = os.path.join(self.folder, "clip (2).mp3")
+        self.assertEqual(self.store.materialise(self.key, self.folder), other)
+        self.assertEqual(self._read(), DATA[:100])
+        self.assertEqual(self._read(other), DATA)
+        # found again there on the next run, not placed a third time
+        self.assertEqual(self.store.materialise(self.key, self.folder), other)
+        self.assertEqual(self.store.stats()["reuses"], 1)
+
+    def test_same_size_other_bytes_is_kept(self):
+        with open(self.dest, "wb") as f:
+            f.write(bytes(len(DATA)))
+        self.assertEqual(self.store.materialise(self.key, self.folder), os.path.join(self.folder, "clip (2).mp3"))
+        self.assertEqual(self._read(), bytes(len(DATA)))
+
+    def test_identical_file_is_kept(self):
+        with open(self.dest, "wb") as f:
+            f.write(DATA)
+        before = os.stat(self.dest).st_ino
+        self.assertEqual(self.store.materialise(self.key, self.folder), self.dest)
+        self.assertEqual(os.stat(self.dest).st_ino, before)
+        self.assertEqual(self.store.stats()["reuses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""ControlServer request checks: token, Host/Origin, download root and option validation."""
+from __future__ import unicode_literals
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ControlServer import ControlServer
+from JobQueue import JobQueue
+
+
+class ControlServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "downloads")
+        os.makedirs(os.path.join(self.root, "music"))
+        self.queue = JobQueue(max_jobs=1)
+        self.server = ControlServer(self.queue, self.root, port=0)
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.close()
+        self.queue.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def call(self, method, path, body=None, token=True, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        h = {"Authorization": f"Bearer {self.server.token}"} if token else {}
+        h.update(headers or {})
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=h)
+        r = conn.getresponse()
+        status, payload = r.status, json.loads(r.read() or b"null")
+        conn.close()
+        return status, payload
+
+    def submit(self, **fields):
+        return self.call("POST", "/jobs", dict({"url": "https://example.com/watch?v=1"}, **fields))
+
+    def test_token_is_generated_and_required(self):
+        self.assertTrue(self.server.token)
+        self.assertEqual(self.call("GET", "/jobs", token=False)[0], 401)
+        self.assertEqual(self.call("GET", "/jobs")[0], 200)
+
+    def test_foreign_host_and_origin_are_refused(self):
+        self.assertEqual(self.call("GET", "/jobs", headers={"Host": "evil.example:80"})[0], 403)
+        self.assertEqual(self.call("GET", "/jobs", headers={"Origin": "https://evil.example"})[0], 403)
+        self.assertEqual(self.call("GET", "/jobs", headers={"Origin": f"http://localhost:{self.port}"})[0], 200)
+
+    def test_save_path_stays_under_the_root(self):
+        self.assertEqual(self.submit(save_path="/etc")[0], 400)
+        self.assertEqual(self.submit(save_path="../")[0], 400)
+        self.assertEqual(self.submit(save_path="missing")[0], 400)
+        status, payload = self.submit(save_path="music")
+        self.assertEqual(status, 201)
+        self.assertEqual(payload["jobs"][0]["save_path"], os.path.realpath(os.path.join(self.root, "music")))
+
+    def test_save_path_on_another_drive_is_refused(self):
+        # what ntpath.commonpath does for paths on different drives
+        with mock.patch("os.path.commonpath", side_effect=ValueError("Paths don't have the same drive")):
+            self.assertEqual(self.submit(save_path="music")[0], 400)
+
+    def test_options_are_validated(self):
+        for bad in ({"rate_limit": "fast"}, {"rate_limit": -5}, {"rate_limit": True},
+                    {"segments": 0}, {"segments": 1000}, {"segments": "4"}):
+            self.assertEqual(self.submit(**bad)[0], 400, bad)
+        self.assertEqual(self.submit(rate_limit="2M", segments=4)[0], 201)
+
+    def test_final_set_is_bounded(self):
+        from ControlServer import _MAX_FINAL
+        for i in range(_MAX_FINAL + 10):
+            self.server._publish(i, "{}", True)
+        self.assertEqual(len(self.server._final), _MAX_FINAL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""DownloadArchive lookups, and a playlist run finding what the previous run archived."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from DownloadArchive import DownloadArchive
+from fake_server import FakeMediaServer
+
+
+class DownloadArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.archive = DownloadArchive(os.path.join(self.tmp, "archive.sqlite"))
+        self.path = os.path.join(self.tmp, "clip.mp4")
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 100)
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_lookup_ignores_extractor_case(self):
+        self.archive.record("Youtube", "abc", "mp4", "Best", self.tmp, self.path)
+        self.assertTrue(self.archive.contains("youtube", "abc", "mp4", "Best", self.tmp))
+        self.assertFalse(self.archive.contains("youtube", "abc", "mp3", "Best", self.tmp))
+
+    def test_changed_or_missing_file_does_not_count(self):
+        self.archive.record("Youtube", "abc", "mp4", "Best", self.tmp, self.path)
+        with open(self.path, "ab") as f:
+            f.write(b"more")
+        self.assertFalse(self.archive.contains("Youtube", "abc", "mp4", "Best", self.tmp))
+        os.remove(self.path)
+        self.assertIsNone(self.archive.lookup("Youtube", "abc", "mp4", "Best", self.tmp))
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class ArchivedPlaylistTest(unittest.TestCase):
+    def test_second_run_skips_archived_entries(self):
+        # the paged listing's flat entries carry no ie_key and another id than the resolved clips
+        from DownloadMethods import Download
+        tmp = tempfile.mkdtemp()
+        try:
+            archive = DownloadArchive(os.path.join(tmp, "archive.sqlite"))
+            with FakeMediaServer(6, 2048) as srv:
+                statuses = []
+
+                def run():
+                    Download(srv.paged_url(4), tmp, "Worst", playlist=True, download_type=True, archive=archive,
+                             progress_cb=lambda p: statuses.append(p.get("status"))).mp4_download()
+
+                run()
+                requests, pages = srv.requests, srv.pages
+                del statuses[:]
+                run()
+                self.assertEqual(statuses.count("skipped"), 6)
+                # the listing pages and nothing else: no watch page, no media
+                self.assertEqual(srv.requests - requests, srv.pages - pages)
+            archive.close()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
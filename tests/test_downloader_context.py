@@ -0,0 +1,54 @@
+"""DownloaderContext: sessions per proxy/address/cookie source, and connections kept across jobs."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from DownloaderContext import DownloaderContext
+from fake_server import FakeMediaServer
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class DownloaderContextTest(unittest.TestCase):
+    def setUp(self):
+        self.context = DownloaderContext()
+
+    def tearDown(self):
+        self.context.close()
+
+    def test_sessions_follow_proxy_settings(self):
+        import yt_dlp
+        a = self.context.bind(yt_dlp.YoutubeDL({"quiet": True}))
+        b = self.context.bind(yt_dlp.YoutubeDL({"quiet": True}))
+        proxied = self.context.bind(yt_dlp.YoutubeDL({"quiet": True, "proxy": "http://127.0.0.1:9"}))
+        self.assertIs(a._request_director, b._request_director)
+        self.assertIs(a.cookiejar, b.cookiejar)
+        self.assertIsNot(a._request_director, proxied._request_director)
+
+    def test_extractors_are_reused(self):
+        opts = {"noplaylist": True}
+        with self.context.extractor(opts) as first:
+            pass
+        with self.context.extractor(opts) as second:
+            self.assertIs(first, second)
+        self.assertEqual(self.context.stats()["created"], 1)
+
+    @unittest.skipUnless(importlib.util.find_spec("requests"), "pooling needs requests")
+    def test_jobs_share_connections(self):
+        from DownloadMethods import Download
+        with FakeMediaServer(4, 4096) as srv, tempfile.TemporaryDirectory() as out:
+            for i in range(1, 5):
+                Download(srv.video_url(i), out, "Worst", download_type=True, context=self.context).mp4_download()
+            # four jobs of a page and a file each: far fewer connections than requests
+            self.assertLessEqual(srv.connections, 2)
+            self.assertGreaterEqual(srv.requests, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Lazy playlist expansion: entries are pulled one at a time, and later pages are read only when needed."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+
+def _entries(n, pulled):
+    for i in range(1, n + 1):
+        pulled.append(i)
+        yield {"id": f"v{i}", "url": f"https://example.com/{i}", "title": f"Video {i}", "duration": i,
+               "thumbnails": [{"url": "https://example.com/t.jpg"}] * 20}
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class EntryStreamTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import _EntryStream
+        self.EntryStream = _EntryStream
+
+    def test_entries_are_pulled_on_demand(self):
+        pulled, seen, ended = [], [], []
+        stream = self.EntryStream(_entries(5, pulled), None, seen.append, lambda: ended.append(True))
+        self.assertEqual(stream.peek()["id"], "v1")
+        self.assertEqual(stream.peek()["id"], "v1")     # peeking twice pulls once
+        self.assertEqual((pulled, stream.seen, stream.total), ([1], 1, None))
+        it = iter(stream)
+        self.assertEqual([next(it)["id"], next(it)["id"]], ["v1", "v2"])   # the peeked entry comes first
+        self.assertEqual(pulled, [1, 2])
+        self.assertEqual([e["id"] for e in it], ["v3", "v4", "v5"])
+        self.assertEqual((stream.total, stream.exhausted, len(seen), ended), (5, True, 5, [True]))
+
+    def test_known_total_and_empty_entries(self):
+        stream = self.EntryStream([{"id": "a"}, None, {}, {"id": "b"}], total=4)
+        self.assertEqual(stream.total, 4)
+        self.assertEqual([e["id"] for e in stream], ["a", "b"])
+        self.assertEqual(stream.total, 2)   # what the iterator actually yielded
+
+    def test_compact_consumes_a_ready_made_list(self):
+        entries = list(_entries(3, []))
+        stream = self.EntryStream(entries, len(entries), compact=True)
+        it = iter(stream)
+        first = next(it)
+        self.assertEqual(len(entries), 2)   # handed-out entries are no longer held by the list
+        self.assertNotIn("thumbnails", first)
+        self.assertEqual((first["id"], first["title"]), ("v1", "Video 1"))
+        self.assertEqual(len(list(it)), 2)
+        self.assertEqual(entries, [])
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class LazyPlaylistTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import Download
+
+        srv = self.srv = FakeMediaServer(6, 2048)
+
+        class Recording(Download):
+            def _fetch_entry(self, opts, base_opts, entry, url, idx, *args):
+                self.pages_at_start[idx] = srv.pages
+                return super()._fetch_entry(opts, base_opts, entry, url, idx, *args)
+
+        self.Download = Recording
+        self.tmp = tempfile.mkdtemp()
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_first_entries_start_before_later_pages_are_read(self):
+        dl = self.Download(self.srv.paged_url(2), self.tmp, "Worst", playlist=True, download_type=True,
+                           concurrency=1)
+        dl.pages_at_start = {}
+        title, idx, total = dl.first_title()
+        self.assertEqual((idx, total, self.srv.pages), (1, 6, 1))     # the title needs only the first page
+        dl.mp4_download()
+        self.assertEqual(dl.pages_at_start[1], 1)
+        # the loop pulls the next entry while waiting for a worker: never more than one page ahead
+        for i, pages in dl.pages_at_start.items():
+            self.assertLessEqual(pages, (i + 1) // 2 + 1, dl.pages_at_start)
+        self.assertEqual(len([f for f in os.listdir(self.tmp) if f.endswith(".mp4")]), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""The benchmark suite's fake media server: ranges, playlists, pacing and injected faults."""
+from __future__ import unicode_literals
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+import urllib.error
+import urllib.request
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+
+def _get(url, **headers):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=10) as r:
+        return r.status, dict(r.headers), r.read()
+
+
+class FakeServerTest(unittest.TestCase):
+    def _server(self, **kwargs):
+        srv = FakeMediaServer(**dict({"items": 3, "size": 100000}, **kwargs))
+        srv.start()
+        self.addCleanup(srv.stop)
+        return srv
+
+    def test_media_is_deterministic_and_served_in_ranges(self):
+        srv = self._server()
+        status, headers, whole = _get(f"{srv.base_url}/media/1.mp4")
+        self.assertEqual((status, len(whole), headers["Accept-Ranges"]), (200, 100000, "bytes"))
+        self.assertEqual(whole, _get(f"{srv.base_url}/media/2.mp4")[2])
+        status, headers, part = _get(f"{srv.base_url}/media/1.mp4", Range="bytes=70000-")
+        self.assertEqual((status, headers["Content-Range"]), (206, "bytes 70000-99999/100000"))
+        self.assertEqual(part, whole[70000:])
+        self.assertEqual(_get(f"{srv.base_url}/media/1.mp4", Range="bytes=-10")[2], whole[-10:])
+        with self.assertRaises(urllib.error.HTTPError) as past_end:
+            _get(f"{srv.base_url}/media/1.mp4", Range="bytes=100000-")
+        self.assertEqual(past_end.exception.code, 416)
+
+    def test_without_range_support_the_whole_file_comes_back(self):
+        srv = self._server(ranges=False)
+        status, headers, body = _get(f"{srv.base_url}/media/1.mp4", Range="bytes=70000-")
+        self.assertEqual((status, len(body), headers["Accept-Ranges"]), (200, 100000, "none"))
+
+    def test_playlists_list_the_clips_in_order(self):
+        srv = self._server(items=5)
+        feed = _get(srv.playlist_url(2))[2].decode("utf-8")
+        self.assertEqual((feed.count("<item>"), feed.index("clip-1") < feed.index("clip-2")), (2, True))
+        srv.playlist = [4, 2]
+        page = json.loads(_get(srv.paged_url(1) + "&page=1")[2])
+        self.assertEqual((page["playlist_count"], [e["id"] for e in page["entries"]]), (2, ["clip-2"]))
+        self.assertEqual(json.loads(_get(srv.paged_url(1) + "&page=2")[2])["entries"], [])
+        self.assertEqual(srv.pages, 2)
+
+    def test_rate_and_latency_pace_every_response(self):
+        srv = self._server(size=200 * 1024, rate=1024 * 1024, latency=0.1)
+        t0 = time.monotonic()
+        _get(f"{srv.base_url}/media/1.mp4")
+        self.assertGreaterEqual(time.monotonic() - t0, 0.25)     # 0.1 s latency + 200 KiB at 1 MiB/s
+        deadline = time.monotonic() + 5
+        while srv.bytes_sent < 200 * 1024 and time.monotonic() < deadline:
+            time.sleep(0.01)    # counted once the handler has written the last block
+        self.assertEqual(srv.bytes_sent, 200 * 1024)
+
+    def test_faults_are_injected_where_asked(self):
+        srv = self._server(fault_first=1, fault_items=[3], fault_status=429, retry_after=2)
+        with self.assertRaises(urllib.error.HTTPError) as first:
+            _get(srv.video_url(1))
+        self.assertEqual((first.exception.code, first.exception.headers["Retry-After"]), (429, "2"))
+        self.assertEqual(_get(srv.video_url(1))[0], 200)    # only the first request of a path fails
+        for _ in range(2):
+            with self.assertRaises(urllib.error.HTTPError):
+                _get(f"{srv.base_url}/media/3.mp4")
+        self.assertEqual(srv.faults, 3)
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class RunSuiteTest(unittest.TestCase):
+    def test_results_file_and_compare(self):
+        import run_suite
+        out = os.path.join(tempfile.mkdtemp(), "results.json")
+        args = ["--items", "2", "--size", "4096", "--concurrency", "2", "--kinds", "mp4", "--repeat", "1",
+                "--out", out]
+        with redirect_stdout(io.StringIO()):
+            run_suite.main(args)
+        with open(out, encoding="utf-8") as f:
+            results = json.load(f)["results"]
+        self.assertEqual(len(results), 2)   # single video and playlist
+        for r in results:
+            self.assertGreater(r["items_per_min"], 0)
+        printed = io.StringIO()
+        with redirect_stdout(printed):
+            run_suite.compare(results, out)
+        deltas = [json.loads(line)["delta"] for line in printed.getvalue().splitlines()]
+        self.assertEqual(len(deltas), 2)
+        self.assertTrue(all(d["change"] == 0 for delta in deltas for d in delta.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""FormatSelector decisions and the savings they report."""
+from __future__ import unicode_literals
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from FormatSelector import FormatSelector
+
+INFO = {"id": "abc", "extractor_key": "Generic", "duration": 200, "formats": [
+    {"format_id": "140", "url": "u", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128, "filesize": 3200000},
+    {"format_id": "251", "url": "u", "vcodec": "none", "acodec": "opus", "abr": 160, "filesize": 4000000},
+]}
+
+
+class FormatSelectorTest(unittest.TestCase):
+    def test_copies_an_accepted_codec(self):
+        d = FormatSelector(accept_audio=("m4a",)).decide(INFO, False, "128")
+        self.assertEqual(d["action"], "copy")
+        self.assertTrue(d["format"].startswith("140/"))
+        self.assertEqual(d["bytes_saved"], 800000)
+
+    def test_a_retry_is_not_counted_twice(self):
+        sel = FormatSelector(accept_audio=("m4a",))
+        first = sel.decide(INFO, False, "128")
+        again = sel.decide(INFO, False, "128", count=False)
+        self.assertEqual(first, again)
+        stats = sel.stats()
+        self.assertEqual(stats["decisions"], 1)
+        self.assertEqual(stats["copies"], 1)
+        self.assertEqual(stats["bytes_saved"], 800000)
+
+
+if __name__ == "__main__":
+    unittest.main()
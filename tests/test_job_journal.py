@@ -0,0 +1,131 @@
+"""JobJournal: append-only records, replay after a restart, torn tails, cost per mark."""
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from JobJournal import JobJournal
+
+SPEC = {"url": "https://example.com/playlist?list=x", "save_path": "/tmp/out", "quality": "Best",
+        "playlist": True, "video": True}
+
+
+class JobJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _journal(self, n, interval=1.0):
+        j = JobJournal.open(self.tmp, SPEC)
+        j.interval = interval
+        j.set_entries([{"id": f"v{i}", "url": f"https://example.com/v{i}", "title": f"clip {i}"}
+                       for i in range(1, n + 1)], title="list")
+        return j
+
+    def test_replay_after_reopen(self):
+        j = self._journal(10, interval=0)
+        j.mark(1, "done", filepath="a.mp4")
+        j.mark(2, "failed", error="HTTP 500")
+        j.progress(3, "c.mp4.part", 4096, 8192)
+        j.close()
+        again = JobJournal.open(self.tmp, SPEC)
+        self.assertEqual(again.title, "list")
+        self.assertEqual(len(again.entries), 10)
+        self.assertTrue(again.is_done(1))
+        self.assertEqual(again.state(2), "failed")
+        self.assertEqual(again.states["3"]["downloaded_bytes"], 4096)
+        self.assertEqual(again.done_count, 1)
+        self.assertEqual([x.spec for x in JobJournal.unfinished(self.tmp)], [SPEC])
+
+    def test_close_writes_batched_marks(self):
+        j = self._journal(10, interval=3600)
+        for i in range(1, 6):
+            j.mark(i, "done")
+        self.assertEqual(JobJournal.load(j.path).done_count, 0)    # still batched
+        j.close()
+        self.assertEqual(JobJournal.load(j.path).done_count, 5)
+
+    def test_torn_last_line_is_ignored(self):
+        j = self._journal(5, interval=0)
+        j.mark(1, "done")
+        j.mark(2, "done")
+        j.close()
+        with open(j.path, "a", encoding="utf-8") as f:
+            f.write('{"op": "state", "idx": "3", "rec": {"sta')
+        again = JobJournal.load(j.path)
+        self.assertEqual(again.done_count, 2)
+        self.assertIsNone(again.state(3))
+
+    def test_reads_single_snapshot_journals(self):
+        path = os.path.join(self.tmp, JobJournal.key(SPEC) + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"spec": SPEC, "title": "old", "entries": [{"id": "a"}, {"id": "b"}],
+                       "states": {"1": {"state": "done", "filepath": "a.mp4"},
+                                  "2": {"state": "downloading", "tmpfilename": "b.part"}}}, f)
+        j = JobJournal.open(self.tmp, SPEC)
+        self.assertTrue(j.is_done(1))
+        self.assertEqual(j.states, {"2": {"state": "downloading", "tmpfilename": "b.part"}})
+
+    def test_marks_are_appended_not_rewritten(self):
+        n = 4000
+        j = self._journal(n, interval=0)
+        started = time.perf_counter()
+        for i in range(1, n + 1):
+            j.progress(i, f"v{i}.part", 1024, 2048)
+            j.mark(i, "failed" if i % 100 == 0 else "done", filepath=f"v{i}.mp4")
+        j.close()
+        took = time.perf_counter() - started
+        again = JobJournal.load(j.path)
+        self.assertEqual(again.done_count, n - n // 100)
+        self.assertEqual(len(again.states), n // 100)
+        # rewriting the whole journal per mark took minutes at this size
+        self.assertLess(took, 10.0)
+        self.assertLess(os.path.getsize(j.path), 4 * 1024 * 1024)
+
+    def test_compact_journal_memory_per_entry(self):
+        n = 20000
+        tracemalloc.start()
+        try:
+            j = JobJournal.open(self.tmp, SPEC)
+            j.compact = True
+            j.set_entries(None, title="list", complete=False)    # low memory: the list is not kept
+            base = tracemalloc.get_traced_memory()[0]
+            for i in range(1, n + 1):
+                j.progress(i, f"v{i}.mp4.part", 1024, 2048)
+                if i % 100:
+                    j.mark(i, "done", filepath=f"v{i}.mp4")
+                else:
+                    j.mark(i, "failed", error="HTTP Error 500: " + "x" * 200)
+            j.close()
+            retained = tracemalloc.get_traced_memory()[0] - base
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(j.done_count, n - n // 100)
+        self.assertEqual(JobJournal.load(j.path).state(100), "failed")
+        # a bit per finished entry plus a small record per failed one
+        self.assertLess(retained / n, 32)
+
+    def test_discard_removes_log_and_partials(self):
+        j = self._journal(3, interval=0)
+        part = os.path.join(self.tmp, "b.mp4.part")
+        open(part, "wb").close()
+        j.mark(1, "done")
+        j.progress(2, part, 10)
+        j.discard(remove_partials=True)
+        self.assertFalse(os.path.exists(j.path))
+        self.assertFalse(os.path.exists(part))
+        self.assertEqual(JobJournal.unfinished(self.tmp), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
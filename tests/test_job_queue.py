@@ -0,0 +1,91 @@
+"""JobQueue batch mode: URL lists, priority order and the running-jobs cap."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from AsyncCore import LoopThread
+from JobQueue import JobQueue, parse_urls, PENDING, DONE, RUNNING
+from fake_server import FakeMediaServer
+
+
+class ParseUrlsTest(unittest.TestCase):
+    def test_comments_blank_lines_and_non_urls_are_skipped(self):
+        text = ("# my list\n"
+                "https://example.com/a\n"
+                "\n"
+                "   http://example.com/b   https://example.com/c\n"
+                "example.com/no-scheme ftp://example.com/d\n"
+                "  # https://example.com/commented\n")
+        self.assertEqual(parse_urls(text),
+                         ["https://example.com/a", "http://example.com/b", "https://example.com/c"])
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.out = tempfile.TemporaryDirectory()
+        # not started yet: jobs can be queued and reordered before the first one runs
+        self.loop = LoopThread("job-queue-test")
+
+    def tearDown(self):
+        self.loop.stop(timeout=10)
+        self.out.cleanup()
+
+    def test_add_file_queues_every_url_with_shared_settings(self):
+        path = os.path.join(self.out.name, "batch.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# batch\nhttps://example.com/1\nhttps://example.com/2 https://example.com/3\n")
+        queue = JobQueue(max_jobs=1, loop=self.loop)
+        jobs = queue.add_file(path, self.out.name, "Worst", video=True, priority=2, segments=4)
+        queue.stop()
+        self.assertEqual([j.url for j in jobs], ["https://example.com/1", "https://example.com/2",
+                                                 "https://example.com/3"])
+        self.assertEqual(queue.jobs(), jobs)
+        for job in jobs:
+            self.assertEqual((job.state, job.video, job.priority, job.options), (PENDING, True, 2, {"segments": 4}))
+
+    @unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+    def test_highest_priority_runs_first(self):
+        started = []
+        queue = JobQueue(max_jobs=1, loop=self.loop,
+                         on_update=lambda j: j.state == RUNNING and j.id not in started and started.append(j.id))
+        with FakeMediaServer(3, 2048) as srv:
+            low = queue.add(srv.video_url(1), self.out.name, "Worst", video=True)
+            mid = queue.add(srv.video_url(2), self.out.name, "Worst", video=True, priority=1)
+            high = queue.add(srv.video_url(3), self.out.name, "Worst", video=True)
+            queue.set_priority(high.id, 5)     # its first heap entry goes stale
+            self.loop.start()
+            self.assertTrue(queue.wait(30))
+        queue.stop()
+        self.assertEqual(started, [high.id, mid.id, low.id])
+        self.assertEqual({j.state for j in queue.jobs()}, {DONE})
+
+    @unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+    def test_at_most_max_jobs_run_at_once(self):
+        lock = threading.Lock()
+        most = []
+
+        def on_update(job):
+            with lock:
+                most.append(sum(1 for j in queue.jobs() if j.state == RUNNING))
+
+        queue = JobQueue(max_jobs=2, loop=self.loop, on_update=on_update)
+        # slow transfers, so jobs overlap
+        with FakeMediaServer(4, 256 * 1024, rate=1024 * 1024) as srv:
+            queue.add_many([srv.video_url(i) for i in range(1, 5)], self.out.name, "Worst", video=True)
+            self.loop.start()
+            self.assertTrue(queue.wait(60))
+        queue.stop()
+        self.assertEqual(max(most), 2)
+        self.assertEqual({j.state for j in queue.jobs()}, {DONE})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Memory a low-memory playlist run peaks at and keeps per entry, end to end against the local fake media server."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import sys
+import tracemalloc
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+MAX_PER_ENTRY = 1024    # bytes; the bench holds larger playlists to 512
+PEAK_TOLERANCE = 0.5    # the download loop's peak may grow this much from 10 to 50 entries
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class MemoryBoundTest(unittest.TestCase):
+    def test_low_memory_peak_and_retained_per_entry(self):
+        from bench_memory import measure, peak_growth, per_entry
+        tracemalloc.start()
+        try:
+            with FakeMediaServer(50, 2048) as srv:
+                measure(srv, 5, True, 4)    # warm-up: imports, extractor set-up
+                small = measure(srv, 10, True, 4)
+                large = measure(srv, 50, True, 4)
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(large["entries"], 50)
+        self.assertLessEqual(per_entry(small, large), MAX_PER_ENTRY, (small, large))
+        self.assertLessEqual(peak_growth(small, large), PEAK_TOLERANCE, (small, large))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""MergePool: stream copy vs re-encode per stream, bounded parallel merges, atomic output and failures."""
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MergePool import MergePool, MergeError, probe_streams
+
+# stand-ins for the real tools: "media" files hold their ffprobe JSON, ffmpeg logs its runs and concatenates
+FFPROBE = """\
+import sys
+with open(sys.argv[-1]) as f:
+    sys.stdout.write(f.read())
+"""
+FFMPEG = """\
+import os, sys, time
+args = sys.argv[1:]
+inputs = [args[i + 1] for i, a in enumerate(args) if a == "-i"]
+log = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs.log")
+with open(log, "a") as f:
+    f.write("start %r %s\\n" % (time.monotonic(), " ".join(args)))
+time.sleep(0.2)
+if any("fail" in open(p).read() for p in inputs):
+    sys.stderr.write("Invalid data found when processing input")
+    sys.exit(1)
+with open(args[-1], "w") as out:
+    for p in inputs:
+        out.write(open(p).read())
+with open(log, "a") as f:
+    f.write("end %r\\n" % time.monotonic())
+"""
+
+
+def _streams(*pairs):
+    return json.dumps({"streams": [{"codec_type": t, "codec_name": n} for t, n in pairs]})
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "the stand-in tools are shebang scripts")
+class MergePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.ffmpeg = self._script("ffmpeg", FFMPEG)
+        self.ffprobe = self._script("ffprobe", FFPROBE)
+
+    def _script(self, name, body):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write(f"#!{sys.executable}\n{body}")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def _media(self, name, *pairs):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write(_streams(*pairs))
+        return path
+
+    def _pool(self, **kwargs):
+        pool = MergePool(ffmpeg=self.ffmpeg, ffprobe=self.ffprobe, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def _runs(self):
+        with open(os.path.join(self.tmp, "runs.log")) as f:
+            return [line.split(" ", 2) for line in f.read().splitlines()]
+
+    def test_probe_streams(self):
+        path = self._media("v.mp4", ("video", "h264"), ("audio", "aac"))
+        self.assertEqual(probe_streams(path, self.ffprobe), [("video", "h264"), ("audio", "aac")])
+        self.assertIsNone(probe_streams(path, os.path.join(self.tmp, "missing")))
+
+    def test_mp4_copies_fitting_codecs_and_encodes_the_rest(self):
+        pool = self._pool(workers=1)
+        video = self._media("v.webm", ("video", "vp9"))
+        self.assertEqual(pool.plan([video, self._media("a.m4a", ("audio", "aac"))]),
+                         (["-map", "0:v:0", "-c:0", "copy", "-map", "1:a:0", "-c:1", "copy"], True))
+        args, copy_all = pool.plan([video, self._media("a.ogg", ("audio", "vorbis"))])
+        self.assertEqual(args[4:], ["-map", "1:a:0", "-c:1", "aac", "-b:a", "192k"])
+        self.assertFalse(copy_all)
+
+    def test_other_containers_copy_everything(self):
+        pool = self._pool(workers=1, container="matroska")
+        args, copy_all = pool.plan([self._media("a.ogg", ("audio", "vorbis"))])
+        self.assertEqual((args, copy_all), (["-map", "0:a:0", "-c:0", "copy"], True))
+
+    def test_without_ffprobe_maps_like_yt_dlp(self):
+        pool = MergePool(workers=1, ffmpeg=self.ffmpeg, ffprobe=os.path.join(self.tmp, "missing"))
+        self.addCleanup(pool.close)
+        self.assertEqual(pool.plan(["v", "a"]), (["-map", "0:v:0?", "-map", "0:a:0?", "-map", "1:v:0?",
+                                                  "-map", "1:a:0?", "-c", "copy"], True))
+
+    def test_merge_writes_the_output_and_counts_it(self):
+        pool = self._pool(workers=2, threads=3)
+        video = self._media("v.mp4", ("video", "h264"))
+        audio = self._media("a.ogg", ("audio", "vorbis"))
+        output = os.path.join(self.tmp, "out.mp4")
+        result = pool.merge([video, audio], output)
+        self.assertEqual((result["method"], result["threads"]), ("transcode", 3))
+        with open(output) as f:
+            self.assertEqual(f.read(), _streams(("video", "h264")) + _streams(("audio", "vorbis")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "out.temp.mp4")))
+        self.assertIn("-threads 3 -f mp4", self._runs()[0][2])
+        stats = pool.stats()
+        self.assertEqual((stats["merges"], stats["copies"], stats["transcodes"], stats["workers"]), (1, 0, 1, 2))
+
+    def test_at_most_workers_merges_run_at_once(self):
+        pool = self._pool(workers=2)
+        video = self._media("v.mp4", ("video", "h264"))
+        futures = [pool.submit([video], os.path.join(self.tmp, f"out{i}.mp4")) for i in range(5)]
+        for f in futures:
+            f.result()
+        running = peak = 0
+        events = sorted((float(r[1]), 1 if r[0] == "start" else -1) for r in self._runs())
+        for _, step in events:
+            running += step
+            peak = max(peak, running)
+        self.assertEqual(peak, 2)
+        self.assertEqual(pool.stats()["copies"], 5)
+
+    def test_failed_merge_raises_and_leaves_nothing_behind(self):
+        pool = self._pool(workers=1)
+        output = os.path.join(self.tmp, "out.mp4")
+        with open(os.path.join(self.tmp, "bad.mp4"), "w") as f:
+            f.write('{"streams": [], "fail": 1}')
+        with self.assertRaises(MergeError) as failed:
+            pool.merge([os.path.join(self.tmp, "bad.mp4")], output)
+        self.assertIn("Invalid data", str(failed.exception))
+        self.assertEqual([n for n in os.listdir(self.tmp) if n.startswith("out")], [])
+        self.assertEqual(pool.stats()["merges"], 0)
+
+    def test_workers_and_threads_share_the_cpus(self):
+        pool = self._pool(workers=64)
+        self.assertEqual((pool.workers, pool.threads), (64, max(1, (os.cpu_count() or 2) // 64)))
+        pool = self._pool()
+        self.assertGreaterEqual(pool.workers * pool.threads, 1)
+        self.assertLessEqual(pool.workers * pool.threads, os.cpu_count() or 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
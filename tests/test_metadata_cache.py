@@ -0,0 +1,91 @@
+"""MetadataCache: keys, persistence, per-entry TTL and least-recently-used eviction."""
+from __future__ import unicode_literals
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MetadataCache import MetadataCache
+
+OPTS = {"extract_flat": "in_playlist", "format": "bv*+ba/b", "logger": object(), "quiet": True}
+
+
+def _info(i):
+    # incompressible, so every entry takes about the same room on disk
+    return {"id": f"v{i}", "title": f"Video {i}", "blob": base64.b64encode(os.urandom(3000)).decode("ascii")}
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "meta", "cache.sqlite")
+        self.now = 1000.0
+        patcher = mock.patch("MetadataCache.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _cache(self, **kwargs):
+        cache = MetadataCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_key_only_depends_on_options_that_change_the_result(self):
+        self.assertEqual(MetadataCache.key("u", OPTS), MetadataCache.key("u", dict(OPTS, logger=None, quiet=False)))
+        self.assertNotEqual(MetadataCache.key("u", OPTS), MetadataCache.key("u", dict(OPTS, format="ba")))
+        self.assertNotEqual(MetadataCache.key("u", OPTS), MetadataCache.key("v", OPTS))
+
+    def test_round_trip_survives_a_reopen(self):
+        cache = self._cache()
+        self.assertIsNone(cache.get("u", OPTS))
+        cache.put("u", OPTS, {"id": "v1", "title": "Video 1"})
+        cache.close()
+        again = self._cache()
+        self.assertEqual(again.get("u", OPTS), {"id": "v1", "title": "Video 1"})
+        self.assertEqual(again.stats()["hits"], 1)
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = self._cache(ttl=60)
+        cache.put("short", OPTS, {"id": "a"})
+        cache.put("long", OPTS, {"id": "b"}, ttl=600)
+        cache.put("forever", OPTS, {"id": "c"}, ttl=0)
+        self.now += 120
+        self.assertIsNone(cache.get("short", OPTS))
+        self.assertEqual(cache.get("long", OPTS), {"id": "b"})
+        self.assertEqual(cache.get("forever", OPTS), {"id": "c"})
+        stats = cache.stats()
+        self.assertEqual((stats["expired"], stats["entries"]), (1, 2))
+
+    def test_least_recently_used_is_evicted_first(self):
+        cache = self._cache()
+        cache.put("a", OPTS, _info(1))
+        size = cache.stats()["bytes"]
+        cache.max_bytes = int(size * 2.5)   # room for two entries
+        self.now += 1
+        cache.put("b", OPTS, _info(2))
+        self.now += 1
+        cache.get("a", OPTS)                # "a" is now more recent than "b"
+        self.now += 1
+        cache.put("c", OPTS, _info(3))
+        self.assertIsNone(cache.get("b", OPTS))
+        self.assertEqual(cache.get("a", OPTS)["id"], "v1")
+        self.assertEqual(cache.get("c", OPTS)["id"], "v3")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_oversized_entry_is_not_stored(self):
+        cache = self._cache(max_bytes=256)
+        cache.put("big", OPTS, _info(1))
+        self.assertIsNone(cache.get("big", OPTS))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""JobMetrics phase bookkeeping: open phases end with their entry, failed ones are not counted."""
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Metrics import JsonLinesSink, Metrics, PrometheusSink
+
+
+class JobMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.job = Metrics([self.events.append]).job("https://example.com/list")
+
+    def _of(self, type_):
+        return [e for e in self.events if e["type"] == type_]
+
+    def test_download_phase_spans_streams_and_ends_once(self):
+        self.job.begin("download", 1)
+        self.job.first_byte(1)
+        self.job.begin("download", 1)      # the second stream's ticks keep the same phase open
+        self.job.end("download", 1)
+        self.job.end("download", 1)        # entry processed after the merge already closed it
+        self.job.entry_done(1)
+        self.assertEqual(len(self._of("phase")), 1)
+        self.assertEqual(len(self._of("first_byte")), 1)
+        self.assertEqual(self.job._open, {})
+
+    def test_failed_entry_clears_open_phases(self):
+        self.job.begin("download", 2)
+        self.job.begin("merge", 2)
+        self.job.entry_done(2, ok=False)
+        self.assertEqual(self.job._open, {})
+        entry, = self._of("entry")
+        self.assertFalse(entry["ok"])
+        self.assertNotIn("download_s", entry)
+        self.job.finish()
+        self.assertEqual(self._of("job")[0]["phases"]["download"], 0.0)
+
+    def test_open_phase_is_counted_when_entry_succeeds(self):
+        self.job.begin("download", 3)
+        self.job.entry_done(3)
+        self.assertEqual(self.job._open, {})
+        self.assertIn("download_s", self._of("entry")[0])
+
+    def test_first_byte_is_timed_from_the_entry_download(self):
+        time.sleep(0.2)     # entries later in a playlist start well after the job
+        self.job.begin("extract", 4)
+        self.job.begin("download", 4)
+        self.job.first_byte(4)
+        self.assertLess(self._of("first_byte")[0]["seconds"], 0.1)
+        self.job.entry_done(4)
+        self.assertNotIn("download_started", self._of("entry")[0])
+
+
+class PrometheusSinkTest(unittest.TestCase):
+    def test_counters_render_exactly(self):
+        sink = PrometheusSink()
+        sink({"type": "entry", "ok": True, "bytes": 123456789})
+        sink({"type": "phase", "phase": "download", "seconds": 0.1})
+        sink({"type": "phase", "phase": "download", "seconds": 0.2})
+        text = sink.render()
+        self.assertIn("ytdl_bytes_total 123456789\n", text)
+        self.assertIn('ytdl_phase_count_total{phase="download"} 2\n', text)
+        self.assertIn('ytdl_phase_seconds_total{phase="download"} %r\n' % (0.1 + 0.2), text)
+
+
+class JsonLinesSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "metrics.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_rotates_at_the_cap(self):
+        sink = JsonLinesSink(self.path, max_bytes=1000, backups=2)
+        for i in range(200):
+            sink({"type": "retry", "n": i})
+        sink.close()
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["metrics.jsonl", "metrics.jsonl.1", "metrics.jsonl.2"])
+        for name in os.listdir(self.tmp):
+            self.assertLess(os.path.getsize(os.path.join(self.tmp, name)), 1100)
+        kept = []
+        for name in ("metrics.jsonl.2", "metrics.jsonl.1", "metrics.jsonl"):
+            with open(os.path.join(self.tmp, name), encoding="utf-8") as f:
+                kept += [json.loads(line)["n"] for line in f]
+        # the newest events, in order, with the oldest rotated out
+        self.assertEqual(kept, list(range(200 - len(kept), 200)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Playlist entries download side by side, at most ``concurrency`` at a time, each under its own index."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+ITEMS = 6
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class PlaylistEngineTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import Download
+
+        class Counting(Download):
+            def _download_entry(self, *args, **kwargs):
+                with self.lock:
+                    self.running += 1
+                    self.most = max(self.most, self.running)
+                try:
+                    return super()._download_entry(*args, **kwargs)
+                finally:
+                    with self.lock:
+                        self.running -= 1
+
+        self.Download = Counting
+        self.tmp = tempfile.mkdtemp()
+        # slow enough responses that workers overlap
+        self.srv = FakeMediaServer(ITEMS, 4096, latency=0.05)
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _download(self, concurrency):
+        updates = []
+        dl = self.Download(self.srv.playlist_url(), self.tmp, "Worst", playlist=True, download_type=True,
+                           concurrency=concurrency, progress_cb=updates.append, progress_rate=0)
+        dl.lock, dl.running, dl.most = threading.Lock(), 0, 0
+        dl.mp4_download()
+        return dl, updates
+
+    def test_entries_run_concurrently_up_to_the_limit(self):
+        dl, updates = self._download(3)
+        self.assertEqual(dl.most, 3)
+        self.assertEqual(len([f for f in os.listdir(self.tmp) if f.endswith(".mp4")]), ITEMS)
+        # every entry reports under its own index, whichever worker ran it
+        self.assertEqual({u["idx"] for u in updates if u["status"] == "finished"}, set(range(1, ITEMS + 1)))
+        self.assertTrue(all(u["total"] == ITEMS for u in updates if u["idx"]))
+
+    def test_concurrency_one_is_serial(self):
+        dl, _ = self._download(1)
+        self.assertEqual(dl.most, 1)
+        self.assertEqual(len([f for f in os.listdir(self.tmp) if f.endswith(".mp4")]), ITEMS)
+
+
+if __name__ == "__main__":
+    unittest.main()
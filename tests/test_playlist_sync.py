@@ -0,0 +1,166 @@
+"""PlaylistSync: the listing is walked lazily, and only a completed run leaves a snapshot."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from PlaylistSync import PlaylistSync, moved_ids
+from fake_server import FakeMediaServer
+
+PAGE = 10
+
+
+class _Listing(object):
+    """A flat listing read a page at a time, counting the pages requested."""
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self.pages = 0
+
+    def __call__(self):
+        def entries():
+            for p in range(0, len(self.ids), PAGE):
+                self.pages += 1
+                for x in self.ids[p:p + PAGE]:
+                    yield {"id": x, "url": f"https://example.com/{x}", "title": x}
+        return {"title": "list", "playlist_count": len(self.ids)}, entries()
+
+
+class MovedIdsTest(unittest.TestCase):
+    def test_one_item_dragged_is_one_move(self):
+        self.assertEqual(moved_ids(list("abcdef"), list("eabcdf")), ["e"])
+        self.assertEqual(moved_ids(list("abcdef"), list("bcdefa")), ["a"])
+
+    def test_swaps_added_and_removed_ids(self):
+        self.assertEqual(moved_ids(list("abcd"), list("abcd")), [])
+        self.assertEqual(len(moved_ids(list("abcd"), list("badc"))), 2)
+        self.assertEqual(moved_ids(list("abcd"), list("xcabz")), ["c"])     # new and gone ids are not moves
+        self.assertEqual(moved_ids([], list("ab")), [])
+
+
+class SyncPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.sync = PlaylistSync(os.path.join(self.tmp, "sync.sqlite"))
+        self.key = self.sync.key("https://example.com/list", self.tmp, "mp4:Best")
+        self.listing = _Listing(f"v{i}" for i in range(1, 101))
+
+    def tearDown(self):
+        self.sync.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_plan_reads_pages_as_entries_are_pulled(self):
+        plan = self.sync.plan(self.key, *self.listing())
+        self.assertEqual(self.listing.pages, 0)
+        walk = iter(plan)
+        next(walk)
+        self.assertEqual(self.listing.pages, 1)
+        self.assertFalse(plan.complete)
+        for _ in walk:
+            pass
+        self.assertTrue(plan.complete)
+        self.assertEqual(len(plan.entries), 100)
+
+    def test_unchanged_relisting_stops_on_the_first_page(self):
+        self.assertTrue(self.sync.commit(self.sync.plan(self.key, *self.listing()).read()))
+        self.listing.pages = 0
+        plan = self.sync.plan(self.key, *self.listing()).read()
+        self.assertEqual(self.listing.pages, 1)
+        self.assertTrue(plan.early)
+        self.assertEqual([e["id"] for e in plan.entries], self.listing.ids)
+
+    def test_item_moved_to_the_top_still_stops_early(self):
+        self.assertTrue(self.sync.commit(self.sync.plan(self.key, *self.listing()).read()))
+        self.listing.ids.remove("v50")
+        self.listing.ids.insert(0, "v50")
+        self.listing.pages = 0
+        plan = self.sync.plan(self.key, *self.listing()).read()
+        self.assertEqual((self.listing.pages, plan.early), (1, True))
+        self.assertEqual([e["id"] for e in plan.entries], self.listing.ids)
+        self.assertEqual((plan.moved, plan.added, plan.removed), (["v50"], [], []))
+
+    def test_removed_item_is_listed_past_before_stopping(self):
+        self.assertTrue(self.sync.commit(self.sync.plan(self.key, *self.listing()).read()))
+        self.listing.ids.remove("v90")
+        self.listing.pages = 0
+        plan = self.sync.plan(self.key, *self.listing()).read()
+        # the count only matches past the gap, and the anchor needs five in a row there again
+        self.assertEqual((self.listing.pages, plan.early, plan.listed), (10, True, 94))
+        self.assertEqual([e["id"] for e in plan.entries], self.listing.ids)
+        self.assertEqual((plan.removed, plan.moved), (["v90"], []))
+
+    def test_incomplete_plan_is_not_committed(self):
+        plan = self.sync.plan(self.key, *self.listing())
+        next(iter(plan))
+        self.assertFalse(self.sync.commit(plan))
+        self.assertIsNone(self.sync.load(self.key))
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class DownloadSyncTest(unittest.TestCase):
+    """Download(sync=...) against the fake server's paged listing (benchmarks/yt_dlp_plugins)."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out = os.path.join(self.tmp, "out")
+        os.makedirs(self.out)
+        self.srv = FakeMediaServer(30, 2048, fault_status=404)
+        self.srv.start()
+        self.sync = PlaylistSync(os.path.join(self.tmp, "sync.sqlite"))
+
+    def tearDown(self):
+        self.srv.stop()
+        self.sync.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _download(self):
+        from DownloadMethods import Download
+        return Download(self.srv.paged_url(PAGE), self.out, "Worst", playlist=True, download_type=True,
+                        concurrency=4, sync=self.sync)
+
+    def _run(self):
+        pages, files = self.srv.pages, len(os.listdir(self.out))
+        dl = self._download()
+        dl.mp4_download()
+        return dl, self.srv.pages - pages, len(os.listdir(self.out)) - files
+
+    def test_pages_requested_per_sync(self):
+        dl = self._download()
+        dl.first_title()
+        self.assertEqual(self.srv.pages, 1)     # the probe does not read the whole listing
+        dl.mp4_download()
+        self.assertEqual(self.srv.pages, 30 // PAGE + 1)
+        self.assertEqual(len(os.listdir(self.out)), 30)
+
+        dl, pages, fetched = self._run()
+        self.assertEqual((pages, fetched), (1, 0))
+        self.assertTrue(dl.sync_report["stopped_early"])
+
+        self.srv.playlist = [31, 32] + list(range(1, 31))
+        dl, pages, fetched = self._run()
+        self.assertEqual((pages, fetched), (1, 2))
+        self.assertEqual(dl.sync_report["added"], ["clip-31", "clip-32"])
+
+    def _snapshot(self):
+        dl = self._download()
+        return self.sync.load(self.sync.key(dl.url, self.out, f"{dl._kind}:{dl.quality}"))
+
+    def test_failed_run_leaves_the_snapshot(self):
+        self._run()
+        before = self._snapshot()
+        self.srv.playlist = [31] + list(range(1, 31))
+        self.srv.fault_items = {31}
+        with self.assertRaises(Exception):
+            self._run()
+        self.assertEqual(self._snapshot(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Pipelined post-processing: conversions overlap later downloads, and a failed one stops the playlist."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+ITEMS = 8
+# yt-dlp's Exec post-processor, failing for the 2nd clip only; needs no FFmpeg
+FAIL_SECOND = [{"key": "Exec", "exec_cmd": "case %(webpage_url)q in */watch/2.html) exit 1;; esac"}]
+# a conversion far slower than a download of the tiny clips
+SLOW = [{"key": "Exec", "exec_cmd": "sleep 0.3; : %(filepath)q"}]
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class PipelineDepthTest(unittest.TestCase):
+    def test_at_most_depth_entries_between_download_and_conversion(self):
+        from DownloadMethods import _PostprocessPipeline
+
+        class Outer(object):
+            def _check_cancelled(self):
+                pass
+
+        pipeline = _PostprocessPipeline([], workers=1, depth=2)
+        self.addCleanup(pipeline.close)
+        pipeline.acquire(Outer())
+        pipeline.acquire(Outer())
+        third = threading.Thread(target=pipeline.acquire, args=(Outer(),), daemon=True)
+        third.start()
+        third.join(0.5)
+        self.assertTrue(third.is_alive())   # the third waits for a slot
+        pipeline.release()
+        third.join(5)
+        self.assertFalse(third.is_alive())
+
+    def test_join_raises_a_failure_already_dropped_from_the_list(self):
+        from DownloadMethods import _PostprocessPipeline
+
+        def fail():
+            raise ValueError("conversion failed")
+
+        pipeline = _PostprocessPipeline([], workers=1, depth=4)
+        self.addCleanup(pipeline.close)
+        pipeline.submit(fail)
+        deadline = time.monotonic() + 5
+        while not pipeline.failures and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for _ in range(10):     # finished jobs, the failed one too, are dropped as these go in
+            pipeline.submit(time.sleep, 0)
+        pipeline.close()
+        self.assertEqual([str(e) for e in pipeline.failures], ["conversion failed"])
+        with self.assertRaisesRegex(ValueError, "conversion failed"):
+            pipeline.join()
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+@unittest.skipIf(os.name == "nt", "the Exec command is a POSIX shell test")
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import Download
+
+        class Recording(Download):
+            def _fetch_entry(self, opts, base_opts, entry, url, idx, *args):
+                self.started.append(idx)
+                self.events.append(("download", idx))
+                return super()._fetch_entry(opts, base_opts, entry, url, idx, *args)
+
+            def _postprocess_entry(self, y, info, idx, *args):
+                try:
+                    return super()._postprocess_entry(y, info, idx, *args)
+                finally:
+                    self.events.append(("converted", idx))
+
+        self.Download = Recording
+        self.tmp = tempfile.mkdtemp()
+        # downloads slower than the failing command, as they are next to a real conversion
+        self.srv = FakeMediaServer(ITEMS, 2048, latency=0.1)
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _run(self, postprocessors=FAIL_SECOND, **kwargs):
+        dl = self.Download(self.srv.paged_url(ITEMS), self.tmp, "Worst", playlist=True, download_type=True,
+                           concurrency=1, postprocess_workers=1, **kwargs)
+        dl.started, dl.events = [], []
+        return dl, lambda: dl._run(dict(dl.common_opts, postprocessors=postprocessors))
+
+    def test_conversions_overlap_later_downloads(self):
+        dl, run = self._run(SLOW)
+        run()
+        self.assertEqual(sorted(i for what, i in dl.events if what == "converted"), list(range(1, ITEMS + 1)))
+        # the 2nd download starts while the 1st is still converting, and so on down the playlist
+        self.assertLess(dl.events.index(("download", 2)), dl.events.index(("converted", 1)), dl.events)
+        # with one worker and one download at a time, at most depth 2 entries are ever past their download
+        for n, event in enumerate(dl.events):
+            if event[0] == "download":
+                pending = ({i for what, i in dl.events[:n + 1] if what == "download"}
+                           - {i for what, i in dl.events[:n] if what == "converted"})
+                self.assertLessEqual(len(pending), 2, dl.events)
+
+    def test_failed_conversion_stops_later_entries(self):
+        dl, run = self._run()
+        with self.assertRaises(Exception) as failed:
+            run()
+        self.assertIn("error code 1", str(failed.exception))
+        # the entry downloading while the 2nd converted may finish; none after it starts
+        self.assertLessEqual(max(dl.started), 3, dl.started)
+
+    def test_continue_on_error_keeps_going(self):
+        dl, run = self._run(continue_on_error=True)
+        run()
+        self.assertEqual(sorted(dl.started), list(range(1, ITEMS + 1)))
+        self.assertEqual([f["idx"] for f in dl.failed], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
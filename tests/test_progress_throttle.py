@@ -0,0 +1,70 @@
+"""ProgressThrottle: duplicate and backwards ticks dropped, "downloading" coalesced, transitions sent at once."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _tick(percent, idx=1, status="downloading"):
+    return {"status": status, "file_percent": percent, "overall_percent": None, "idx": idx, "total": 3,
+            "title": "Clip"}
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class ProgressThrottleTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import ProgressThrottle
+        self.now = 100.0
+        patcher = mock.patch("DownloadMethods.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.got = []
+        self.throttle = ProgressThrottle(self.got.append, rate_hz=10)
+
+    def test_duplicates_and_backwards_ticks_are_dropped(self):
+        for p in (10, 10, 5):
+            self.throttle(_tick(p))
+            self.now += 1
+        self.assertEqual([g["file_percent"] for g in self.got], [10])
+        self.assertEqual((self.throttle.received, self.throttle.delivered), (3, 1))
+
+    def test_downloading_ticks_are_coalesced_newest_wins(self):
+        self.throttle(_tick(1))
+        for p in range(2, 12):
+            self.now += 0.03    # 10 Hz allows one every 0.1 s
+            self.throttle(_tick(p))
+        self.assertEqual([g["file_percent"] for g in self.got], [1, 5, 9])
+        self.throttle.flush()
+        self.assertEqual(self.got[-1]["file_percent"], 11)
+        self.throttle.flush()   # nothing left waiting
+        self.assertEqual(len(self.got), 4)
+
+    def test_transitions_are_never_held_back(self):
+        self.throttle(_tick(50))
+        self.throttle(_tick(100, status="finished"))
+        self.throttle(_tick(100, status="postprocess"))
+        self.throttle(_tick(0, idx=2, status="starting"))
+        self.assertEqual([g["status"] for g in self.got], ["downloading", "finished", "postprocess", "starting"])
+
+    def test_each_item_is_deduplicated_on_its_own(self):
+        self.throttle(_tick(40, idx=1))
+        self.throttle(_tick(10, idx=2))     # lower than item 1, but item 2's first tick
+        self.assertEqual([(g["idx"], g["file_percent"]) for g in self.got], [(1, 40), (2, 10)])
+
+    def test_forgotten_items_and_old_items_are_not_kept(self):
+        self.throttle(_tick(100, status="finished"))
+        self.throttle.forget(1)
+        self.throttle(_tick(100, status="finished"))    # same payload, but the item was forgotten
+        self.assertEqual(len(self.got), 2)
+        for idx in range(2, self.throttle.MAX_TRACKED + 10):
+            self.throttle(_tick(0, idx=idx, status="starting"))
+        self.assertEqual(len(self.throttle._last), self.throttle.MAX_TRACKED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""One click resolves its URL once: the title probe, the item count and the download share the result."""
+from __future__ import unicode_literals
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeMediaServer
+
+
+@unittest.skipUnless(importlib.util.find_spec("yt_dlp"), "needs yt-dlp")
+class ResolveOnceTest(unittest.TestCase):
+    def setUp(self):
+        from DownloadMethods import Download
+
+        class Counting(Download):
+            resolved = 0
+
+            def _resolve(self, y, url):
+                self.resolved += 1
+                return Download._resolve(y, url)
+
+        self.Download = Counting
+        self.tmp = tempfile.mkdtemp()
+        self.srv = FakeMediaServer(3, 2048)
+        self.srv.start()
+
+    def tearDown(self):
+        self.srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_single_video(self):
+        dl = self.Download(self.srv.video_url(1), self.tmp, "Worst", download_type=True)
+        title, idx, total = dl.first_title()
+        self.assertEqual((idx, total), (None, None))
+        watched = self.srv.requests
+        dl.mp4_download()
+        self.assertEqual(dl.resolved, 1)
+        # the download only fetched media: the watch page was read once, by the probe
+        self.assertEqual(watched, 1)
+        self.assertEqual(len([f for f in os.listdir(self.tmp) if f.endswith(".mp4")]), 1)
+
+    def test_playlist_is_listed_once(self):
+        dl = self.Download(self.srv.paged_url(10), self.tmp, "Worst", playlist=True, download_type=True)
+        self.assertEqual(dl.first_title()[1:], (1, 3))
+        self.assertEqual(dl._total_items, 3)
+        dl.mp4_download()
+        self.assertEqual(dl.resolved, 1)
+        # the first page, then the empty one that ends the listing; never a second listing
+        self.assertEqual(self.srv.pages, 2)
+        self.assertEqual(len([f for f in os.listdir(self.tmp) if f.endswith(".mp4")]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
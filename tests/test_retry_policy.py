@@ -0,0 +1,67 @@
+"""CircuitBreaker accounting: host pressure versus one item that keeps failing."""
+from __future__ import unicode_literals
+import os
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from RetryPolicy import CircuitBreaker, classify_error
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def _breaker(self):
+        return CircuitBreaker("example.com", max_limit=4, window=20, min_samples=4, cooldown=0.2)
+
+    def test_host_wide_errors_trip(self):
+        b = self._breaker()
+        for i in range(4):
+            b.record("server", item=f"u{i}")
+        self.assertEqual(b.state, CircuitBreaker.OPEN)
+        self.assertEqual(b.opened, 1)
+
+    def test_one_broken_item_does_not_trip_the_host(self):
+        b = self._breaker()
+        for i in range(20):
+            with b.slot(item="broken"):
+                b.record("server", item="broken")
+            with b.slot(item=f"ok{i}"):
+                b.record(None, item=f"ok{i}")
+        self.assertEqual(b.state, CircuitBreaker.CLOSED)
+        self.assertEqual(b.opened, 0)
+        self.assertEqual(b.limit, 4)
+
+    def test_untried_item_takes_the_half_open_probe(self):
+        b = self._breaker()
+        for i in range(4):
+            b.record("server", item=f"u{i}")
+        order = []
+
+        def attempt(item, ok):
+            with b.slot(item=item):
+                order.append(item)
+                b.record(None if ok else "server", item=item)
+
+        # the item that already failed asks first; the fresh one must still probe first
+        suspect = threading.Thread(target=attempt, args=("u0", False))
+        suspect.start()
+        time.sleep(0.05)
+        fresh = threading.Thread(target=attempt, args=("new", True))
+        fresh.start()
+        suspect.join(5)
+        fresh.join(5)
+        self.assertEqual(order, ["new", "u0"])
+        self.assertEqual(b.state, CircuitBreaker.CLOSED)
+        self.assertEqual(b.opened, 1)
+
+    def test_classify(self):
+        self.assertEqual(classify_error(OSError("HTTP Error 503: unavailable"))[0], "server")
+        self.assertEqual(classify_error(OSError("HTTP Error 404: not found"))[0], "fatal")
+        self.assertEqual(classify_error(TimeoutError("read timed out"))[0], "network")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""SegmentedDownloader against the local fake media server: splits, reassembly, resume, no-Range fallback."""
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from SegmentedDownload import SegmentedDownloader
+from fake_server import FakeMediaServer
+
+SIZE = 3 * 1024 * 1024 + 12345     # not a multiple of anything the planner uses
+MIN_SEGMENT = 256 * 1024
+
+
+class Stop(Exception):
+    pass
+
+
+def _stop_after(limit):
+    def progress(done, total):
+        if done >= limit:
+            raise Stop()
+    return progress
+
+
+class SegmentedDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "clip.mp4")
+        self.servers = []
+
+    def tearDown(self):
+        for srv in self.servers:
+            srv.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def server(self, **kwargs):
+        srv = FakeMediaServer(1, SIZE, **kwargs)
+        srv.start()
+        self.servers.append(srv)
+        return srv
+
+    def assertWhole(self, srv):
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), srv._slice(0, SIZE - 1))
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        self.assertFalse(os.path.exists(self.path + ".part.ranges"))
+
+    def interrupt(self, srv, segments=4):
+        # a ranged fetch stopped half way; returns the saved ranges
+        dl = SegmentedDownloader(segments, chunk_size=64 * 1024, min_segment=MIN_SEGMENT, progress=_stop_after(SIZE // 2))
+        with self.assertRaises(Stop):
+            dl.fetch(f"{srv.base_url}/media/1.mp4", self.path)
+        with open(self.path + ".part.ranges", encoding="utf-8") as f:
+            return json.load(f)["ranges"]
+
+    def test_plan_covers_every_byte_once(self):
+        for size, segments in ((SIZE, 4), (SIZE, 7), (MIN_SEGMENT * 2, 8), (1000, 4), (MIN_SEGMENT * 4 + 1, 4)):
+            ranges = SegmentedDownloader(segments, min_segment=MIN_SEGMENT).plan(size)
+            self.assertLessEqual(len(ranges), segments)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], size - 1)
+            for (s1, e1), (s2, e2) in zip(ranges, ranges[1:]):
+                self.assertEqual(e1 + 1, s2)
+            self.assertTrue(all(s <= e for s, e in ranges))
+            if len(ranges) > 1:
+                self.assertTrue(all(e - s + 1 >= MIN_SEGMENT for s, e in ranges))
+
+    def test_segments_reassemble_byte_for_byte(self):
+        srv = self.server()
+        seen = []
+        dl = SegmentedDownloader(4, chunk_size=64 * 1024, min_segment=MIN_SEGMENT,
+                                 progress=lambda done, total: seen.append((done, total)))
+        self.assertEqual(dl.fetch(f"{srv.base_url}/media/1.mp4", self.path), SIZE)
+        self.assertWhole(srv)
+        self.assertEqual(seen[-1], (SIZE, SIZE))
+
+    def test_interrupted_fetch_resumes_from_saved_ranges(self):
+        left = self.interrupt(self.server())
+        remaining = sum(e - s + 1 for s, e in left)
+        self.assertTrue(0 < remaining < SIZE)
+        # a fresh server, so its byte counter only sees the resumed fetch
+        srv = self.server()
+        dl = SegmentedDownloader(4, chunk_size=64 * 1024, min_segment=MIN_SEGMENT)
+        self.assertEqual(dl.fetch(f"{srv.base_url}/media/1.mp4", self.path), SIZE)
+        self.assertWhole(srv)
+        # a handler adds its bytes after the last write, so give it a moment
+        deadline = time.monotonic() + 2
+        while srv.bytes_sent < remaining + 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(srv.bytes_sent, remaining + 1)     # + the 1-byte Range probe
+
+    def test_no_range_support_falls_back_to_one_stream(self):
+        srv = self.server(ranges=False)
+        dl = SegmentedDownloader(4, min_segment=MIN_SEGMENT)
+        self.assertEqual(dl.probe(f"{srv.base_url}/media/1.mp4"), (SIZE, False))
+        self.assertEqual(dl.fetch(f"{srv.base_url}/media/1.mp4", self.path), SIZE)
+        self.assertWhole(srv)
+
+    def test_failed_fallback_keeps_saved_ranges(self):
+        left = self.interrupt(self.server())
+        with open(self.path + ".part", "rb") as f:
+            partial = f.read()
+        srv = self.server(ranges=False)
+        dl = SegmentedDownloader(4, chunk_size=64 * 1024, min_segment=MIN_SEGMENT, progress=_stop_after(SIZE // 4))
+        with self.assertRaises(Stop):
+            dl.fetch(f"{srv.base_url}/media/1.mp4", self.path)
+        with open(self.path + ".part", "rb") as f:
+            self.assertEqual(f.read(), partial)
+        with open(self.path + ".part.ranges", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["ranges"], left)
+        self.assertFalse(os.path.exists(self.path + ".part.single"))
+        # once the single stream gets through, it replaces the partial download
+        dl = SegmentedDownloader(4, min_segment=MIN_SEGMENT)
+        self.assertEqual(dl.fetch(f"{srv.base_url}/media/1.mp4", self.path), SIZE)
+        self.assertWhole(srv)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Startup: the modules the window imports leave yt_dlp unloaded, and tool lookups run once per process."""
+from __future__ import unicode_literals
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import AppPaths
+
+# everything YoutubeDownloader.py imports before the window is shown, minus Qt
+STARTUP_MODULES = ["AppPaths", "MetadataCache", "DownloadArchive", "JobQueue", "JobJournal", "BandwidthScheduler",
+                   "Metrics", "FormatSelector", "DownloaderContext", "RetryPolicy", "ContentStore", "MergePool",
+                   "ControlServer", "AsyncCore"]
+
+
+class StartupTest(unittest.TestCase):
+    def test_startup_modules_do_not_load_yt_dlp(self):
+        code = f"import sys; import {', '.join(STARTUP_MODULES)}; print('yt_dlp' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                             check=True).stdout
+        self.assertEqual(out.strip(), "False")
+
+    def test_tools_are_looked_up_once(self):
+        for cached in (AppPaths.ffmpeg_exe, AppPaths.ffprobe_exe):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+        with mock.patch.object(AppPaths, "_find_tool", side_effect=lambda name: f"/opt/{name}") as find:
+            self.assertEqual([AppPaths.ffmpeg_exe() for _ in range(3)], ["/opt/ffmpeg"] * 3)
+            self.assertEqual(AppPaths.ffprobe_exe(), "/opt/ffprobe")
+        self.assertEqual([c.args for c in find.call_args_list], [("ffmpeg",), ("ffprobe",)])
+
+    def test_bundled_tools_come_before_the_path(self):
+        with tempfile.TemporaryDirectory() as bundle:
+            exe = os.path.join(bundle, "tools", "ffmpeg", "ffmpeg.exe")
+            os.makedirs(os.path.dirname(exe))
+            open(exe, "wb").close()
+            with mock.patch.object(sys, "_MEIPASS", bundle, create=True):
+                self.assertEqual(AppPaths._find_tool("ffmpeg"), exe)
+            with mock.patch.object(sys, "_MEIPASS", bundle, create=True), \
+                    mock.patch("AppPaths.shutil.which", return_value="/usr/bin/ffprobe"):
+                self.assertEqual(AppPaths._find_tool("ffprobe"), "/usr/bin/ffprobe")
+
+    @unittest.skipIf(sys.platform.startswith("win"), "reads LOCALAPPDATA there")
+    def test_app_data_dir_follows_xdg_cache_home(self):
+        with tempfile.TemporaryDirectory() as cache, mock.patch.dict(os.environ, {"XDG_CACHE_HOME": cache}):
+            path = AppPaths.app_data_dir()
+            self.assertEqual(path, os.path.join(cache, "YoutubeDownloader"))
+            self.assertTrue(os.path.isdir(path))
+
+
+if __name__ == "__main__":
+    unittest.main()